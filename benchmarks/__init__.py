@@ -0,0 +1,3 @@
+"""
+Benchmarks, run with `asv <https://asv.readthedocs.io>`_
+"""
@@ -0,0 +1,32 @@
+"""
+Benchmarks of the batched kernels
+"""
+import numpy as np
+from openscm_units import unit_registry as ur
+
+from openscm_twolayermodel.batched import run_impulse_response, run_two_layer
+
+N_TIME = 500
+SECONDS_PER_YEAR = ur("yr").to("s").magnitude
+
+
+class Kernels:
+    params = [1, 100, 10000]
+    param_names = ["n_members"]
+
+    def setup(self, n_members):
+        self.erf = np.broadcast_to(np.linspace(0, 8, N_TIME), (n_members, N_TIME))
+        self.lambda0 = np.linspace(0.6, 2.0, n_members)
+        self.q2 = 1 / self.lambda0 - 0.3
+
+    def time_run_two_layer(self, n_members):
+        run_two_layer(self.erf, SECONDS_PER_YEAR, 50, 1200, self.lambda0, 0, 1, 0.8)
+
+    def peakmem_run_two_layer(self, n_members):
+        run_two_layer(self.erf, SECONDS_PER_YEAR, 50, 1200, self.lambda0, 0, 1, 0.8)
+
+    def time_run_impulse_response(self, n_members):
+        run_impulse_response(self.erf, 1, 4, 250, 0.3, self.q2, 1)
+
+    def peakmem_run_impulse_response(self, n_members):
+        run_impulse_response(self.erf, 1, 4, 250, 0.3, self.q2, 1)
@@ -0,0 +1,16 @@
+"""
+Benchmarks of the time taken to import the package
+
+Each benchmark runs in a fresh interpreter so nothing is already imported.
+"""
+
+
+class Import:
+    def timeraw_import_package(self):
+        return "import openscm_twolayermodel"
+
+    def timeraw_import_batched(self):
+        return "import openscm_twolayermodel.batched"
+
+    def timeraw_import_models(self):
+        return "from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel"
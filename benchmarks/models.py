@@ -0,0 +1,83 @@
+"""
+Benchmarks of single model runs and parameter conversions
+"""
+import numpy as np
+from openscm_units import unit_registry as ur
+
+from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel
+from openscm_twolayermodel.diagnostics import calculate_two_layer_metrics
+
+MODELS = {"two_layer": TwoLayerModel, "impulse_response": ImpulseResponseModel}
+TIMESTEPS = {"annual": 1 * ur("yr"), "monthly": 1 / 12 * ur("yr")}
+N_YEARS = 500
+
+
+def _get_model(model, timestep):
+    delta_t = TIMESTEPS[timestep]
+    n_steps = int(round(N_YEARS / delta_t.to("yr").magnitude))
+
+    out = MODELS[model](delta_t=delta_t)
+    out.set_drivers(np.linspace(0, 8, n_steps) * ur("W/m^2"))
+    out.reset()
+
+    return out
+
+
+class Step:
+    params = list(MODELS)
+    param_names = ["model"]
+
+    def setup(self, model):
+        self.model = _get_model(model, "annual")
+        self.model.run()
+
+    def time_step(self, model):
+        # step from the same (non-initial) timestep every time
+        self.model._timestep_idx = 100
+        self.model.step()
+
+
+class Run:
+    params = (list(MODELS), list(TIMESTEPS))
+    param_names = ["model", "timestep"]
+
+    def setup(self, model, timestep):
+        self.model = _get_model(model, timestep)
+
+    def time_run(self, model, timestep):
+        self.model.reset()
+        self.model.run()
+
+    def peakmem_run(self, model, timestep):
+        self.model.reset()
+        self.model.run()
+
+
+class ParameterConversions:
+    def setup(self):
+        self.two_layer = TwoLayerModel(efficacy=1.2 * ur("dimensionless"))
+        self.impulse_response = ImpulseResponseModel(efficacy=1.2 * ur("dimensionless"))
+
+        n_members = 10000
+        self.ensemble_paras = {
+            "du": np.full(n_members, 50.0),
+            "dl": np.full(n_members, 1200.0),
+            "lambda0": np.linspace(0.6, 2.0, n_members),
+            "efficacy": np.full(n_members, 1.2),
+            "eta": np.linspace(0.5, 1.5, n_members),
+        }
+
+    def time_set_parameter(self):
+        self.two_layer.du = 60 * ur("m")
+
+    def time_get_impulse_response_parameters(self):
+        self.two_layer.get_impulse_response_parameters()
+
+    def time_get_two_layer_parameters(self):
+        self.impulse_response.get_two_layer_parameters()
+
+    def time_ensemble_metrics(self):
+        calculate_two_layer_metrics(**self.ensemble_paras)
+
+    def peakmem_ensemble_metrics(self):
+        calculate_two_layer_metrics(**self.ensemble_paras)
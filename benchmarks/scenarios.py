@@ -0,0 +1,91 @@
+"""
+Benchmarks of running scenarios from the RCMIP forcing file
+
+The forcing file is the one used by the regression tests
+(``tests/test-data/rcmip-radiative-forcing-annual-means-v4-0-0.csv``), these
+benchmarks are skipped if it is not available. Its World effective radiative
+forcing timeseries are repeated (with an ``ensemble_member`` column to keep
+the rows unique) to get the required number of rows.
+"""
+import os.path
+
+import numpy as np
+import pandas as pd
+from openscm_units import unit_registry as ur
+from scmdata.run import ScmRun
+
+from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel
+
+RCMIP_FORCINGS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests",
+    "test-data",
+    "rcmip-radiative-forcing-annual-means-v4-0-0.csv",
+)
+DRIVER_VAR = "Effective Radiative Forcing"
+MODELS = {"two_layer": TwoLayerModel, "impulse_response": ImpulseResponseModel}
+
+
+def _load_forcings():
+    if not os.path.isfile(RCMIP_FORCINGS):
+        # asv skips benchmarks whose setup raises NotImplementedError
+        raise NotImplementedError("RCMIP forcing file not available")
+
+    forcings = ScmRun(RCMIP_FORCINGS, lowercase_cols=True)
+    return forcings.filter(variable=DRIVER_VAR, region="World").timeseries()
+
+
+def _get_scenarios(forcings, n_rows):
+    n_repeats = int(np.ceil(n_rows / forcings.shape[0]))
+    out = pd.concat(
+        [forcings.assign(ensemble_member=i) for i in range(n_repeats)]
+    ).iloc[:n_rows]
+
+    return ScmRun(out.set_index("ensemble_member", append=True))
+
+
+class RunScenarios:
+    params = (list(MODELS), [1, 100, 10000])
+    param_names = ["model", "n_rows"]
+    # scenarios are run one at a time so large numbers of rows are slow
+    number = 1
+    repeat = (1, 3, 60.0)
+    timeout = 3600
+
+    def setup_cache(self):
+        return _load_forcings()
+
+    def setup(self, forcings, model, n_rows):
+        self.model = MODELS[model]()
+        self.scenarios = _get_scenarios(forcings, n_rows)
+
+    def time_run_scenarios(self, forcings, model, n_rows):
+        self.model.run_scenarios(self.scenarios, progress=False)
+
+    def peakmem_run_scenarios(self, forcings, model, n_rows):
+        self.model.run_scenarios(self.scenarios, progress=False)
+
+
+class OutputAssembly:
+    params = list(MODELS)
+    param_names = ["model"]
+
+    def setup_cache(self):
+        return _load_forcings()
+
+    def setup(self, forcings, model):
+        self.model = MODELS[model]()
+        self.model.delta_t = self.model._select_timestep(ScmRun(forcings.iloc[:1]))
+
+        row = forcings.iloc[0].dropna()
+        self.ts_base = row.to_frame().T
+        self.ts_base.index.names = forcings.index.names
+
+        self.model.set_drivers(
+            row.values * ur(forcings.index.get_level_values("unit")[0])
+        )
+        self.model.reset()
+        self.model.run()
+
+    def time_get_run_output(self, forcings, model):
+        ScmRun(pd.concat([self.ts_base] + self.model._get_run_output_tss(self.ts_base)))
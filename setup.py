@@ -47,10 +47,12 @@ REQUIREMENTS_NOTEBOOKS = [
 REQUIREMENTS_TESTS = [
     "codecov",
     "coverage",
+    "dask[array]",
     "nbval",
     "pytest-cov",
     "pytest>=4.0",
     "scipy",
+    "xarray",
 ]
 REQUIREMENTS_DOCS = REQUIREMENTS_NOTEBOOKS + [
     "nbsphinx",
@@ -63,6 +65,7 @@ REQUIREMENTS_DEPLOY = ["twine>=1.11.0", "setuptools>=38.6.0", "wheel>=0.31.0"]
 
 REQUIREMENTS_DEV = [
     *[
+        "asv",
         "bandit",
         "black==19.10b0",
         "black-nb",
@@ -3,10 +3,32 @@ OpenSCM Two Layer Model, implementations of the two layer radiative forcing driv
 
 See README and docs for more info.
 """
+import importlib
 
 from ._version import get_versions
-from .impulse_response_model import ImpulseResponseModel  # noqa
-from .two_layer_model import TwoLayerModel  # noqa
 
 __version__ = get_versions()["version"]
 del get_versions
+
+# the models are only imported when first accessed so that e.g. the batched
+# kernels can be used without importing pint, pandas and scmdata
+_LAZY_ATTRIBUTES = {
+    "ImpulseResponseModel": ".impulse_response_model",
+    "ImpulseResponseParameters": ".parameters",
+    "TwoLayerModel": ".two_layer_model",
+    "TwoLayerParameters": ".parameters",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
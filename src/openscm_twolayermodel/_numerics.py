@@ -0,0 +1,202 @@
+"""
+Single timestep numerics shared by the models and the batched kernels
+
+These functions work on plain magnitudes in the models' internal units and do
+no unit handling, so this module (like :mod:`openscm_twolayermodel.batched`)
+can be imported without importing :mod:`pint`, the unit registry or
+:mod:`pandas`.
+"""
+import numpy as np
+
+from .constants import DENSITY_WATER_MAG, HEAT_CAPACITY_WATER_MAG, SECONDS_PER_YEAR
+
+# pylint: disable=invalid-name,too-many-locals
+
+
+def calculate_next_temp_upper(  # pylint: disable=too-many-arguments
+    delta_t, t_upper, t_lower, erf, lambda0, a, efficacy, eta, heat_capacity_upper
+):
+    """
+    Calculate the two-layer model's next upper layer temperature
+    """
+    lambda_now = lambda0 - a * t_upper
+    heat_exchange = efficacy * eta * (t_upper - t_lower)
+    dT_dt = (erf - lambda_now * t_upper - heat_exchange) / heat_capacity_upper
+
+    return t_upper + delta_t * dT_dt
+
+
+def calculate_next_temp_lower(delta_t, t_lower, t_upper, eta, heat_capacity_lower):
+    """
+    Calculate the two-layer model's next lower layer temperature
+    """
+    heat_exchange = eta * (t_upper - t_lower)
+    dT_dt = heat_exchange / heat_capacity_lower
+
+    return t_lower + delta_t * dT_dt
+
+
+def calculate_next_two_layer_rndt(  # pylint: disable=too-many-arguments
+    delta_t,
+    t_lower_now,
+    t_lower_prev,
+    heat_capacity_lower,
+    t_upper_now,
+    t_upper_prev,
+    heat_capacity_upper,
+):
+    """
+    Calculate the two-layer model's heat uptake
+    """
+    uptake_lower = heat_capacity_lower * (t_lower_now - t_lower_prev) / delta_t
+    uptake_upper = heat_capacity_upper * (t_upper_now - t_upper_prev) / delta_t
+
+    return uptake_upper + uptake_lower
+
+
+def calculate_next_box_temp(delta_t, t, q, d, erf):
+    """
+    Calculate the impulse response model's next temperature of a box
+    """
+    decay_factor = np.exp(-delta_t / d)
+    rise = erf * q * (1 - np.exp(-delta_t / d))
+
+    return t * decay_factor + rise
+
+
+def calculate_geoffroy_helper_parameters(du, dl, lambda0, efficacy, eta):
+    """
+    Calculate the helper parameters of Geoffroy et al. (2013) from magnitudes
+
+    Float version of
+    :func:`openscm_twolayermodel.base._calculate_geoffroy_helper_parameters`.
+    The inputs are in the two-layer model's internal units (e.g.
+    ``TwoLayerModel._du_unit``). The outputs are in SI units i.e. ``"C"`` and
+    ``"C_D"`` are in J/delta_degC/m^2, ``"b"`` and ``"b_star"`` are in 1/s,
+    ``"delta"`` is in 1/s^2, ``"tau1"`` and ``"tau2"`` are in s and the rest
+    are dimensionless.
+    """
+    C = du * HEAT_CAPACITY_WATER_MAG * DENSITY_WATER_MAG
+    C_D = dl * HEAT_CAPACITY_WATER_MAG * DENSITY_WATER_MAG
+
+    b_pt1 = (lambda0 + efficacy * eta) / (C)
+    b_pt2 = (eta) / (C_D)
+    b = b_pt1 + b_pt2
+    b_star = b_pt1 - b_pt2
+    delta = b ** 2 - (4 * lambda0 * eta) / (C * C_D)
+
+    taucoeff = C * C_D / (2 * lambda0 * eta)
+    tau1 = taucoeff * (b - delta ** 0.5)
+    tau2 = taucoeff * (b + delta ** 0.5)
+
+    phicoeff = C / (2 * efficacy * eta)
+    phi1 = phicoeff * (b_star - delta ** 0.5)
+    phi2 = phicoeff * (b_star + delta ** 0.5)
+
+    adenom = C * (phi2 - phi1)
+    a1 = tau1 * phi2 * lambda0 / adenom
+    a2 = -tau2 * phi1 * lambda0 / adenom
+
+    return {
+        "C": C,
+        "C_D": C_D,
+        "b": b,
+        "b_star": b_star,
+        "delta": delta,
+        "tau1": tau1,
+        "tau2": tau2,
+        "phi1": phi1,
+        "phi2": phi2,
+        "a1": a1,
+        "a2": a2,
+    }
+
+
+def calculate_two_layer_parameters(q1, q2, d1, d2, efficacy):
+    """
+    Calculate two-layer model parameters equivalent to impulse response parameters
+
+    Float version of
+    :meth:`openscm_twolayermodel.ImpulseResponseModel.get_two_layer_parameters`.
+    The inputs are in the impulse response model's internal units (e.g.
+    ``ImpulseResponseModel._d1_unit``), the outputs in the two-layer model's
+    internal units (e.g. ``TwoLayerModel._du_unit``).
+    """
+    lambda0 = 1 / (q1 + q2)
+    # heat capacities in W yr / delta_degC / m^2
+    C = (d1 * d2) / (q1 * d2 + q2 * d1)
+
+    a1 = lambda0 * q1
+    a2 = lambda0 * q2
+
+    C_D = (lambda0 * (d1 * a1 + d2 * a2) - C) / efficacy
+    eta = C_D / (d1 * a2 + d2 * a1)
+
+    heat_capacity_per_depth = (
+        DENSITY_WATER_MAG * HEAT_CAPACITY_WATER_MAG / SECONDS_PER_YEAR
+    )
+
+    return {
+        "lambda0": lambda0,
+        "du": C / heat_capacity_per_depth,
+        "dl": C_D / heat_capacity_per_depth,
+        "eta": eta,
+        "efficacy": efficacy,
+    }
+
+
+def calculate_impulse_response_parameters(du, dl, lambda0, efficacy, eta):
+    """
+    Calculate impulse response parameters equivalent to two-layer model parameters
+
+    Float version of
+    :meth:`openscm_twolayermodel.TwoLayerModel.get_impulse_response_parameters`
+    (without state-dependence). The inputs are in the two-layer model's
+    internal units, the outputs in the impulse response model's internal
+    units.
+    """
+    gh = calculate_geoffroy_helper_parameters(du, dl, lambda0, efficacy, eta)
+
+    qdenom = gh["C"] * (gh["phi2"] - gh["phi1"])
+
+    return {
+        "d1": gh["tau1"] / SECONDS_PER_YEAR,
+        "d2": gh["tau2"] / SECONDS_PER_YEAR,
+        "q1": gh["tau1"] * gh["phi2"] / qdenom,
+        "q2": -gh["tau2"] * gh["phi1"] / qdenom,
+        "efficacy": efficacy,
+    }
+
+
+def calculate_impulse_response_rndt_paras(q1, q2, d1, d2, efficacy):
+    """
+    Calculate the coefficients of the impulse response model's heat uptake
+
+    The heat uptake is ``erf - lambda0 * (t1 + t2) - coeff1 * t1 - coeff2 * t2``
+    (see :meth:`ImpulseResponseModel.get_two_layer_parameters`). The inputs are
+    in the impulse response model's internal units.
+
+    Returns
+    -------
+    tuple of float or :obj:`np.ndarray`
+        ``lambda0``, ``coeff1`` and ``coeff2`` (W/m^2/delta_degC)
+    """
+    two_layer_paras = calculate_two_layer_parameters(q1, q2, d1, d2, efficacy)
+    gh = calculate_geoffroy_helper_parameters(
+        two_layer_paras["du"],
+        two_layer_paras["dl"],
+        two_layer_paras["lambda0"],
+        two_layer_paras["efficacy"],
+        two_layer_paras["eta"],
+    )
+
+    # the efficacy term is exactly zero when efficacy is one
+    efficacy_coeff = np.where(
+        np.equal(efficacy, 1), 0, two_layer_paras["eta"] * (efficacy - 1)
+    )
+
+    return (
+        two_layer_paras["lambda0"],
+        efficacy_coeff * (1 - gh["phi1"]),
+        efficacy_coeff * (1 - gh["phi2"]),
+    )
@@ -0,0 +1,90 @@
+"""
+Cached unit conversion factors
+
+Converting with :mod:`pint` takes far longer than the models' numerics, so the
+factor between each pair of units is calculated once and then looked up. This
+keeps the unit registry at the API boundary, i.e. where users pass
+:obj:`pint.Quantity`, and out of the internal calculations.
+"""
+import functools
+
+import pint
+import pint.errors
+from openscm_units import unit_registry as ur
+
+from .errors import UnitError
+
+
+@functools.lru_cache(maxsize=None)
+def get_conversion_factor(from_units, to_units):
+    """
+    Get the factor which converts magnitudes from one unit to another
+
+    Parameters
+    ----------
+    from_units : str or :obj:`pint.Unit`
+        Units to convert from
+
+    to_units : str or :obj:`pint.Unit`
+        Units to convert to
+
+    Returns
+    -------
+    float or None
+        Conversion factor, ``None`` if the conversion is not a simple
+        multiplication (e.g. from degC to K)
+
+    Raises
+    ------
+    pint.errors.DimensionalityError
+        The units cannot be converted
+    """
+    factor = ur.Quantity(1.0, from_units).to(to_units).magnitude
+    if ur.Quantity(0.0, from_units).to(to_units).magnitude != 0:
+        return None
+
+    return factor
+
+
+def get_magnitude(quantity, name, units):
+    """
+    Get the magnitude of a quantity in given units
+
+    Parameters
+    ----------
+    quantity : :obj:`pint.Quantity`
+        Quantity
+
+    name : str
+        Name of the quantity (used in error messages)
+
+    units : str
+        Units in which to return the magnitude
+
+    Returns
+    -------
+    float or :obj:`np.ndarray`
+        Magnitude of ``quantity`` in ``units`` (always a new object if
+        ``quantity``'s magnitude is an array)
+
+    Raises
+    ------
+    TypeError
+        ``quantity`` is not a :obj:`pint.Quantity`
+
+    UnitError
+        ``quantity`` cannot be converted to ``units`` (including if ``units``
+        is not defined)
+    """
+    if not isinstance(quantity, pint.Quantity):
+        raise TypeError("{} must be a pint.Quantity".format(name))
+
+    try:
+        factor = get_conversion_factor(quantity.units, units)
+    except (pint.errors.DimensionalityError, pint.errors.UndefinedUnitError) as exc:
+        raise UnitError("Wrong units for `{}`".format(name)) from exc
+
+    if factor is None:
+        return quantity.to(units).magnitude
+
+    return quantity.magnitude * factor
@@ -1,20 +1,60 @@
 """
 Module containing the base for model implementations
 """
+import time
 from abc import ABC, abstractmethod
 
 import numpy as np
-import pandas as pd
 import pint
 import pint.errors
-import tqdm.autonotebook as tqdman
 from openscm_units import unit_registry as ur
-from scmdata.run import ScmRun
 
-from .constants import DENSITY_WATER, HEAT_CAPACITY_WATER
+from ._numerics import calculate_geoffroy_helper_parameters
+from ._units import get_conversion_factor, get_magnitude
+from .batched import _check_out, _get_kernel, _get_kernel_paras
 from .errors import UnitError
 
-# pylint: disable=invalid-name
+# pandas, scmdata and tqdm are only imported when scenarios are run so that
+# importing the models stays fast
+
+# pylint: disable=invalid-name,import-outside-toplevel
+
+
+class _StageTimer:
+    """
+    Accumulate the time spent in each stage of :meth:`TwoLayerVariant.run_scenarios`
+    """
+
+    def __init__(self, callback):
+        self._callback = callback
+        self._totals = {}
+        self._start = None
+
+    def start(self):
+        """
+        Start timing a stage
+        """
+        self._start = time.perf_counter()
+
+    def stop(self, stage, n_rows=0, n_steps=0):
+        """
+        Stop timing ``stage`` and start timing the next stage
+        """
+        now = time.perf_counter()
+        totals = self._totals.setdefault(stage, [0.0, 0, 0])
+        totals[0] += now - self._start
+        totals[1] += n_rows
+        totals[2] += n_steps
+        self._start = now
+
+    def report(self):
+        """
+        Pass the totals for each stage to the callback, in the order the stages were first timed
+        """
+        for stage, (duration, n_rows, n_steps) in self._totals.items():
+            self._callback(
+                stage=stage, duration=duration, n_rows=n_rows, n_steps=n_steps
+            )
 
 
 class Model(ABC):
@@ -26,16 +66,6 @@ class Model(ABC):
 
     _name = None  # model name
 
-    @staticmethod
-    def _assert_is_pint_quantity_with_units(quantity, name, model_units):
-        if not isinstance(quantity, pint.Quantity):
-            raise TypeError("{} must be a pint.Quantity".format(name))
-
-        try:
-            quantity.to(model_units)
-        except pint.errors.DimensionalityError as exc:
-            raise UnitError("Wrong units for `{}`".format(name)) from exc
-
     @abstractmethod
     def set_drivers(self, *args, **kwargs):
         """
@@ -83,6 +113,35 @@ class TwoLayerVariant(Model):
     _delta_t_unit = "s"
     _erf_unit = "W/m^2"
 
+    _dtype = np.dtype("float64")
+
+    _output_vars = tuple()  # output variables, stored in ``_<var>_mag``
+
+    _stream_chunk = 128  # initial capacity of the buffers used when streaming
+
+    _parameters_cls = None  # record of ``_save_paras``, see :mod:`.parameters`
+
+    @property
+    def dtype(self):
+        """
+        :obj:`np.dtype`
+            Floating point type of the model's drivers, internal arrays and outputs
+
+        Single precision (``np.float32``) halves the memory required by
+        large ensembles. Note that :obj:`ScmRun` stores its data in double
+        precision so the output of :meth:`run_scenarios` is upcast (without
+        any change in value) to double precision.
+        """
+        return self._dtype
+
+    @dtype.setter
+    def dtype(self, val):
+        val = np.dtype(val)
+        if not np.issubdtype(val, np.floating):
+            raise TypeError("dtype must be a floating point type")
+
+        self._dtype = val
+
     @property
     def delta_t(self):
         """
@@ -93,9 +152,40 @@ class TwoLayerVariant(Model):
 
     @delta_t.setter
     def delta_t(self, val):
-        self._assert_is_pint_quantity_with_units(val, "delta_t", self._delta_t_unit)
+        self._delta_t_mag = get_magnitude(val, "delta_t", self._delta_t_unit)
         self._delta_t = val
-        self._delta_t_mag = val.to(self._delta_t_unit).magnitude
+
+    @property
+    def parameters(self):
+        """
+        :obj:`openscm_twolayermodel.parameters.TwoLayerParameters` or :obj:`openscm_twolayermodel.parameters.ImpulseResponseParameters`
+            The model's parameters (``self._save_paras``) as an immutable
+            record of magnitudes in the model's internal units
+
+        The record is created when first accessed after a parameter changes,
+        so values derived from it (e.g.
+        :attr:`openscm_twolayermodel.parameters.TwoLayerParameters.geoffroy_helper`)
+        are cached for as long as the parameters are unchanged. Setting a
+        record sets all the parameters at once.
+        """
+        if getattr(self, "_parameters", None) is None:
+            self._parameters = self._parameters_cls(
+                **{k: getattr(self, "_{}_mag".format(k)) for k in self._save_paras}
+            )
+
+        return self._parameters
+
+    @parameters.setter
+    def parameters(self, val):
+        if not isinstance(val, self._parameters_cls):
+            raise TypeError(
+                "parameters must be a {}".format(self._parameters_cls.__name__)
+            )
+
+        for k, v in val.asdict().items():
+            setattr(self, k, v * ur(getattr(self, "_{}_unit".format(k))))
+
+        self._parameters = val
 
     @property
     def erf(self):
@@ -107,9 +197,10 @@ class TwoLayerVariant(Model):
 
     @erf.setter
     def erf(self, val):
-        self._assert_is_pint_quantity_with_units(val, "erf", self._erf_unit)
+        self._erf_mag = np.asarray(
+            get_magnitude(val, "erf", self._erf_unit), dtype=self.dtype
+        )
         self._erf = val
-        self._erf_mag = val.to(self._erf_unit).magnitude
 
     def set_drivers(
         self, erf
@@ -134,6 +225,8 @@ class TwoLayerVariant(Model):
 
     @staticmethod
     def _ensure_scenarios_are_scmrun(scenarios):
+        from scmdata.run import ScmRun
+
         if not isinstance(scenarios, ScmRun):
             driver = ScmRun(scenarios)
         else:
@@ -172,8 +265,299 @@ class TwoLayerVariant(Model):
             "Could not decide on timestep for time axis: {}".format(driver["time"])
         )
 
-    def run_scenarios(  # pylint:disable=too-many-locals
-        self, scenarios, driver_var="Effective Radiative Forcing", progress=True,
+    def _get_stream_buffers(self, resume):
+        names = ("erf",) + self._output_vars
+
+        n_done = 0
+        if resume and not np.isnan(self._timestep_idx):
+            n_done = int(self._timestep_idx) + 1
+
+        buffers = getattr(self, "_stream_buffers", None)
+        if (
+            n_done
+            and buffers is not None
+            and all(
+                getattr(self, "_{}_mag".format(k)).base is buffers[k] for k in names
+            )
+        ):
+            # continuing a previous stream, keep its buffers
+            return buffers, n_done
+
+        capacity = max(self._stream_chunk, 2 * n_done)
+        buffers = {k: np.full(capacity, np.nan, dtype=self.dtype) for k in names}
+        if n_done:
+            for k in names:
+                buffers[k][:n_done] = getattr(self, "_{}_mag".format(k))[:n_done]
+
+        return buffers, n_done
+
+    def _stream(self, resume):
+        """
+        Coroutine which steps the model as forcing values are sent to it
+
+        The forcing and outputs are held in buffers whose capacity doubles
+        when full so the cost of growing them is amortised. Whenever the
+        coroutine is suspended, ``self._erf_mag`` and the output arrays are
+        views of the filled part of the buffers, so the model is in the same
+        state as after :meth:`run` with the forcing received so far.
+        """
+        buffers, n = self._get_stream_buffers(resume)
+        self._stream_buffers = buffers
+        for k, v in buffers.items():
+            setattr(self, "_{}_mag".format(k), v[:n])
+
+        if not n:
+            self._timestep_idx = np.nan
+
+        value = yield
+        while True:
+            if isinstance(value, pint.Quantity):
+                value = get_magnitude(value, "erf", self._erf_unit)
+
+            if n == buffers["erf"].shape[0]:
+                for k, v in buffers.items():
+                    buffers[k] = np.full(2 * v.shape[0], np.nan, dtype=v.dtype)
+                    buffers[k][:n] = v
+
+            buffers["erf"][n] = value
+            n += 1
+            for k, v in buffers.items():
+                setattr(self, "_{}_mag".format(k), v[:n])
+
+            self._step()
+
+            value = yield {
+                k: getattr(self, "_{}_mag".format(k))[-1] for k in self._output_vars
+            }
+
+    def _finish_stream(self):
+        self._erf = self._erf_mag * ur(self._erf_unit)
+        self._run_paras = self._get_paras_key()
+
+    def run_iter(self, erf, resume=False):
+        """
+        Run the model, consuming forcing values one at a time
+
+        This allows the model to be run with forcing which is not known in
+        advance, e.g. for monitoring where new forcing arrives each month.
+
+        Parameters
+        ----------
+        erf : iterable of float or :obj:`pint.Quantity`
+            Effective radiative forcing. Plain floats must be in
+            ``self._erf_unit``.
+
+        resume : bool
+            If ``True``, continue from the end of the previous run or stream
+            rather than starting a new run
+
+        Yields
+        ------
+        dict of str : float
+            Model output at the timestep corresponding to each forcing value.
+            As for :meth:`run`, the output at a timestep is not affected by
+            the forcing in that timestep. Once iteration stops, the model's
+            state is the same as after calling :meth:`run` with all the
+            forcing consumed so far.
+        """
+        stream = self._stream(resume)
+        next(stream)
+        try:
+            for value in erf:
+                yield stream.send(value)
+        finally:
+            stream.close()
+            self._finish_stream()
+
+    async def run_async_iter(self, erf, resume=False):
+        """
+        Run the model, consuming forcing values from an asynchronous iterable
+
+        See :meth:`run_iter` for details.
+
+        Parameters
+        ----------
+        erf : asynchronous iterable of float or :obj:`pint.Quantity`
+            Effective radiative forcing. Plain floats must be in
+            ``self._erf_unit``.
+
+        resume : bool
+            If ``True``, continue from the end of the previous run or stream
+            rather than starting a new run
+
+        Yields
+        ------
+        dict of str : float
+            Model output at the timestep corresponding to each forcing value
+        """
+        stream = self._stream(resume)
+        next(stream)
+        try:
+            async for value in erf:
+                yield stream.send(value)
+        finally:
+            stream.close()
+            self._finish_stream()
+
+    def _reset_outputs(self):
+        # the previous run's output arrays are reused if they have the right
+        # length and dtype, so repeated runs (e.g. in sweeps) don't allocate
+        n_steps = self._erf_mag.shape[0]
+        buffers = self.__dict__.setdefault("_output_buffers", {})
+        for k in self._output_vars:
+            buffer = buffers.get(k)
+            if (
+                buffer is None
+                or buffer.shape != (n_steps,)
+                or buffer.dtype != self.dtype
+            ):
+                buffer = buffers[k] = np.empty(n_steps, dtype=self.dtype)
+
+            buffer.fill(np.nan)
+            setattr(self, "_{}_mag".format(k), buffer)
+
+    def run(self, sensitivities=False, out=None):  # pylint:disable=arguments-differ
+        """
+        Run the model.
+
+        Parameters
+        ----------
+        sensitivities : bool
+            If ``True``, the derivatives of the outputs with respect to each
+            of the model's parameters are calculated in the same time loop
+            (see :mod:`openscm_twolayermodel.sensitivities`) and stored in
+            :attr:`sensitivities`. In this case, the whole run is always done,
+            starting from the first timestep.
+
+        out : dict of str : :obj:`np.ndarray`
+            Arrays to write (some of) the outputs (``self._output_vars``)
+            into, e.g. a row of a preallocated ensemble matrix or of a
+            :obj:`np.memmap`. Each must be one-dimensional, with the same
+            length as the drivers, and have dtype ``self.dtype``. The model
+            keeps referring to these arrays after the run but never reuses
+            them for later runs.
+
+        Raises
+        ------
+        ValueError
+            ``out`` contains unknown outputs or arrays with the wrong shape or
+            dtype
+        """
+        if out is not None:
+            out = _check_out(out, self._output_vars, self._erf_mag.shape, self.dtype)
+            for k, v in out.items():
+                setattr(self, "_{}_mag".format(k), v)
+
+        if sensitivities:
+            # imported here because the sensitivities module depends on the
+            # models
+            from .sensitivities import (  # pylint:disable=import-outside-toplevel
+                _run_tangent_linear,
+            )
+
+            outputs, self._sensitivities = _run_tangent_linear(self)
+            for k, v in outputs.items():
+                if out is not None and k in out:
+                    out[k][...] = v
+                    v = out[k]
+
+                setattr(self, "_{}_mag".format(k), v)
+
+            self._timestep_idx = self._erf_mag.shape[0] - 1
+
+        else:
+            super().run()
+            self._sensitivities = None
+
+        self._run_paras = self._get_paras_key()
+
+    @property
+    def sensitivities(self):
+        """
+        :obj:`dict` of str : :obj:`dict` of str : :obj:`np.ndarray`
+            Derivatives of each output with respect to each parameter in
+            ``self._save_paras`` (e.g. ``sensitivities["rndt"]["eta"]``, in
+            the model's internal units) from the last call to
+            :meth:`run` with ``sensitivities=True``, ``None`` if the last run
+            did not calculate them
+        """
+        return getattr(self, "_sensitivities", None)
+
+    def _get_paras_key(self):
+        return (self._delta_t_mag, self.dtype, self.parameters)
+
+    def _get_checkpoint(self):
+        if getattr(self, "_run_paras", None) != self._get_paras_key():
+            return None
+
+        n_steps = self._erf_mag.shape[0]
+        if np.isnan(self._timestep_idx) or self._timestep_idx != n_steps - 1:
+            return None
+
+        out = {
+            k: getattr(self, "_{}_mag".format(k)) for k in ("erf",) + self._output_vars
+        }
+        out["paras"] = self._run_paras
+
+        # the checkpoint holds on to the outputs so they must not be reused
+        self._output_buffers = {}
+
+        return out
+
+    def _restore_checkpoint(self, checkpoint):
+        for k in ("erf",) + self._output_vars:
+            setattr(self, "_{}_mag".format(k), checkpoint[k])
+
+        self._timestep_idx = checkpoint["erf"].shape[0] - 1
+        self._run_paras = checkpoint["paras"]
+
+    def rerun(self, erf):
+        """
+        Re-run the model with new drivers, only recomputing what has changed
+
+        The model's outputs at each timestep fully determine its state, hence
+        the previous run acts as a set of per-timestep checkpoints. The run is
+        resumed from the last timestep which is unaffected by the change in
+        drivers (i.e. the timestep after the first changed driver value, see
+        the notes on forward-differencing in the model's docstring), so only
+        the changed suffix is recomputed. If the model has not been run, or
+        its parameters have changed since the last run, everything is
+        recomputed.
+
+        Parameters
+        ----------
+        erf : :obj:`pint.Quantity`
+            Effective radiative forcing (W/m^2) to use to drive the model
+        """
+        checkpoint = self._get_checkpoint()
+
+        self.set_drivers(erf)
+        self.reset()
+
+        n_steps = self._erf_mag.shape[0]
+        n_unchanged = 0
+        if checkpoint is not None:
+            n_unchanged = _get_n_unchanged_outputs(checkpoint["erf"], self._erf_mag)
+            for k in self._output_vars:
+                getattr(self, "_{}_mag".format(k))[:n_unchanged] = checkpoint[k][
+                    :n_unchanged
+                ]
+
+            if n_unchanged:
+                self._timestep_idx = n_unchanged - 1
+
+        for _ in range(n_steps - n_unchanged):
+            self.step()
+
+        self._run_paras = self._get_paras_key()
+
+    def run_scenarios(  # pylint:disable=too-many-locals,too-many-arguments,too-many-branches,too-many-statements
+        self,
+        scenarios,
+        driver_var="Effective Radiative Forcing",
+        progress=True,
+        incremental=False,
+        timing_callback=None,
     ):
         """
         Run scenarios.
@@ -183,6 +567,13 @@ class TwoLayerVariant(Model):
         has a constant timestep. Pull requests to upgrade the implementation to support
         variable timesteps are welcome `<https://github.com/openscm/openscm-twolayermodel/pulls>`_.
 
+        Unless ``incremental`` is ``True``, all the scenarios are run at once
+        with the model's batched kernel (see
+        :mod:`openscm_twolayermodel.batched`). Scenarios can cover different
+        periods (e.g. historical and future scenarios). As if each were run on
+        its own, a scenario is run over the timesteps in which its driver is
+        not ``np.nan`` and its output is ``np.nan`` in all other timesteps.
+
         Parameters
         ----------
         scenarios : :obj:`ScmDataFrame` or :obj:`ScmRun` or :obj:`pyam.IamDataFrame` or :obj:`pd.DataFrame` or :obj:`np.ndarray` or str
@@ -195,6 +586,25 @@ class TwoLayerVariant(Model):
         progress : bool
             Whether to display a progress bar
 
+        incremental : bool
+            If ``True``, keep the result of each scenario and, if the same
+            scenario is run again (e.g. after editing its drivers from some
+            year onwards), only recompute the timesteps affected by the
+            changes (see :meth:`rerun`)
+
+        timing_callback : callable
+            If supplied, the time spent in each stage of the run is measured
+            and, once the run is complete, ``timing_callback`` is called once
+            per stage with keyword arguments ``stage`` (str), ``duration``
+            (total wall time in seconds, float), ``n_rows`` (number of
+            timeseries processed in the stage, int) and ``n_steps`` (number of
+            model timesteps run in the stage, int). The stages are
+            ``"ensure_scmrun"``, ``"filter"``, ``"timeseries"``, ``"run"``
+            (the model itself), ``"create_ts"`` (creating each scenario's
+            output timeseries), ``"scenario_output"`` (combining each
+            scenario's timeseries) and ``"concat"`` (combining all the
+            output). If ``None``, no timing is done.
+
         Returns
         -------
         :obj:`ScmRun`
@@ -206,7 +616,17 @@ class TwoLayerVariant(Model):
             No data is available for ``driver_var`` in the ``"World"`` region in
             ``scenarios``.
         """
+        import pandas as pd
+        import tqdm.autonotebook as tqdman
+        from scmdata.run import ScmRun
+
+        timer = _StageTimer(timing_callback) if timing_callback is not None else None
+        if timer is not None:
+            timer.start()
+
         driver = self._ensure_scenarios_are_scmrun(scenarios)
+        if timer is not None:
+            timer.stop("ensure_scmrun", n_rows=driver.shape[0])
 
         save_paras_meta = {
             "{} ({})".format(k, getattr(self, k).units): getattr(self, k).magnitude
@@ -225,33 +645,79 @@ class TwoLayerVariant(Model):
 
         timestep = self._select_timestep(driver)
         self.delta_t = timestep
+        if timer is not None:
+            timer.stop("filter", n_rows=driver.shape[0])
 
         run_store = list()
+        if incremental and not hasattr(self, "_scenario_checkpoints"):
+            self._scenario_checkpoints = {}
 
         driver_ts = driver.timeseries()
+        erf = self._get_driver_magnitudes(
+            driver_ts, ignore_meta=["climate_model"] + list(save_paras_meta)
+        )
+        if timer is not None:
+            timer.stop("timeseries", n_rows=driver_ts.shape[0])
+
+        batched = None if incremental else self._run_rows_batched(erf)
+        if timer is not None and batched is not None:
+            timer.stop("run", n_rows=driver_ts.shape[0], n_steps=int(batched[1].sum()))
+
         for i, (label, row) in tqdman.tqdm(
             enumerate(driver_ts.iterrows()),
             desc="scenarios",
             leave=False,
             disable=not (progress),
         ):
-            meta = dict(zip(driver_ts.index.names, label))
+            if timer is not None:
+                timer.start()
+
             row_no_nan = row.dropna()
 
-            self.set_drivers(row_no_nan.values * ur(meta["unit"]))
-            self.reset()
-            self.run()
+            if batched is not None:
+                # point the model at this row's part of the batched run
+                outputs, lengths = batched
+                for k, v in outputs.items():
+                    setattr(self, "_{}_mag".format(k), v[i, : lengths[i]])
+
+                self._timestep_idx = lengths[i] - 1
+            elif incremental:
+                checkpoint_key = (label, row_no_nan.index[0])
+                checkpoint = self._scenario_checkpoints.get(checkpoint_key)
+                if checkpoint is not None:
+                    self._restore_checkpoint(checkpoint)
+
+                self.rerun(_drop_nan(erf[i]) * ur(self._erf_unit))
+                self._scenario_checkpoints[checkpoint_key] = self._get_checkpoint()
+            else:
+                self.set_drivers(_drop_nan(erf[i]) * ur(self._erf_unit))
+                self.reset()
+                self.run()
+
+            if timer is not None and batched is None:
+                timer.stop("run", n_rows=1, n_steps=row_no_nan.shape[0])
 
             out_run_tss_base = row_no_nan.to_frame().T
             out_run_tss_base.index.names = driver_ts.index.names
 
             out_run_tss = [out_run_tss_base]
             out_run_tss += self._get_run_output_tss(out_run_tss[0])
+            if timer is not None:
+                timer.stop("create_ts", n_rows=len(out_run_tss) - 1)
 
             out_run = ScmRun(pd.concat(out_run_tss))
             out_run["run_idx"] = i
 
             run_store.append(out_run)
+            if timer is not None:
+                timer.stop("scenario_output", n_rows=len(out_run_tss))
+
+        if batched is not None:
+            self._erf = self._erf_mag * ur(self._erf_unit)
+            self._run_paras = self._get_paras_key()
+
+        if timer is not None:
+            timer.start()
 
         idx = run_store[0].meta.columns.tolist()
 
@@ -266,49 +732,135 @@ class TwoLayerVariant(Model):
             )
         )
 
+        if timer is not None:
+            timer.stop("concat", n_rows=out.shape[0])
+            timer.report()
+
+        return out
+
+    def _get_driver_magnitudes(self, driver_ts, ignore_meta=()):
+        """
+        Get the magnitudes of every row of ``driver_ts`` in ``self._erf_unit``
+
+        The rows are grouped by unit so there is only one conversion per
+        unit. All rows whose units can't be converted are reported in one
+        error, which doesn't show the metadata in ``ignore_meta``.
+        """
+        codes, units = driver_ts.index.get_level_values("unit").factorize()
+        values = driver_ts.values
+        out = np.empty(values.shape, dtype=float)
+        bad_rows = np.zeros(values.shape[0], dtype=bool)
+        for i, unit in enumerate(units):
+            rows = codes == i
+            try:
+                factor = get_conversion_factor(unit, self._erf_unit)
+            except (
+                pint.errors.DimensionalityError,
+                pint.errors.UndefinedUnitError,
+            ):
+                bad_rows |= rows
+                continue
+
+            if factor is None:
+                out[rows] = ur.Quantity(values[rows], unit).to(self._erf_unit).magnitude
+            else:
+                out[rows] = values[rows] * factor
+
+        if bad_rows.any():
+            raise UnitError(
+                "Wrong units for `erf`, cannot convert to {} in {} row(s):\n{}".format(
+                    self._erf_unit,
+                    bad_rows.sum(),
+                    driver_ts.index[bad_rows]
+                    .droplevel(list(ignore_meta))
+                    .to_frame(index=False)
+                    .to_string(index=False),
+                )
+            )
+
         return out
 
+    def _run_rows_batched(self, erf):
+        """
+        Run every row of ``erf`` in one pass of the model's batched kernel
+
+        Returns ``None`` if the model has no batched kernel, otherwise the
+        outputs (including ``"erf"``), with each row's values at the start of
+        the row, and the number of values in each row.
+        """
+        try:
+            kernel, _ = _get_kernel(self)
+        except NotImplementedError:
+            return None
+
+        erf, lengths = _pack_rows(erf)
+        erf = erf.astype(self.dtype, copy=False)
+
+        outputs = kernel(
+            erf, self._delta_t_mag, dtype=self.dtype, **_get_kernel_paras(self, {})
+        )
+        outputs["erf"] = erf
+
+        return outputs, lengths
+
     @abstractmethod
     def _get_run_output_tss(self, ts_base):
         """Get the run output timeseries as a list"""
 
 
-def _calculate_geoffroy_helper_parameters(  # pylint:disable=too-many-locals
+def _drop_nan(values):
+    return values[~np.isnan(values)]
+
+
+def _pack_rows(values):
+    # move each row's valid (non-nan) values to the start of the row, exactly
+    # as row.dropna() would, so that rows with different spans (or gaps) can
+    # be run in one batch. Each row's outputs only depend on earlier drivers
+    # so the padding after a row's values doesn't affect them.
+    valid = ~np.isnan(values)
+    order = np.argsort(~valid, axis=1, kind="stable")
+    packed = np.take_along_axis(values, order, axis=1)
+    lengths = valid.sum(axis=1)
+    packed[np.arange(values.shape[1]) >= lengths[:, np.newaxis]] = 0
+
+    return packed, lengths
+
+
+def _get_n_unchanged_outputs(erf_old, erf_new):
+    n_common = min(erf_old.shape[0], erf_new.shape[0])
+    changed = np.flatnonzero(erf_old[:n_common] != erf_new[:n_common])
+    first_change = changed[0] if changed.size else n_common
+
+    # the output at timestep i only depends on the drivers up to timestep i - 1
+    return min(first_change + 1, n_common)
+
+
+_GEOFFROY_HELPER_UNITS = {
+    "C": "J/delta_degC/m^2",
+    "C_D": "J/delta_degC/m^2",
+    "b": "1/s",
+    "b_star": "1/s",
+    "delta": "1/s^2",
+    "tau1": "s",
+    "tau2": "s",
+    "phi1": "dimensionless",
+    "phi2": "dimensionless",
+    "a1": "dimensionless",
+    "a2": "dimensionless",
+}
+
+
+def _calculate_geoffroy_helper_parameters(  # pylint:disable=too-many-arguments
     du, dl, lambda0, efficacy, eta
 ):
-    C = du * HEAT_CAPACITY_WATER * DENSITY_WATER
-    C_D = dl * HEAT_CAPACITY_WATER * DENSITY_WATER
-
-    b_pt1 = (lambda0 + efficacy * eta) / (C)
-    b_pt2 = (eta) / (C_D)
-    b = b_pt1 + b_pt2
-    b_star = b_pt1 - b_pt2
-    delta = b ** 2 - (4 * lambda0 * eta) / (C * C_D)
-
-    taucoeff = C * C_D / (2 * lambda0 * eta)
-    tau1 = taucoeff * (b - delta ** 0.5)
-    tau2 = taucoeff * (b + delta ** 0.5)
-
-    phicoeff = C / (2 * efficacy * eta)
-    phi1 = phicoeff * (b_star - delta ** 0.5)
-    phi2 = phicoeff * (b_star + delta ** 0.5)
-
-    adenom = C * (phi2 - phi1)
-    a1 = tau1 * phi2 * lambda0 / adenom
-    a2 = -tau2 * phi1 * lambda0 / adenom
-
-    out = {
-        "C": C,
-        "C_D": C_D,
-        "b": b,
-        "b_star": b_star,
-        "delta": delta,
-        "tau1": tau1,
-        "tau2": tau2,
-        "phi1": phi1,
-        "phi2": phi2,
-        "a1": a1,
-        "a2": a2,
-    }
-
-    return out
+    # pint wrapper of _numerics.calculate_geoffroy_helper_parameters, units are
+    # only attached to the results
+    gh = calculate_geoffroy_helper_parameters(
+        get_magnitude(du, "du", "m"),
+        get_magnitude(dl, "dl", "m"),
+        get_magnitude(lambda0, "lambda0", "W/m^2/delta_degC"),
+        get_magnitude(efficacy, "efficacy", "dimensionless"),
+        get_magnitude(eta, "eta", "W/m^2/delta_degC"),
+    )
+
+    return {k: v * ur(_GEOFFROY_HELPER_UNITS[k]) for k, v in gh.items()}
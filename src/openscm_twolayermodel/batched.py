@@ -0,0 +1,923 @@
+"""
+Module containing batched implementations of the models' numerics
+
+The functions in this module step many ensemble members (e.g. parameter sets,
+scenarios or stochastic realisations) forward in time at once. They operate on
+plain :obj:`np.ndarray` magnitudes in each model's internal units (e.g.
+``TwoLayerModel._du_unit``) so no unit handling happens inside the time loop.
+Time is always the last axis, all other axes are treated as ensemble axes and
+are broadcast against the parameters.
+"""
+import importlib
+import sys
+from functools import partial
+
+import numpy as np
+
+from ._numerics import (
+    calculate_impulse_response_rndt_paras,
+    calculate_next_box_temp,
+    calculate_next_temp_lower,
+    calculate_next_temp_upper,
+    calculate_next_two_layer_rndt,
+)
+from .constants import DENSITY_WATER_MAG, HEAT_CAPACITY_WATER_MAG
+from .errors import ModelStateError
+
+# The models, pint, xarray and dask are only imported when needed so that the
+# kernels can be used without importing pandas or scmdata.
+
+# pylint: disable=invalid-name,protected-access,import-outside-toplevel
+
+# J/delta_degC/m^2 per m i.e. TwoLayerModel._heat_capacity_upper_unit per
+# TwoLayerModel._du_unit
+_HEAT_CAPACITY_PER_DEPTH_MAG = DENSITY_WATER_MAG * HEAT_CAPACITY_WATER_MAG
+
+
+def _import_optional(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError:  # pragma: no cover
+        return None
+
+
+def _is_dask_array(data):
+    # dask arrays can only exist if dask has already been imported
+    da = sys.modules.get("dask.array")
+    return da is not None and isinstance(data, da.Array)
+
+
+def _get_output_shape(erf, paras, time_varying=()):
+    member_shape = np.broadcast_shapes(
+        np.shape(erf)[:-1],
+        *[np.shape(v) for v in paras],
+        *[np.shape(v)[:-1] for v in time_varying if v is not None],
+    )
+
+    return member_shape + np.shape(erf)[-1:]
+
+
+def _check_out(out, names, shape, dtype):
+    if out is None:
+        return {}
+
+    unknown = set(out) - set(names)
+    if unknown:
+        raise ValueError("Unknown outputs in out: {}".format(sorted(unknown)))
+
+    for k, v in out.items():
+        if v.shape != tuple(shape) or v.dtype != np.dtype(dtype):
+            raise ValueError(
+                "out[{!r}] must have shape {} and dtype {}, got {} and {}".format(
+                    k, tuple(shape), np.dtype(dtype), v.shape, v.dtype
+                )
+            )
+
+    return out
+
+
+def _get_outputs(out, names, shape, dtype):
+    # arrays from out are written to in place so that outputs can go straight
+    # into e.g. a preallocated ensemble matrix or a memory-mapped file
+    out = _check_out(out, names, shape, dtype)
+    res = {k: out[k] if k in out else np.empty(shape, dtype=dtype) for k in names}
+    for v in res.values():
+        v[..., :1] = 0
+
+    return res
+
+
+def _cast_paras(dtype, *paras):
+    # numpy scalars rather than python floats so that e.g. float32 inputs are
+    # not promoted to float64 during the calculations
+    return [np.asarray(v, dtype=dtype)[()] for v in paras]
+
+
+def run_two_layer(  # pylint:disable=too-many-arguments,too-many-locals
+    erf,
+    delta_t,
+    du,
+    dl,
+    lambda0,
+    a,
+    efficacy,
+    eta,
+    forcing_noise=None,
+    temperature_noise=None,
+    dtype=np.float64,
+    out=None,
+):
+    """
+    Run the two-layer model for a batch of ensemble members
+
+    The numerics are identical to :meth:`TwoLayerModel.run`. All inputs are
+    cast to ``dtype`` before the run so the whole calculation, not only the
+    storage, happens at the requested precision.
+
+    Parameters
+    ----------
+    erf : :obj:`np.ndarray`
+        Effective radiative forcing (``TwoLayerModel._erf_unit``), time must be
+        the last axis
+
+    delta_t : float
+        Timestep (``TwoLayerModel._delta_t_unit``)
+
+    du : float or :obj:`np.ndarray`
+        Depth of upper layer (``TwoLayerModel._du_unit``)
+
+    dl : float or :obj:`np.ndarray`
+        Depth of lower layer (``TwoLayerModel._dl_unit``)
+
+    lambda0 : float or :obj:`np.ndarray`
+        Initial climate feedback factor (``TwoLayerModel._lambda0_unit``)
+
+    a : float or :obj:`np.ndarray`
+        Dependence of climate feedback factor on temperature
+        (``TwoLayerModel._a_unit``)
+
+    efficacy : float or :obj:`np.ndarray`
+        Efficacy factor (``TwoLayerModel._efficacy_unit``)
+
+    eta : float or :obj:`np.ndarray`
+        Heat transport efficiency (``TwoLayerModel._eta_unit``)
+
+    forcing_noise : :obj:`np.ndarray`
+        Perturbation (``TwoLayerModel._erf_unit``) to add to ``erf`` before it
+        drives the model. If ``None``, no perturbation is applied.
+
+    temperature_noise : :obj:`np.ndarray`
+        Perturbation (``TwoLayerModel._temp_upper_unit``) to add to the upper
+        layer temperature at each step. If ``None``, no perturbation is applied.
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and outputs
+
+    out : dict of str : :obj:`np.ndarray`
+        Arrays to write (some of) the outputs into, e.g. views of a
+        preallocated ensemble matrix or of a :obj:`np.memmap`. Each must have
+        the shape of the output and ``dtype``. Outputs which aren't in
+        ``out`` are written to new arrays.
+
+    Returns
+    -------
+    dict of str : :obj:`np.ndarray`
+        ``"temp_upper"``, ``"temp_lower"`` and ``"rndt"``. The parameters must
+        broadcast against ``erf[..., 0]``, the outputs have the broadcast shape
+        plus the time axis.
+
+    Raises
+    ------
+    ValueError
+        ``out`` contains unknown outputs or arrays with the wrong shape or
+        dtype
+    """
+    out_shape = _get_output_shape(
+        erf, (du, dl, lambda0, a, efficacy, eta), (forcing_noise, temperature_noise)
+    )
+    n_time = out_shape[-1]
+
+    erf = np.broadcast_to(np.asarray(erf, dtype=dtype), out_shape)
+    if forcing_noise is not None:
+        erf = erf + np.asarray(forcing_noise, dtype=dtype)
+
+    if temperature_noise is not None:
+        temperature_noise = np.asarray(temperature_noise, dtype=dtype)
+
+    heat_capacity_upper, heat_capacity_lower = _cast_paras(
+        dtype,
+        np.multiply(du, _HEAT_CAPACITY_PER_DEPTH_MAG),
+        np.multiply(dl, _HEAT_CAPACITY_PER_DEPTH_MAG),
+    )
+    delta_t, lambda0, a, efficacy, eta = _cast_paras(
+        dtype, delta_t, lambda0, a, efficacy, eta
+    )
+
+    outputs = _get_outputs(out, ("temp_upper", "temp_lower", "rndt"), out_shape, dtype)
+    temp_upper = outputs["temp_upper"]
+    temp_lower = outputs["temp_lower"]
+    rndt = outputs["rndt"]
+
+    for i in range(1, n_time):
+        temp_upper[..., i] = calculate_next_temp_upper(
+            delta_t,
+            temp_upper[..., i - 1],
+            temp_lower[..., i - 1],
+            erf[..., i - 1],
+            lambda0,
+            a,
+            efficacy,
+            eta,
+            heat_capacity_upper,
+        )
+        if temperature_noise is not None:
+            temp_upper[..., i] += temperature_noise[..., i - 1]
+
+        temp_lower[..., i] = calculate_next_temp_lower(
+            delta_t,
+            temp_lower[..., i - 1],
+            temp_upper[..., i - 1],
+            eta,
+            heat_capacity_lower,
+        )
+
+        rndt[..., i] = calculate_next_two_layer_rndt(
+            delta_t,
+            temp_lower[..., i],
+            temp_lower[..., i - 1],
+            heat_capacity_lower,
+            temp_upper[..., i],
+            temp_upper[..., i - 1],
+            heat_capacity_upper,
+        )
+
+    return outputs
+
+
+def run_impulse_response(  # pylint:disable=too-many-arguments,too-many-locals
+    erf, delta_t, d1, d2, q1, q2, efficacy, dtype=np.float64, out=None
+):
+    """
+    Run the two-timescale impulse response model for a batch of ensemble members
+
+    The numerics are identical to :meth:`ImpulseResponseModel.run`.
+
+    Parameters
+    ----------
+    erf : :obj:`np.ndarray`
+        Effective radiative forcing (``ImpulseResponseModel._erf_unit``), time
+        must be the last axis
+
+    delta_t : float
+        Timestep (``ImpulseResponseModel._delta_t_unit``)
+
+    d1 : float or :obj:`np.ndarray`
+        Response timescale of first box (``ImpulseResponseModel._d1_unit``)
+
+    d2 : float or :obj:`np.ndarray`
+        Response timescale of second box (``ImpulseResponseModel._d2_unit``)
+
+    q1 : float or :obj:`np.ndarray`
+        Sensitivity of first box response to radiative forcing
+        (``ImpulseResponseModel._q1_unit``)
+
+    q2 : float or :obj:`np.ndarray`
+        Sensitivity of second box response to radiative forcing
+        (``ImpulseResponseModel._q2_unit``)
+
+    efficacy : float or :obj:`np.ndarray`
+        Efficacy factor (``ImpulseResponseModel._efficacy_unit``)
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and outputs
+
+    out : dict of str : :obj:`np.ndarray`
+        Arrays to write (some of) the outputs into (see
+        :func:`run_two_layer`)
+
+    Returns
+    -------
+    dict of str : :obj:`np.ndarray`
+        ``"temp1"``, ``"temp2"`` and ``"rndt"``. The parameters must broadcast
+        against ``erf[..., 0]``, the outputs have the broadcast shape plus the
+        time axis.
+
+    Raises
+    ------
+    ValueError
+        ``out`` contains unknown outputs or arrays with the wrong shape or
+        dtype
+    """
+    out_shape = _get_output_shape(erf, (d1, d2, q1, q2, efficacy))
+    n_time = out_shape[-1]
+
+    erf = np.broadcast_to(np.asarray(erf, dtype=dtype), out_shape)
+
+    lambda0, coeff1, coeff2 = _cast_paras(
+        dtype, *calculate_impulse_response_rndt_paras(q1, q2, d1, d2, efficacy)
+    )
+    delta_t, d1, d2, q1, q2 = _cast_paras(dtype, delta_t, d1, d2, q1, q2)
+
+    outputs = _get_outputs(out, ("temp1", "temp2", "rndt"), out_shape, dtype)
+    temp1 = outputs["temp1"]
+    temp2 = outputs["temp2"]
+    rndt = outputs["rndt"]
+
+    for i in range(1, n_time):
+        temp1[..., i] = calculate_next_box_temp(
+            delta_t, temp1[..., i - 1], q1, d1, erf[..., i - 1]
+        )
+        temp2[..., i] = calculate_next_box_temp(
+            delta_t, temp2[..., i - 1], q2, d2, erf[..., i - 1]
+        )
+        rndt[..., i] = (
+            erf[..., i - 1]
+            - lambda0 * (temp1[..., i - 1] + temp2[..., i - 1])
+            - (coeff1 * temp1[..., i - 1] + coeff2 * temp2[..., i - 1])
+        )
+
+    return outputs
+
+
+def draw_realisation_noise(seed, n_realisations, shape, first_realisation=0):
+    """
+    Draw standard normal noise for a batch of stochastic realisations
+
+    Realisation ``k`` draws from its own :obj:`np.random.Generator`, seeded
+    with the ``k``-th child of ``seed`` (i.e. the ``k``-th element of
+    ``np.random.SeedSequence(seed).spawn(...)``). As a result, realisation
+    ``k`` receives the same noise regardless of how the realisations are split
+    into batches, e.g. across parallel workers.
+
+    Parameters
+    ----------
+    seed : int or :obj:`np.random.SeedSequence` or None
+        Root seed. If ``None``, fresh entropy is used and the results are not
+        reproducible.
+
+    n_realisations : int
+        Number of realisations to draw noise for
+
+    shape : tuple of int
+        Shape of the noise for each realisation
+
+    first_realisation : int
+        Index of the first realisation in the batch
+
+    Returns
+    -------
+    :obj:`np.ndarray`
+        Noise with shape ``(n_realisations,) + shape``
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+
+    out = np.empty((n_realisations,) + tuple(shape))
+    for i in range(n_realisations):
+        child = np.random.SeedSequence(
+            seed.entropy,
+            spawn_key=seed.spawn_key + (first_realisation + i,),
+            pool_size=seed.pool_size,
+        )
+        out[i] = np.random.default_rng(child).standard_normal(shape)
+
+    return out
+
+
+def run_two_layer_stochastic(
+    model, n_realisations, seed=None, first_realisation=0, dtype=None
+):
+    """
+    Run stochastic realisations of a two-layer model in one batch
+
+    At each timestep, every realisation's forcing is perturbed by white noise
+    with standard deviation ``model.sigma_eta`` and its upper layer temperature
+    by white noise with standard deviation ``model.sigma_xi``. Both noise
+    streams are always drawn (see :func:`draw_realisation_noise`) so a
+    realisation's noise does not depend on which of the two is non-zero.
+
+    Parameters
+    ----------
+    model : :obj:`TwoLayerModel`
+        Model to run, its drivers must have been set with
+        :meth:`TwoLayerModel.set_drivers`
+
+    n_realisations : int
+        Number of realisations to run
+
+    seed : int or :obj:`np.random.SeedSequence` or None
+        Root seed for the noise
+
+    first_realisation : int
+        Index of the first realisation to run. Running realisations
+        ``[0, n)`` in one call gives the same results as running them in
+        several calls (e.g. on different workers) with the appropriate
+        ``first_realisation``.
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and outputs. If
+        ``None``, ``model.dtype`` is used. The noise is always drawn in double
+        precision so the realisations are the same whatever the value of
+        ``dtype``.
+
+    Returns
+    -------
+    dict of str : :obj:`np.ndarray`
+        ``"temp_upper"``, ``"temp_lower"`` and ``"rndt"``, each with shape
+        ``(n_realisations, n_timesteps)``
+
+    Raises
+    ------
+    ModelStateError
+        The model's drivers have not been set
+    """
+    if np.isnan(model.erf).any():
+        raise ModelStateError(
+            "The model's drivers have not been set yet, call "
+            ":meth:`self.set_drivers` first."
+        )
+
+    noise = draw_realisation_noise(
+        seed, n_realisations, (2, model._erf_mag.shape[-1]), first_realisation
+    )
+
+    return run_two_layer(
+        model._erf_mag,
+        model._delta_t_mag,
+        model._du_mag,
+        model._dl_mag,
+        model._lambda0_mag,
+        model._a_mag,
+        model._efficacy_mag,
+        model._eta_mag,
+        forcing_noise=model._sigma_eta_mag * noise[:, 0, :],
+        temperature_noise=model._sigma_xi_mag * noise[:, 1, :],
+        dtype=model.dtype if dtype is None else dtype,
+    )
+
+
+CONSTRAINT_CRITERIA = ("final", "running")
+"""tuple of str : Supported criteria for rejecting members in :func:`run_constrained`"""
+
+
+def run_constrained(  # pylint:disable=too-many-arguments,too-many-locals,too-many-statements
+    model,
+    observations,
+    tolerance,
+    paras=None,
+    criterion="final",
+    min_observations=1,
+    dtype=None,
+):
+    """
+    Run an ensemble of two-layer models, rejecting members which don't match observations
+
+    Each member's upper layer temperature is scored against ``observations``
+    as it is stepped through the observed period. Members whose score is out
+    of tolerance are dropped from the batch straight away so no further
+    timesteps are calculated for them.
+
+    Parameters
+    ----------
+    model : :obj:`TwoLayerModel`
+        Model to run, its drivers must have been set with
+        :meth:`TwoLayerModel.set_drivers`. Its parameters are used unless
+        overridden by ``paras``.
+
+    observations : :obj:`np.ndarray`
+        Observed temperature (``TwoLayerModel._temp_upper_unit``) on the
+        same time axis as the model's drivers (it may be shorter, and
+        ``np.nan`` values are ignored)
+
+    tolerance : float
+        Maximum root-mean-square error (``TwoLayerModel._temp_upper_unit``)
+        of accepted members
+
+    paras : dict of str : float or :obj:`np.ndarray`
+        Parameter values (magnitudes in the model's internal units) to use
+        instead of ``model``'s, arrays must be one-dimensional with one value
+        per ensemble member
+
+    criterion : str
+        ``"final"`` rejects a member as soon as its root-mean-square error
+        over all the observations is certain to exceed ``tolerance``, so the
+        accepted members are exactly those which would be accepted after
+        running every member to the end. ``"running"`` rejects a member as
+        soon as its root-mean-square error over the observations so far
+        exceeds ``tolerance`` (once it has been compared with at least
+        ``min_observations`` observations), which rejects members earlier.
+
+    min_observations : int
+        Minimum number of observations before members can be rejected with
+        the ``"running"`` criterion
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and outputs. If
+        ``None``, ``model.dtype`` is used.
+
+    Returns
+    -------
+    dict of str : :obj:`np.ndarray`
+        ``"accepted"``, whether each member was accepted, ``"rmse"``, each
+        member's root-mean-square error over the observations it was
+        compared with, and ``"n_timesteps"``, the number of timesteps
+        calculated for each member, each with shape ``(n_members,)``, plus
+        the outputs (``"temp_upper"``, ``"temp_lower"`` and ``"rndt"``) of
+        the accepted members, with shape ``(n_accepted, n_timesteps)``
+
+    Raises
+    ------
+    ModelStateError
+        The model's drivers have not been set
+
+    ValueError
+        ``criterion`` is not supported, ``paras`` contains unknown
+        parameters or ``observations`` is longer than the model's drivers
+    """
+    if criterion not in CONSTRAINT_CRITERIA:
+        raise ValueError(
+            "criterion must be one of {}, got {}".format(CONSTRAINT_CRITERIA, criterion)
+        )
+
+    if np.isnan(model.erf).any():
+        raise ModelStateError(
+            "The model's drivers have not been set yet, call "
+            ":meth:`self.set_drivers` first."
+        )
+
+    paras = {} if paras is None else paras
+    unknown_paras = set(paras) - set(model._save_paras)
+    if unknown_paras:
+        raise ValueError("Unknown parameters: {}".format(sorted(unknown_paras)))
+
+    dtype = model.dtype if dtype is None else np.dtype(dtype)
+    erf = model._erf_mag.astype(dtype)
+    n_time = erf.shape[0]
+
+    observations = np.asarray(observations, dtype=float)
+    if observations.shape[0] > n_time:
+        raise ValueError("observations must not be longer than the model's drivers")
+
+    observations = np.concatenate(
+        [observations, np.full(n_time - observations.shape[0], np.nan)]
+    )
+    n_observations = np.sum(~np.isnan(observations))
+    last_observation = np.max(np.nonzero(~np.isnan(observations))[0], initial=-1)
+    # compare sums of squares rather than root-mean-square errors
+    max_sse = tolerance ** 2 * n_observations
+
+    paras = _get_kernel_paras(model, paras)
+    n_members = np.broadcast_shapes(*[np.shape(v) for v in paras.values()] + [(1,)])[0]
+    paras = {k: np.broadcast_to(v, (n_members,)) for k, v in paras.items()}
+    active_paras = dict(
+        zip(
+            (
+                "heat_capacity_upper",
+                "heat_capacity_lower",
+                "lambda0",
+                "a",
+                "efficacy",
+                "eta",
+            ),
+            _cast_paras(
+                dtype,
+                paras["du"] * _HEAT_CAPACITY_PER_DEPTH_MAG,
+                paras["dl"] * _HEAT_CAPACITY_PER_DEPTH_MAG,
+                paras["lambda0"],
+                paras["a"],
+                paras["efficacy"],
+                paras["eta"],
+            ),
+        )
+    )
+    (delta_t,) = _cast_paras(dtype, model._delta_t_mag)
+
+    outputs = {
+        k: np.zeros((n_members, n_time), dtype=dtype) for k in model._output_vars
+    }
+    active = np.arange(n_members)
+    temp_upper = np.zeros(n_members, dtype=dtype)
+    temp_lower = np.zeros(n_members, dtype=dtype)
+    sse = np.zeros(n_members)
+    n_compared = 0
+
+    final_sse = np.zeros(n_members)
+    n_timesteps = np.full(n_members, n_time)
+    accepted = np.ones(n_members, dtype=bool)
+
+    for i in range(n_time):
+        if i > 0:
+            temp_upper_next = calculate_next_temp_upper(
+                delta_t,
+                temp_upper,
+                temp_lower,
+                erf[i - 1],
+                active_paras["lambda0"],
+                active_paras["a"],
+                active_paras["efficacy"],
+                active_paras["eta"],
+                active_paras["heat_capacity_upper"],
+            )
+            temp_lower_next = calculate_next_temp_lower(
+                delta_t,
+                temp_lower,
+                temp_upper,
+                active_paras["eta"],
+                active_paras["heat_capacity_lower"],
+            )
+            outputs["rndt"][active, i] = calculate_next_two_layer_rndt(
+                delta_t,
+                temp_lower_next,
+                temp_lower,
+                active_paras["heat_capacity_lower"],
+                temp_upper_next,
+                temp_upper,
+                active_paras["heat_capacity_upper"],
+            )
+            temp_upper, temp_lower = temp_upper_next, temp_lower_next
+            outputs["temp_upper"][active, i] = temp_upper
+            outputs["temp_lower"][active, i] = temp_lower
+
+        if i > last_observation or np.isnan(observations[i]):
+            continue
+
+        sse += (temp_upper - observations[i]) ** 2
+        n_compared += 1
+
+        if criterion == "final":
+            reject = sse > max_sse
+        elif n_compared >= min_observations:
+            reject = sse > tolerance ** 2 * n_compared
+        else:
+            continue
+
+        if reject.any():
+            rejected = active[reject]
+            accepted[rejected] = False
+            final_sse[rejected] = sse[reject] / n_compared
+            n_timesteps[rejected] = i + 1
+
+            keep = ~reject
+            active = active[keep]
+            temp_upper = temp_upper[keep]
+            temp_lower = temp_lower[keep]
+            sse = sse[keep]
+            active_paras = {k: v[keep] for k, v in active_paras.items()}
+
+        if not active.size:
+            break
+
+    final_sse[active] = sse / max(n_compared, 1)
+
+    out = {
+        "accepted": accepted,
+        "rmse": np.sqrt(final_sse),
+        "n_timesteps": n_timesteps,
+    }
+    out.update({k: v[accepted] for k, v in outputs.items()})
+
+    return out
+
+
+_KERNELS = {
+    "two_layer": (
+        run_two_layer,
+        {
+            "temp_upper": "Surface Temperature|Upper",
+            "temp_lower": "Surface Temperature|Lower",
+            "rndt": "Heat Uptake",
+        },
+    ),
+    "two_timescale_impulse_response": (
+        run_impulse_response,
+        {
+            "temp1": "Surface Temperature|Box 1",
+            "temp2": "Surface Temperature|Box 2",
+            "rndt": "Heat Uptake",
+        },
+    ),
+}
+
+
+def _get_kernel(model):
+    # keyed by model name so that the model classes don't have to be imported
+    try:
+        return _KERNELS[model._name]
+    except (AttributeError, KeyError):
+        pass
+
+    raise NotImplementedError(
+        "No batched implementation available for {}".format(type(model))
+    )
+
+
+def _get_kernel_paras(model, paras):
+    return {
+        k: paras.get(k, getattr(model, "_{}_mag".format(k))) for k in model._save_paras
+    }
+
+
+def _run_kernel_block(erf, *paras, kernel, names, outputs, delta_t, dtype):
+    # parameter blocks carry a length one time axis so that dask aligns their
+    # blocks with the forcing blocks
+    res = kernel(
+        erf, delta_t, dtype=dtype, **{n: p[..., 0] for n, p in zip(names, paras)}
+    )
+
+    return np.stack([res[k] for k in outputs])
+
+
+def run_blocks(model, erf, paras=None, dtype=None):
+    """
+    Lazily run a model over the blocks of a :obj:`dask.array.Array`
+
+    The model's batched kernel is mapped over the blocks of ``erf``, which may
+    be chunked along any of its ensemble (i.e. non-time) axes. The time axis
+    is rechunked to a single chunk as each block must contain complete
+    timeseries. Nothing is computed until the outputs are, e.g. when they are
+    written to disk with :meth:`xarray.Dataset.to_zarr` or
+    :meth:`xarray.Dataset.to_netcdf`, so ensembles larger than memory can be
+    run.
+
+    Parameters
+    ----------
+    model : :obj:`TwoLayerModel` or :obj:`ImpulseResponseModel`
+        Model to run. Its parameters are used unless overridden by ``paras``,
+        its timestep is always used.
+
+    erf : :obj:`dask.array.Array` or :obj:`np.ndarray`
+        Effective radiative forcing (``model._erf_unit``), time must be the
+        last axis
+
+    paras : dict of str : float or :obj:`np.ndarray` or :obj:`dask.array.Array`
+        Parameter values (magnitudes in the model's internal units) to use
+        instead of ``model``'s, they must broadcast against ``erf[..., 0]``
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and outputs. If
+        ``None``, ``model.dtype`` is used.
+
+    Returns
+    -------
+    dict of str : :obj:`dask.array.Array`
+        Lazy model output, with the same keys as the model's batched kernel
+        (e.g. :func:`run_two_layer`)
+
+    Raises
+    ------
+    ImportError
+        :mod:`dask` is not installed
+    """
+    da = _import_optional("dask.array")
+    if da is None:  # pragma: no cover
+        raise ImportError("dask is not installed. Run 'pip install dask[array]'")
+
+    kernel, variables = _get_kernel(model)
+    paras = _get_kernel_paras(model, {} if paras is None else paras)
+    dtype = model.dtype if dtype is None else np.dtype(dtype)
+
+    out_shape = _get_output_shape(erf, paras.values())
+    erf = da.broadcast_to(da.asarray(erf), out_shape).rechunk({len(out_shape) - 1: -1})
+    para_chunks = erf.chunks[:-1] + ((1,),)
+    para_blocks = [
+        da.broadcast_to(da.asarray(v)[..., np.newaxis], out_shape[:-1] + (1,)).rechunk(
+            para_chunks
+        )
+        for v in paras.values()
+    ]
+
+    outputs = list(variables)
+    res = da.map_blocks(
+        partial(
+            _run_kernel_block,
+            kernel=kernel,
+            names=list(paras),
+            outputs=outputs,
+            delta_t=model._delta_t_mag,
+            dtype=dtype,
+        ),
+        erf,
+        *para_blocks,
+        dtype=dtype,
+        new_axis=0,
+        chunks=((len(outputs),),) + erf.chunks,
+        meta=np.empty((0,) * (len(out_shape) + 1), dtype=dtype),
+    )
+
+    return {k: res[i] for i, k in enumerate(outputs)}
+
+
+def _align_to_dims(data, data_dims, target_dims):
+    # order the axes of data as in target_dims, then insert length one axes for
+    # the target dims which data doesn't have so that it broadcasts
+    present = [d for d in target_dims if d in data_dims]
+    if not _is_dask_array(data):
+        data = np.asarray(data)
+
+    data = data.transpose([data_dims.index(d) for d in present])
+    shape = [data.shape[present.index(d)] if d in present else 1 for d in target_dims]
+
+    return data.reshape(shape)
+
+
+def run_array(  # pylint:disable=too-many-locals
+    model, forcing, dims=None, paras=None, dtype=None
+):
+    """
+    Run a model directly on arrays, bypassing :obj:`ScmRun`
+
+    No :mod:`pandas` objects are created so this is much faster than
+    :meth:`TwoLayerVariant.run_scenarios` for large ensembles. If ``forcing``
+    or any of ``paras`` are backed by :mod:`dask` arrays, the run is lazy (see
+    :func:`run_blocks`).
+
+    Parameters
+    ----------
+    model : :obj:`TwoLayerModel` or :obj:`ImpulseResponseModel`
+        Model to run. Its parameters are used unless overridden by ``paras``,
+        its timestep is always used.
+
+    forcing : :obj:`xarray.DataArray` or :obj:`np.ndarray` or :obj:`dask.array.Array`
+        Effective radiative forcing. If not a :obj:`xarray.DataArray`, it must be in
+        ``model._erf_unit``. If a :obj:`xarray.DataArray` with a ``"units"``
+        attribute, it is converted to ``model._erf_unit``.
+
+    dims : tuple of str
+        Names of the dimensions of ``forcing``, one of which must be
+        ``"time"``. Ignored if ``forcing`` is a :obj:`xarray.DataArray`. If
+        ``None``, the last axis is assumed to be time and the other axes are
+        called ``"dim_0"``, ``"dim_1"`` etc.
+
+    paras : dict of str : float or :obj:`np.ndarray` or :obj:`xarray.DataArray`
+        Parameter values (magnitudes in the model's internal units e.g.
+        ``model._du_unit``) to use instead of ``model``'s. :obj:`np.ndarray`
+        values follow numpy's broadcasting rules against the non-time output
+        dimensions, :obj:`xarray.DataArray` values are aligned by dimension
+        name and can add new dimensions (e.g. ``"member"``).
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and outputs. If
+        ``None``, ``model.dtype`` is used.
+
+    Returns
+    -------
+    :obj:`xarray.Dataset` or dict of str : :obj:`np.ndarray`
+        Model output, with time as the last dimension. If :mod:`xarray` is
+        not installed, a dictionary of :obj:`np.ndarray` is returned instead.
+
+    Raises
+    ------
+    ValueError
+        ``forcing`` has no ``"time"`` dimension or ``paras`` contains unknown
+        parameters
+    """
+    xr = _import_optional("xarray")
+    kernel, variables = _get_kernel(model)
+    paras = {} if paras is None else paras
+
+    unknown_paras = set(paras) - set(model._save_paras)
+    if unknown_paras:
+        raise ValueError("Unknown parameters: {}".format(sorted(unknown_paras)))
+
+    coords = {}
+    if xr is not None and isinstance(forcing, xr.DataArray):
+        dims = forcing.dims
+        coords.update(forcing.coords)
+        if "units" in forcing.attrs:
+            from ._units import get_conversion_factor
+
+            conv = get_conversion_factor(forcing.attrs["units"], model._erf_unit)
+            forcing = forcing.data * conv
+        else:
+            forcing = forcing.data
+
+    elif dims is None:
+        dims = tuple("dim_{}".format(i) for i in range(np.ndim(forcing) - 1)) + (
+            "time",
+        )
+
+    if "time" not in dims:
+        raise ValueError("forcing must have a `time` dimension")
+
+    member_dims = [d for d in dims if d != "time"]
+    for v in paras.values():
+        if xr is not None and isinstance(v, xr.DataArray):
+            member_dims += [d for d in v.dims if d not in member_dims]
+            coords.update(v.coords)
+
+    out_dims = tuple(member_dims) + ("time",)
+
+    kernel_paras = _get_kernel_paras(model, paras)
+    for k, v in kernel_paras.items():
+        if xr is not None and isinstance(v, xr.DataArray):
+            kernel_paras[k] = _align_to_dims(v.data, v.dims, member_dims)
+
+    forcing = _align_to_dims(forcing, tuple(dims), out_dims)
+    if _is_dask_array(forcing) or any(_is_dask_array(v) for v in kernel_paras.values()):
+        res = run_blocks(model, forcing, paras=kernel_paras, dtype=dtype)
+    else:
+        res = kernel(
+            forcing,
+            model._delta_t_mag,
+            **kernel_paras,
+            dtype=model.dtype if dtype is None else dtype,
+        )
+
+    if xr is None:  # pragma: no cover
+        return res
+
+    return xr.Dataset(
+        {
+            k: xr.DataArray(
+                res[k],
+                dims=out_dims,
+                attrs={
+                    "units": getattr(model, "_{}_unit".format(k)),
+                    "long_name": variable,
+                },
+            )
+            for k, variable in variables.items()
+        },
+        coords={k: v for k, v in coords.items() if set(v.dims) <= set(out_dims)},
+        attrs={"climate_model": model._name},
+    )
@@ -0,0 +1,347 @@
+"""
+Calibration of the two-layer model against abrupt-4xCO2 experiments
+
+The calibration is done for many (e.g. CMIP) models at once. First, initial
+parameter estimates are derived with the analytic method of
+`Geoffroy et al. 2013a <https://doi.org/10.1175/JCLI-D-12-00195.1>`_,
+including the efficacy factor as in
+`Geoffroy et al. 2013b <https://doi.org/10.1175/JCLI-D-12-00196.1>`_. Then,
+these estimates are refined with a least-squares fit (Levenberg-Marquardt) of
+the :mod:`openscm_twolayermodel.batched` kernel to the temperature and heat
+uptake time series. Every step is vectorised over the models being calibrated.
+
+The inputs must be annual mean anomalies relative to the control run, with
+the first value being the first year after the abrupt increase in |CO2|.
+Year :math:`k` (counting from one) is compared with the model's state after
+:math:`k` timesteps.
+"""
+import numpy as np
+import pandas as pd
+from openscm_units import unit_registry as ur
+
+from .batched import _HEAT_CAPACITY_PER_DEPTH_MAG, run_two_layer
+from .constants import SECONDS_PER_YEAR
+from .two_layer_model import TwoLayerModel
+
+# pylint: disable=invalid-name,protected-access
+
+_REFINED_PARAS = ("du", "dl", "lambda0", "efficacy", "eta", "f4x")
+
+
+def _regress(y, *x):
+    # least-squares fit of y = b_0 + b_1 x_1 + ... for each row (model) at once
+    design = np.stack([np.ones_like(y)] + list(x), axis=-1)
+    return np.linalg.solve(
+        np.einsum("mti,mtj->mij", design, design), np.einsum("mti,mt->mi", design, y),
+    )
+
+
+def _fit_timescales(temperature, ecs, n_fast, start_slow):
+    # Geoffroy et al. 2013a, section 4: the slow mode dominates after
+    # start_slow years, the fast mode is then estimated from the first n_fast
+    # years
+    time = np.arange(1, temperature.shape[-1] + 1)
+    tiny = np.finfo(float).tiny
+
+    slow = time >= start_slow
+    coeffs = _regress(
+        np.log(np.maximum(ecs[:, np.newaxis] - temperature[:, slow], tiny)),
+        np.broadcast_to(time[slow], temperature[:, slow].shape),
+    )
+    tau_slow = -1 / coeffs[:, 1]
+    a_slow = np.exp(coeffs[:, 0]) / ecs
+    a_fast = 1 - a_slow
+
+    fast = time <= n_fast
+    fast_remainder = (
+        1
+        - temperature[:, fast] / ecs[:, np.newaxis]
+        - a_slow[:, np.newaxis] * np.exp(-time[fast] / tau_slow[:, np.newaxis])
+    )
+    tau_fast = np.mean(
+        time[fast]
+        / (
+            np.log(np.maximum(a_fast, tiny))[:, np.newaxis]
+            - np.log(np.maximum(fast_remainder, tiny))
+        ),
+        axis=-1,
+    )
+
+    return a_fast, a_slow, tau_fast, tau_slow
+
+
+def _calculate_deep_temperature(temperature, gamma_over_c0):
+    temp_deep = np.zeros_like(temperature)
+    for i in range(1, temperature.shape[-1]):
+        temp_deep[:, i] = temp_deep[:, i - 1] + gamma_over_c0 * (
+            temperature[:, i - 1] - temp_deep[:, i - 1]
+        )
+
+    return temp_deep
+
+
+def _estimate_heat_capacities(temperature, f4x, lambda0, n_fast, start_slow):
+    a_fast, a_slow, tau_fast, tau_slow = _fit_timescales(
+        temperature, f4x / lambda0, n_fast, start_slow
+    )
+
+    # heat capacities (W yr / m^2 / K) and heat exchange coefficient of the
+    # model without efficacy which has the same temperature response, i.e.
+    # C0' = efficacy * C0 and gamma' = efficacy * gamma
+    heat_capacity_upper = lambda0 / (a_fast / tau_fast + a_slow / tau_slow)
+    heat_capacity_lower_eff = (
+        lambda0 * (tau_fast * a_fast + tau_slow * a_slow) - heat_capacity_upper
+    )
+    eta_eff = heat_capacity_lower_eff / (tau_fast * a_slow + tau_slow * a_fast)
+
+    return heat_capacity_upper, heat_capacity_lower_eff, eta_eff
+
+
+def _estimate_parameters(temperature, rndt, n_iterations, n_fast, start_slow):
+    # Geoffroy et al. 2013a estimate (efficacy of one), then the efficacy is
+    # re-estimated n_iterations times as in Geoffroy et al. 2013b
+    coeffs = _regress(rndt, temperature)
+    f4x = coeffs[:, 0]
+    lambda0 = -coeffs[:, 1]
+    efficacy = np.ones_like(f4x)
+    heat_capacity_upper, heat_capacity_lower_eff, eta_eff = _estimate_heat_capacities(
+        temperature, f4x, lambda0, n_fast, start_slow
+    )
+
+    for _ in range(n_iterations):
+        # N = F - lambda0 T - (efficacy - 1) / efficacy * gamma' (T - T0)
+        deep_flux = eta_eff[:, np.newaxis] * (
+            temperature
+            - _calculate_deep_temperature(
+                temperature, eta_eff / heat_capacity_lower_eff
+            )
+        )
+        coeffs = _regress(rndt, temperature, deep_flux)
+        f4x = coeffs[:, 0]
+        lambda0 = -coeffs[:, 1]
+        efficacy = 1 / (1 + coeffs[:, 2])
+
+        (
+            heat_capacity_upper,
+            heat_capacity_lower_eff,
+            eta_eff,
+        ) = _estimate_heat_capacities(temperature, f4x, lambda0, n_fast, start_slow)
+
+    return {
+        "du": heat_capacity_upper * SECONDS_PER_YEAR / _HEAT_CAPACITY_PER_DEPTH_MAG,
+        "dl": heat_capacity_lower_eff
+        / efficacy
+        * SECONDS_PER_YEAR
+        / _HEAT_CAPACITY_PER_DEPTH_MAG,
+        "lambda0": lambda0,
+        "efficacy": efficacy,
+        "eta": eta_eff / efficacy,
+        "f4x": f4x,
+    }
+
+
+def _get_residuals(log_paras, temperature, rndt, rndt_weight):
+    # log_paras has shape (..., n_models, n_paras)
+    paras = dict(zip(_REFINED_PARAS, np.moveaxis(np.exp(log_paras), -1, 0)))
+    n_time = temperature.shape[-1]
+
+    res = run_two_layer(
+        np.broadcast_to(
+            paras.pop("f4x")[..., np.newaxis], paras["du"].shape + (n_time + 1,)
+        ),
+        SECONDS_PER_YEAR,
+        a=0,
+        **paras,
+    )
+
+    return np.concatenate(
+        [
+            res["temp_upper"][..., 1:] - temperature,
+            rndt_weight * (res["rndt"][..., 1:] - rndt),
+        ],
+        axis=-1,
+    )
+
+
+def _refine_parameters(  # pylint:disable=too-many-locals
+    paras, temperature, rndt, rndt_weight, max_iter
+):
+    log_paras = np.log(np.stack([paras[k] for k in _REFINED_PARAS], axis=-1))
+    n_paras = log_paras.shape[-1]
+    step = 1e-6
+
+    residuals = _get_residuals(log_paras, temperature, rndt, rndt_weight)
+    cost = np.sum(residuals ** 2, axis=-1)
+    damping = np.full(cost.shape, 1e-3)
+    for _ in range(max_iter):
+        # the perturbed runs for the finite-difference Jacobian are all done in
+        # one batch
+        perturbed = log_paras + step * np.eye(n_paras)[:, np.newaxis, :]
+        jacobian = (
+            _get_residuals(perturbed, temperature, rndt, rndt_weight) - residuals
+        ) / step
+        jacobian = np.moveaxis(jacobian, 0, -1)
+
+        jtj = np.einsum("mti,mtj->mij", jacobian, jacobian)
+        jtr = np.einsum("mti,mt->mi", jacobian, residuals)
+        lhs = jtj + damping[:, np.newaxis, np.newaxis] * (
+            jtj * np.eye(n_paras) + 1e-12 * np.eye(n_paras)
+        )
+        candidate = log_paras - np.linalg.solve(lhs, jtr[..., np.newaxis])[..., 0]
+
+        candidate_residuals = _get_residuals(candidate, temperature, rndt, rndt_weight)
+        candidate_cost = np.sum(candidate_residuals ** 2, axis=-1)
+
+        improved = candidate_cost < cost
+        converged = np.abs(cost - candidate_cost) <= 1e-10 * cost
+        log_paras = np.where(improved[:, np.newaxis], candidate, log_paras)
+        residuals = np.where(improved[:, np.newaxis], candidate_residuals, residuals)
+        cost = np.where(improved, candidate_cost, cost)
+        damping = np.where(improved, damping / 3, damping * 2)
+
+        if np.all(converged):
+            break
+
+    return dict(zip(_REFINED_PARAS, np.moveaxis(np.exp(log_paras), -1, 0)))
+
+
+def calibrate_two_layer_model(  # pylint:disable=too-many-arguments,too-many-locals
+    temperature,
+    rndt,
+    refine=True,
+    rndt_weight=1.0,
+    n_efficacy_iterations=5,
+    n_fast=10,
+    start_slow=30,
+    max_iter=50,
+):
+    """
+    Calibrate :obj:`TwoLayerModel` against abrupt-4xCO2 output of many models
+
+    Parameters
+    ----------
+    temperature : :obj:`pd.DataFrame` or :obj:`np.ndarray`
+        Annual mean surface air temperature anomalies (delta_degC), one row
+        per model to calibrate and one column per year. If a
+        :obj:`pd.DataFrame`, its index is used to label the results.
+
+    rndt : :obj:`pd.DataFrame` or :obj:`np.ndarray`
+        Annual mean heat uptake i.e. net downward radiative flux at the top
+        of the atmosphere (W/m^2), same shape as ``temperature``
+
+    refine : bool
+        Should the analytic estimates be refined with a least-squares fit of
+        the model to ``temperature`` and ``rndt``? If ``False``, only the
+        analytic estimates are returned.
+
+    rndt_weight : float
+        Weight (delta_degC / (W/m^2)) of the heat uptake residuals relative
+        to the temperature residuals in the least-squares fit
+
+    n_efficacy_iterations : int
+        Number of iterations used to estimate the efficacy factor in the
+        analytic step. If zero, the analytic step is the method of Geoffroy et
+        al. (2013a) i.e. the efficacy is one.
+
+    n_fast : int
+        Number of years used to estimate the fast response timescale in the
+        analytic step
+
+    start_slow : int
+        First year used to estimate the slow response timescale in the
+        analytic step
+
+    max_iter : int
+        Maximum number of least-squares iterations
+
+    Returns
+    -------
+    :obj:`pd.DataFrame`
+        One row per model. The columns are the parameters of
+        :obj:`TwoLayerModel` (``TwoLayerModel._save_paras``, in the model's
+        internal units), ``"f4x"``, the forcing (W/m^2) in the
+        abrupt-4xCO2 experiment, and ``"ecs"``, the equilibrium climate
+        sensitivity (delta_degC) i.e. the equilibrium warming for a doubling
+        of |CO2|, assuming the forcing due to a doubling is half of
+        ``"f4x"`` (as in
+        :func:`openscm_twolayermodel.diagnostics.calculate_two_layer_metrics`).
+        The parameter columns can be passed to
+        :func:`openscm_twolayermodel.batched.run_array` (as ``paras``) or
+        turned into models with :func:`get_calibrated_models`.
+
+    Raises
+    ------
+    ValueError
+        ``temperature`` and ``rndt`` have different shapes or there are too
+        few years to estimate the slow response timescale
+    """
+    index = temperature.index if isinstance(temperature, pd.DataFrame) else None
+    temperature = np.atleast_2d(np.asarray(temperature, dtype=float))
+    rndt = np.atleast_2d(np.asarray(rndt, dtype=float))
+
+    if temperature.shape != rndt.shape:
+        raise ValueError(
+            "temperature and rndt must have the same shape, got {} and {}".format(
+                temperature.shape, rndt.shape
+            )
+        )
+
+    if temperature.shape[-1] < start_slow + 1:
+        raise ValueError(
+            "At least {} years are required to estimate the slow response "
+            "timescale".format(start_slow + 1)
+        )
+
+    paras = _estimate_parameters(
+        temperature, rndt, n_efficacy_iterations, n_fast, start_slow
+    )
+    if refine:
+        paras = _refine_parameters(paras, temperature, rndt, rndt_weight, max_iter)
+
+    out = pd.DataFrame(
+        {
+            "du": paras["du"],
+            "dl": paras["dl"],
+            "lambda0": paras["lambda0"],
+            "a": 0.0,
+            "efficacy": paras["efficacy"],
+            "eta": paras["eta"],
+            "f4x": paras["f4x"],
+            "ecs": paras["f4x"] / 2 / paras["lambda0"],
+        },
+        index=index,
+    )
+
+    return out
+
+
+def get_calibrated_models(table, delta_t=1 * ur("yr")):
+    """
+    Create models from a table of calibrated parameters
+
+    Parameters
+    ----------
+    table : :obj:`pd.DataFrame`
+        Calibrated parameters e.g. the output of
+        :func:`calibrate_two_layer_model`. Columns other than
+        ``TwoLayerModel._save_paras`` are ignored.
+
+    delta_t : :obj:`pint.Quantity`
+        Timestep of the models
+
+    Returns
+    -------
+    dict
+        :obj:`TwoLayerModel` for each row of ``table``, keyed by ``table``'s
+        index
+    """
+    return {
+        label: TwoLayerModel(
+            delta_t=delta_t,
+            **{
+                k: row[k] * ur(getattr(TwoLayerModel, "_{}_unit".format(k)))
+                for k in TwoLayerModel._save_paras
+            },
+        )
+        for label, row in table.iterrows()
+    }
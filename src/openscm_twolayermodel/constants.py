@@ -1,10 +1,42 @@
 """
 Physical constants used in calculations
+
+``DENSITY_WATER`` and ``HEAT_CAPACITY_WATER`` are :obj:`pint.Quantity`. They
+are only created when first accessed, so the plain float magnitudes (suffixed
+with ``_MAG``) can be used without importing :mod:`pint` or the unit registry.
+
+- ``DENSITY_WATER`` (:obj:`pint.Quantity`): density of water
+- ``HEAT_CAPACITY_WATER`` (:obj:`pint.Quantity`): heat capacity of water
 """
-from openscm_units import unit_registry as ur
 
-DENSITY_WATER = 1000 * ur("kg/m^3")
-""":obj:`pint.Quantity` : density of water"""
+DENSITY_WATER_MAG = 1000.0
+"""float : density of water (kg/m^3)"""
+
+HEAT_CAPACITY_WATER_MAG = 4181.0
+"""float : heat capacity of water (J/delta_degC/kg)"""
+
+SECONDS_PER_YEAR = 365.25 * 24 * 60 * 60
+"""float : number of seconds in a year, as defined in the unit registry"""
+
+_QUANTITIES = {
+    "DENSITY_WATER": (DENSITY_WATER_MAG, "kg/m^3"),
+    "HEAT_CAPACITY_WATER": (HEAT_CAPACITY_WATER_MAG, "J/delta_degC/kg"),
+}
+
+
+def __getattr__(name):
+    if name not in _QUANTITIES:
+        raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+    from openscm_units import (  # pylint:disable=import-outside-toplevel
+        unit_registry as ur,
+    )
+
+    magnitude, unit = _QUANTITIES[name]
+    value = globals()[name] = magnitude * ur(unit)
+
+    return value
+
 
-HEAT_CAPACITY_WATER = 4181 * ur("J/delta_degC/kg")
-""":obj:`pint.Quantity` : heat capacity of water"""
+def __dir__():
+    return sorted(list(globals()) + list(_QUANTITIES))
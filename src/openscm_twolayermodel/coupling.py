@@ -0,0 +1,245 @@
+"""
+Module containing interfaces for driving the models from an external time loop
+
+These are intended for coupling with e.g. integrated assessment models, which
+call the climate module once per period with that period's forcing. Unlike
+:meth:`TwoLayerVariant.step`, the forcing does not have to be known in advance.
+All state is held in preallocated :obj:`np.ndarray` and the parameters are
+converted to magnitudes once, in :meth:`Coupler.init`, so each call to
+:meth:`Coupler.advance` only does a handful of in-place array operations.
+"""
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from ._numerics import calculate_impulse_response_rndt_paras
+from .batched import _HEAT_CAPACITY_PER_DEPTH_MAG
+from .errors import ModelStateError
+
+# pylint: disable=invalid-name,protected-access
+
+
+class Coupler(ABC):
+    """
+    Base class for coupling interfaces
+
+    Like the models, the forward-differencing approach means that the
+    temperatures returned by :meth:`advance` are the start of timestep values
+    of the next timestep, i.e. the first call returns the temperature after
+    one timestep of forcing.
+    """
+
+    def __init__(self, model):
+        """
+        Initialise
+
+        Parameters
+        ----------
+        model : :obj:`TwoLayerVariant`
+            Model to couple. Its parameters are used unless overridden in
+            :meth:`init`, its timestep is always used.
+        """
+        self.model = model
+        self._n_members = None
+
+    @property
+    def n_members(self):
+        """
+        :obj:`int`
+            Number of ensemble members being stepped
+        """
+        return self._n_members
+
+    def init(self, n_members, paras=None):
+        """
+        Initialise the state for a new run
+
+        Parameters
+        ----------
+        n_members : int
+            Number of ensemble members to step at once
+
+        paras : dict of str : float or :obj:`np.ndarray`
+            Parameter values (magnitudes in the model's internal units e.g.
+            ``TwoLayerModel._du_unit``) to use instead of the model's, arrays
+            must have shape ``(n_members,)``
+
+        Raises
+        ------
+        ValueError
+            ``paras`` contains unknown parameters
+        """
+        paras = {} if paras is None else paras
+
+        unknown_paras = set(paras) - set(self.model._save_paras)
+        if unknown_paras:
+            raise ValueError("Unknown parameters: {}".format(sorted(unknown_paras)))
+
+        paras = {
+            k: np.broadcast_to(
+                np.asarray(
+                    paras.get(k, getattr(self.model, "_{}_mag".format(k))),
+                    dtype=self.model.dtype,
+                ),
+                (n_members,),
+            )
+            for k in self.model._save_paras
+        }
+
+        self._n_members = n_members
+        self._init(n_members, paras)
+
+    @abstractmethod
+    def _init(self, n_members, paras):
+        pass
+
+    def advance(self, erf):
+        """
+        Advance the model by one timestep
+
+        Parameters
+        ----------
+        erf : float or :obj:`np.ndarray`
+            Effective radiative forcing (``model._erf_unit``) during this
+            timestep, either one value for all members or an array with shape
+            ``(n_members,)``
+
+        Returns
+        -------
+        :obj:`np.ndarray`
+            Surface temperature (``model._temp1_unit`` or
+            ``model._temp_upper_unit``) at the end of the timestep. This is
+            the coupler's own buffer, which is overwritten by the next call,
+            so copy it if it needs to be kept.
+
+        Raises
+        ------
+        ModelStateError
+            :meth:`init` has not been called
+        """
+        if self._n_members is None:
+            raise ModelStateError(
+                "The coupler has not been initialised yet, call "
+                ":meth:`self.init` first."
+            )
+
+        return self._advance(erf)
+
+    @abstractmethod
+    def _advance(self, erf):
+        pass
+
+
+class TwoLayerCoupler(Coupler):
+    """
+    Coupling interface for :obj:`TwoLayerModel`
+
+    After each call to :meth:`advance`, the current state is available in the
+    ``temp_upper``, ``temp_lower`` and ``rndt`` attributes.
+    """
+
+    def _init(self, n_members, paras):
+        dtype = self.model.dtype
+        delta_t = dtype.type(self.model._delta_t_mag)
+        heat_capacity_upper = paras["du"] * dtype.type(_HEAT_CAPACITY_PER_DEPTH_MAG)
+        heat_capacity_lower = paras["dl"] * dtype.type(_HEAT_CAPACITY_PER_DEPTH_MAG)
+
+        self._lambda0 = paras["lambda0"]
+        # skip the state-dependent feedback terms entirely when they are zero
+        self._a = paras["a"] if np.any(paras["a"]) else None
+        self._efficacy_eta = paras["efficacy"] * paras["eta"]
+        self._eta = paras["eta"]
+        self._dt_over_cu = delta_t / heat_capacity_upper
+        self._dt_over_cl = delta_t / heat_capacity_lower
+
+        self.temp_upper = np.zeros(n_members, dtype=dtype)
+        self.temp_lower = np.zeros(n_members, dtype=dtype)
+        self.rndt = np.zeros(n_members, dtype=dtype)
+        self._flux_lower = np.zeros(n_members, dtype=dtype)
+        self._scratch = np.zeros(n_members, dtype=dtype)
+
+    def _advance(self, erf):
+        # fluxes into each layer, as in TwoLayerModel._calculate_next_temp_upper
+        # and TwoLayerModel._calculate_next_temp_lower
+        flux_upper = self.rndt
+        flux_lower = self._flux_lower
+        scratch = self._scratch
+
+        np.subtract(self.temp_upper, self.temp_lower, out=scratch)
+        np.multiply(self._eta, scratch, out=flux_lower)
+        np.multiply(self._efficacy_eta, scratch, out=scratch)
+
+        if self._a is None:
+            np.multiply(self._lambda0, self.temp_upper, out=flux_upper)
+        else:
+            np.multiply(self._a, self.temp_upper, out=flux_upper)
+            np.subtract(self._lambda0, flux_upper, out=flux_upper)
+            flux_upper *= self.temp_upper
+
+        np.add(flux_upper, scratch, out=flux_upper)
+        np.subtract(erf, flux_upper, out=flux_upper)
+
+        np.multiply(self._dt_over_cu, flux_upper, out=scratch)
+        self.temp_upper += scratch
+        np.multiply(self._dt_over_cl, flux_lower, out=scratch)
+        self.temp_lower += scratch
+
+        # heat uptake is the sum of the fluxes into each layer
+        flux_upper += flux_lower
+
+        return self.temp_upper
+
+
+class ImpulseResponseCoupler(Coupler):
+    """
+    Coupling interface for :obj:`ImpulseResponseModel`
+
+    After each call to :meth:`advance`, the current state is available in the
+    ``temp1``, ``temp2``, ``temp`` (i.e. ``temp1 + temp2``) and ``rndt``
+    attributes.
+    """
+
+    def _init(self, n_members, paras):
+        dtype = self.model.dtype
+        decay_factors = [
+            np.exp(-dtype.type(self.model._delta_t_mag) / paras[d])
+            for d in ("d1", "d2")
+        ]
+        self._decay1, self._decay2 = decay_factors
+        self._rise1 = paras["q1"] * (1 - self._decay1)
+        self._rise2 = paras["q2"] * (1 - self._decay2)
+        self._lambda0, self._coeff1, self._coeff2 = [
+            np.asarray(v, dtype=dtype)
+            for v in calculate_impulse_response_rndt_paras(
+                paras["q1"], paras["q2"], paras["d1"], paras["d2"], paras["efficacy"]
+            )
+        ]
+
+        self.temp1 = np.zeros(n_members, dtype=dtype)
+        self.temp2 = np.zeros(n_members, dtype=dtype)
+        self.temp = np.zeros(n_members, dtype=dtype)
+        self.rndt = np.zeros(n_members, dtype=dtype)
+        self._scratch = np.zeros(n_members, dtype=dtype)
+
+    def _advance(self, erf):
+        scratch = self._scratch
+
+        # heat uptake uses start of timestep temperatures, as in
+        # ImpulseResponseModel._calculate_next_rndt
+        np.multiply(self._lambda0, self.temp, out=self.rndt)
+        np.multiply(self._coeff1, self.temp1, out=scratch)
+        self.rndt += scratch
+        np.multiply(self._coeff2, self.temp2, out=scratch)
+        self.rndt += scratch
+        np.subtract(erf, self.rndt, out=self.rndt)
+
+        self.temp1 *= self._decay1
+        np.multiply(erf, self._rise1, out=scratch)
+        self.temp1 += scratch
+        self.temp2 *= self._decay2
+        np.multiply(erf, self._rise2, out=scratch)
+        self.temp2 += scratch
+
+        np.add(self.temp1, self.temp2, out=self.temp)
+
+        return self.temp
@@ -0,0 +1,380 @@
+r"""
+Analytic climate metrics for ensembles of parameters
+
+Without state-dependence, both models respond to a step change in forcing,
+:math:`F`, as
+
+.. math::
+
+    T(t) = \frac{F}{\lambda_0} \sum_{i=1}^{2} a_i (1 - e^{-t / \tau_i})
+
+(see ``impulse-response-equivalence.ipynb``). Hence the equilibrium climate
+sensitivity (ECS), the transient climate response (TCR, the warming at the
+time of |CO2| doubling when forcing increases linearly, as in a 1 % per year
+|CO2| increase) and the realised warming fraction (RWF, TCR / ECS) have closed
+forms. The functions in this module evaluate these forms for whole arrays of
+parameters at once, no time stepping is done. As a result, the values are
+those of the continuous-time model and differ very slightly from the values
+obtained by running the (discrete timestep) models.
+
+All inputs and outputs are plain magnitudes in the models' internal units
+(e.g. ``TwoLayerModel._du_unit``), apart from ``f2x``, which is in W/m^2,
+timescales, which are in years, and temperatures, which are in delta_degC.
+"""
+import numpy as np
+
+from ._numerics import calculate_geoffroy_helper_parameters
+from ._units import get_conversion_factor
+from .constants import SECONDS_PER_YEAR
+from .impulse_response_model import ImpulseResponseModel
+
+# pylint: disable=invalid-name,protected-access
+
+F2X_DEFAULT = 3.74
+"""float : Default forcing due to a doubling of atmospheric |CO2| (W/m^2)"""
+
+TCR_TIME_DEFAULT = 70
+"""float : Default time to |CO2| doubling (years) when calculating TCR"""
+
+
+def _ramp_factor(tau, tcr_time):
+    # response to a linear ramp, relative to the step response, at tcr_time
+    return 1 - tau / tcr_time * (1 - np.exp(-tcr_time / tau))
+
+
+def _ramp_factor_derivative(tau, tcr_time):
+    # derivative of _ramp_factor with respect to tau
+    decay = np.exp(-tcr_time / tau)
+
+    return -(1 - decay) / tcr_time + decay / tau
+
+
+def _calculate_two_layer_tcr(  # pylint:disable=too-many-arguments,too-many-locals
+    du, dl, lambda0, efficacy, eta, f2x, tcr_time
+):
+    # TCR and its derivative with respect to log(eta), the latter found by
+    # differentiating the Geoffroy et al. (2013a) relationships (as used in
+    # calculate_geoffroy_helper_parameters) by hand
+    gh = calculate_geoffroy_helper_parameters(du, dl, lambda0, efficacy, eta)
+    C, C_D, b_star = gh["C"], gh["C_D"], gh["b_star"]
+    sqrt_delta = gh["delta"] ** 0.5
+    tau1 = gh["tau1"]
+    tau2 = gh["tau2"]
+
+    # derivatives with respect to eta
+    db = efficacy / C + 1 / C_D
+    db_star = efficacy / C - 1 / C_D
+    dsqrt_delta = (gh["b"] * db - 2 * lambda0 / (C * C_D)) / sqrt_delta
+    taucoeff = C * C_D / (2 * lambda0 * eta)
+    dtau1 = -tau1 / eta + taucoeff * (db - dsqrt_delta)
+    dtau2 = -tau2 / eta + taucoeff * (db + dsqrt_delta)
+
+    # a1 = lambda0 tau1 (b_star + sqrt_delta) / (2 C sqrt_delta) and
+    # a2 = -lambda0 tau2 (b_star - sqrt_delta) / (2 C sqrt_delta)
+    acoeff = lambda0 / (2 * C)
+    da1 = acoeff * (
+        dtau1 * (b_star + sqrt_delta) / sqrt_delta
+        + tau1 * (db_star * sqrt_delta - b_star * dsqrt_delta) / sqrt_delta ** 2
+    )
+    da2 = -acoeff * (
+        dtau2 * (b_star - sqrt_delta) / sqrt_delta
+        + tau2 * (db_star * sqrt_delta - b_star * dsqrt_delta) / sqrt_delta ** 2
+    )
+
+    tau1_yr = tau1 / SECONDS_PER_YEAR
+    tau2_yr = tau2 / SECONDS_PER_YEAR
+    ramp1 = _ramp_factor(tau1_yr, tcr_time)
+    ramp2 = _ramp_factor(tau2_yr, tcr_time)
+    ecs = f2x / lambda0
+
+    tcr = ecs * (gh["a1"] * ramp1 + gh["a2"] * ramp2)
+    dtcr = ecs * (
+        da1 * ramp1
+        + da2 * ramp2
+        + (
+            gh["a1"] * _ramp_factor_derivative(tau1_yr, tcr_time) * dtau1
+            + gh["a2"] * _ramp_factor_derivative(tau2_yr, tcr_time) * dtau2
+        )
+        / SECONDS_PER_YEAR
+    )
+
+    return tcr, eta * dtcr
+
+
+def _calculate_metrics(ecs, a1, a2, tau1, tau2, tcr_time):
+    tcr = ecs * (a1 * _ramp_factor(tau1, tcr_time) + a2 * _ramp_factor(tau2, tcr_time))
+
+    return {
+        "ecs": ecs,
+        "tcr": tcr,
+        "rwf": tcr / ecs,
+        "tau1": tau1,
+        "tau2": tau2,
+        "a1": a1,
+        "a2": a2,
+    }
+
+
+def calculate_two_layer_metrics(  # pylint:disable=too-many-arguments
+    du, dl, lambda0, efficacy, eta, f2x=F2X_DEFAULT, tcr_time=TCR_TIME_DEFAULT
+):
+    """
+    Calculate analytic climate metrics for two-layer model parameters
+
+    Parameters
+    ----------
+    du : float or :obj:`np.ndarray`
+        Depth of upper layer (``TwoLayerModel._du_unit``)
+
+    dl : float or :obj:`np.ndarray`
+        Depth of lower layer (``TwoLayerModel._dl_unit``)
+
+    lambda0 : float or :obj:`np.ndarray`
+        Climate feedback factor (``TwoLayerModel._lambda0_unit``)
+
+    efficacy : float or :obj:`np.ndarray`
+        Efficacy factor (``TwoLayerModel._efficacy_unit``)
+
+    eta : float or :obj:`np.ndarray`
+        Heat transport efficiency (``TwoLayerModel._eta_unit``)
+
+    f2x : float or :obj:`np.ndarray`
+        Forcing due to a doubling of atmospheric |CO2| (W/m^2)
+
+    tcr_time : float
+        Time to |CO2| doubling (years) when calculating TCR
+
+    Returns
+    -------
+    dict of str : :obj:`np.ndarray`
+        ``"ecs"``, ``"tcr"``, ``"rwf"`` (realised warming fraction), the
+        response timescales, ``"tau1"`` and ``"tau2"``, and the fraction of the
+        equilibrium response associated with each timescale, ``"a1"`` and
+        ``"a2"``
+    """
+    gh = calculate_geoffroy_helper_parameters(
+        np.asarray(du),
+        np.asarray(dl),
+        np.asarray(lambda0),
+        np.asarray(efficacy),
+        np.asarray(eta),
+    )
+
+    return _calculate_metrics(
+        np.asarray(f2x) / lambda0,
+        gh["a1"],
+        gh["a2"],
+        gh["tau1"] / SECONDS_PER_YEAR,
+        gh["tau2"] / SECONDS_PER_YEAR,
+        tcr_time,
+    )
+
+
+def calculate_impulse_response_metrics(  # pylint:disable=too-many-arguments
+    q1, q2, d1, d2, f2x=F2X_DEFAULT, tcr_time=TCR_TIME_DEFAULT
+):
+    """
+    Calculate analytic climate metrics for impulse response model parameters
+
+    The efficacy does not affect the temperature response so is not required.
+
+    Parameters
+    ----------
+    q1 : float or :obj:`np.ndarray`
+        Sensitivity of first box response to radiative forcing
+        (``ImpulseResponseModel._q1_unit``)
+
+    q2 : float or :obj:`np.ndarray`
+        Sensitivity of second box response to radiative forcing
+        (``ImpulseResponseModel._q2_unit``)
+
+    d1 : float or :obj:`np.ndarray`
+        Response timescale of first box (``ImpulseResponseModel._d1_unit``)
+
+    d2 : float or :obj:`np.ndarray`
+        Response timescale of second box (``ImpulseResponseModel._d2_unit``)
+
+    f2x : float or :obj:`np.ndarray`
+        Forcing due to a doubling of atmospheric |CO2| (W/m^2)
+
+    tcr_time : float
+        Time to |CO2| doubling (years) when calculating TCR
+
+    Returns
+    -------
+    dict of str : :obj:`np.ndarray`
+        Same as :func:`calculate_two_layer_metrics`
+    """
+    q1 = np.asarray(q1)
+    q2 = np.asarray(q2)
+    to_yr = get_conversion_factor(ImpulseResponseModel._d1_unit, "yr")
+
+    return _calculate_metrics(
+        np.asarray(f2x) * (q1 + q2),
+        q1 / (q1 + q2),
+        q2 / (q1 + q2),
+        np.asarray(d1) * to_yr,
+        np.asarray(d2) * to_yr,
+        tcr_time,
+    )
+
+
+def solve_two_layer_parameters(  # pylint:disable=too-many-arguments,too-many-locals
+    ecs,
+    tcr,
+    du,
+    dl,
+    efficacy,
+    f2x=F2X_DEFAULT,
+    tcr_time=TCR_TIME_DEFAULT,
+    eta_start=0.8,
+    atol=1e-8,
+    max_iter=50,
+):
+    """
+    Find the two-layer model parameters which give target ECS and TCR values
+
+    ``lambda0`` follows directly from ``ecs``. ``eta`` is then found with
+    Newton iterations on the analytic TCR (see
+    :func:`calculate_two_layer_metrics`), done for all targets at once. The
+    iterations are done in log space, which keeps ``eta`` positive, and the
+    derivative of TCR is also calculated analytically.
+
+    Parameters
+    ----------
+    ecs : float or :obj:`np.ndarray`
+        Target equilibrium climate sensitivity (delta_degC)
+
+    tcr : float or :obj:`np.ndarray`
+        Target transient climate response (delta_degC)
+
+    du : float or :obj:`np.ndarray`
+        Depth of upper layer (``TwoLayerModel._du_unit``)
+
+    dl : float or :obj:`np.ndarray`
+        Depth of lower layer (``TwoLayerModel._dl_unit``)
+
+    efficacy : float or :obj:`np.ndarray`
+        Efficacy factor (``TwoLayerModel._efficacy_unit``)
+
+    f2x : float or :obj:`np.ndarray`
+        Forcing due to a doubling of atmospheric |CO2| (W/m^2)
+
+    tcr_time : float
+        Time to |CO2| doubling (years) when calculating TCR
+
+    eta_start : float or :obj:`np.ndarray`
+        Initial guess for ``eta`` (``TwoLayerModel._eta_unit``)
+
+    atol : float
+        Absolute tolerance (delta_degC) on TCR
+
+    max_iter : int
+        Maximum number of Newton iterations
+
+    Returns
+    -------
+    dict of str : :obj:`np.ndarray`
+        ``"lambda0"`` and ``"eta"`` (in the models' internal units) and
+        ``"converged"``, which is ``False`` where no solution was found (e.g.
+        because the target TCR cannot be reached with the given ``du``,
+        ``dl`` and ``efficacy``). ``eta`` is ``np.nan`` where
+        ``converged`` is ``False``.
+    """
+    ecs, tcr, du, dl, efficacy, f2x, eta_start = np.broadcast_arrays(
+        *[
+            np.asarray(v, dtype=float)
+            for v in (ecs, tcr, du, dl, efficacy, f2x, eta_start)
+        ]
+    )
+    lambda0 = f2x / ecs
+
+    log_eta = np.log(eta_start)
+    for _ in range(max_iter):
+        tcr_model, derivative = _calculate_two_layer_tcr(
+            du, dl, lambda0, efficacy, np.exp(log_eta), f2x, tcr_time
+        )
+        error = tcr_model - tcr
+        if np.all(np.abs(error) < atol):
+            break
+
+        # members where TCR doesn't depend on eta (to numerical precision)
+        # stay where they are, they are not converged unless already at the
+        # target
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = np.where(derivative != 0, error / derivative, 0)
+
+        # limit the step size so that a poor initial guess doesn't send eta to
+        # zero or infinity
+        log_eta = log_eta - np.clip(step, -2, 2)
+
+    else:
+        error = (
+            _calculate_two_layer_tcr(
+                du, dl, lambda0, efficacy, np.exp(log_eta), f2x, tcr_time
+            )[0]
+            - tcr
+        )
+
+    converged = np.abs(error) < atol
+
+    return {
+        "lambda0": lambda0,
+        "eta": np.where(converged, np.exp(log_eta), np.nan),
+        "converged": converged,
+    }
+
+
+def solve_impulse_response_parameters(  # pylint:disable=too-many-arguments
+    ecs, tcr, d1, d2, f2x=F2X_DEFAULT, tcr_time=TCR_TIME_DEFAULT
+):
+    """
+    Find the impulse response model parameters which give target ECS and TCR values
+
+    With the timescales fixed, ECS and TCR are linear in ``q1`` and ``q2``
+    (see :func:`calculate_impulse_response_metrics`), so the solution is
+    exact and no iteration is required.
+
+    Parameters
+    ----------
+    ecs : float or :obj:`np.ndarray`
+        Target equilibrium climate sensitivity (delta_degC)
+
+    tcr : float or :obj:`np.ndarray`
+        Target transient climate response (delta_degC)
+
+    d1 : float or :obj:`np.ndarray`
+        Response timescale of first box (``ImpulseResponseModel._d1_unit``)
+
+    d2 : float or :obj:`np.ndarray`
+        Response timescale of second box (``ImpulseResponseModel._d2_unit``)
+
+    f2x : float or :obj:`np.ndarray`
+        Forcing due to a doubling of atmospheric |CO2| (W/m^2)
+
+    tcr_time : float
+        Time to |CO2| doubling (years) when calculating TCR
+
+    Returns
+    -------
+    dict of str : :obj:`np.ndarray`
+        ``"q1"`` and ``"q2"`` (``ImpulseResponseModel._q1_unit``) and
+        ``"converged"``, which is ``False`` where the targets require a
+        negative ``q1`` or ``q2``. ``q1`` and ``q2`` are ``np.nan`` where
+        ``converged`` is ``False``.
+    """
+    to_yr = get_conversion_factor(ImpulseResponseModel._d1_unit, "yr")
+    ramp1 = _ramp_factor(np.asarray(d1) * to_yr, tcr_time)
+    ramp2 = _ramp_factor(np.asarray(d2) * to_yr, tcr_time)
+
+    q_total = np.asarray(ecs) / f2x
+    q1 = (np.asarray(tcr) / f2x - q_total * ramp2) / (ramp1 - ramp2)
+    q2 = q_total - q1
+
+    converged = (q1 >= 0) & (q2 >= 0)
+
+    return {
+        "q1": np.where(converged, q1, np.nan),
+        "q2": np.where(converged, q2, np.nan),
+        "converged": converged,
+    }
@@ -7,12 +7,23 @@ two-layer model without state dependence.
 import numpy as np
 from openscm_units import unit_registry as ur
 
-from .base import TwoLayerVariant, _calculate_geoffroy_helper_parameters
-from .constants import DENSITY_WATER, HEAT_CAPACITY_WATER
+from ._numerics import calculate_next_box_temp
+from ._units import get_magnitude
+from .base import TwoLayerVariant
 from .errors import ModelStateError
+from .parameters import ImpulseResponseParameters
 
 # pylint: disable=invalid-name
 
+# units of the two-layer model's parameters (``TwoLayerModel._du_unit`` etc.)
+_TWO_LAYER_UNITS = {
+    "lambda0": "W/m^2/delta_degC",
+    "du": "m",
+    "dl": "m",
+    "eta": "W/m^2/delta_degC",
+    "efficacy": "dimensionless",
+}
+
 
 class ImpulseResponseModel(
     TwoLayerVariant
@@ -49,8 +60,16 @@ class ImpulseResponseModel(
         "efficacy",
     )
 
+    _output_vars = (
+        "temp1",
+        "temp2",
+        "rndt",
+    )  # output variables, stored in ``_<var>_mag``
+
     _name = "two_timescale_impulse_response"  # model name
 
+    _parameters_cls = ImpulseResponseParameters
+
     def __init__(
         self,
         q1=0.3 * ur("delta_degC/(W/m^2)"),
@@ -94,9 +113,9 @@ class ImpulseResponseModel(
 
     @d1.setter
     def d1(self, val):
-        self._assert_is_pint_quantity_with_units(val, "d1", self._d1_unit)
+        self._d1_mag = get_magnitude(val, "d1", self._d1_unit)
         self._d1 = val
-        self._d1_mag = val.to(self._d1_unit).magnitude
+        self._parameters = None
 
     @property
     def d2(self):
@@ -108,9 +127,9 @@ class ImpulseResponseModel(
 
     @d2.setter
     def d2(self, val):
-        self._assert_is_pint_quantity_with_units(val, "d2", self._d2_unit)
+        self._d2_mag = get_magnitude(val, "d2", self._d2_unit)
         self._d2 = val
-        self._d2_mag = val.to(self._d2_unit).magnitude
+        self._parameters = None
 
     @property
     def q1(self):
@@ -122,9 +141,9 @@ class ImpulseResponseModel(
 
     @q1.setter
     def q1(self, val):
-        self._assert_is_pint_quantity_with_units(val, "q1", self._q1_unit)
+        self._q1_mag = get_magnitude(val, "q1", self._q1_unit)
         self._q1 = val
-        self._q1_mag = val.to(self._q1_unit).magnitude
+        self._parameters = None
 
     @property
     def q2(self):
@@ -136,9 +155,9 @@ class ImpulseResponseModel(
 
     @q2.setter
     def q2(self, val):
-        self._assert_is_pint_quantity_with_units(val, "q2", self._q2_unit)
+        self._q2_mag = get_magnitude(val, "q2", self._q2_unit)
         self._q2 = val
-        self._q2_mag = val.to(self._q2_unit).magnitude
+        self._parameters = None
 
     @property
     def efficacy(self):
@@ -150,9 +169,9 @@ class ImpulseResponseModel(
 
     @efficacy.setter
     def efficacy(self, val):
-        self._assert_is_pint_quantity_with_units(val, "efficacy", self._efficacy_unit)
+        self._efficacy_mag = get_magnitude(val, "efficacy", self._efficacy_unit)
         self._efficacy = val
-        self._efficacy_mag = val.to(self._efficacy_unit).magnitude
+        self._parameters = None
 
     def _reset(self):
         if np.isnan(self.erf).any():
@@ -162,9 +181,8 @@ class ImpulseResponseModel(
             )
 
         self._timestep_idx = np.nan
-        self._temp1_mag = np.zeros_like(self._erf_mag) * np.nan
-        self._temp2_mag = np.zeros_like(self._erf_mag) * np.nan
-        self._rndt_mag = np.zeros_like(self._erf_mag) * np.nan
+        self._erf_mag = self._erf_mag.astype(self.dtype, copy=False)
+        self._reset_outputs()
 
     def _run(self):
         for _ in self.erf:
@@ -206,42 +224,17 @@ class ImpulseResponseModel(
                 self._efficacy_mag,
             )
 
-    @staticmethod
-    def _calculate_next_temp(delta_t, t, q, d, erf):
-        decay_factor = np.exp(-delta_t / d)
-        rise = erf * q * (1 - np.exp(-delta_t / d))
-
-        return t * decay_factor + rise
+    _calculate_next_temp = staticmethod(calculate_next_box_temp)
 
     def _calculate_next_rndt(self, t1, t2, erf, efficacy):
-        two_layer_paras = self.get_two_layer_parameters()
-        lambda0 = two_layer_paras["lambda0"]
-
-        if np.equal(efficacy, 1):
-            efficacy_term = 0 * ur(self._erf_unit)
-        else:
-            gh = _calculate_geoffroy_helper_parameters(
-                two_layer_paras["du"],
-                two_layer_paras["dl"],
-                two_layer_paras["lambda0"],
-                two_layer_paras["efficacy"],
-                two_layer_paras["eta"],
-            )
+        # the coefficients are cached on the parameter record
+        paras = self.parameters
+        if paras.efficacy != efficacy:
+            paras = paras.replace(efficacy=efficacy)
 
-            t1_h = t1 * ur(self._temp1_unit)
-            t2_h = t2 * ur(self._temp2_unit)
-            efficacy_term = (
-                two_layer_paras["eta"]
-                * (efficacy - 1)
-                * ((1 - gh["phi1"]) * t1_h + (1 - gh["phi2"]) * t2_h)
-            )
-
-            if str(efficacy_term.units) != "watt / meter ** 2":
-                raise AssertionError("units should have come out as W/m^2")
+        lambda0, coeff1, coeff2 = paras.rndt_coefficients
 
-        out = erf - lambda0.magnitude * (t1 + t2) - efficacy_term.magnitude
-
-        return out
+        return erf - lambda0 * (t1 + t2) - (coeff1 * t1 + coeff2 * t2)
 
     def _get_run_output_tss(self, ts_base):
         out_run_tss = []
@@ -298,24 +291,6 @@ class ImpulseResponseModel(
             :obj:`openscm_twolayermodel.TwoLayerModel` with the same
             temperature response as ``self``
         """
-        lambda0 = 1 / (self.q1 + self.q2)
-        C = (self.d1 * self.d2) / (self.q1 * self.d2 + self.q2 * self.d1)
-
-        a1 = lambda0 * self.q1
-        a2 = lambda0 * self.q2
-
-        C_D = (lambda0 * (self.d1 * a1 + self.d2 * a2) - C) / self.efficacy
-        eta = C_D / (self.d1 * a2 + self.d2 * a1)
-
-        du = C / (DENSITY_WATER * HEAT_CAPACITY_WATER)
-        dl = C_D / (DENSITY_WATER * HEAT_CAPACITY_WATER)
-
-        out = {
-            "lambda0": lambda0,
-            "du": du,
-            "dl": dl,
-            "eta": eta,
-            "efficacy": self.efficacy,
-        }
+        two_layer = self.parameters.to_two_layer()
 
-        return out
+        return {k: getattr(two_layer, k) * ur(v) for k, v in _TWO_LAYER_UNITS.items()}
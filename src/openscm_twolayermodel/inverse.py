@@ -0,0 +1,181 @@
+"""
+Inference of effective radiative forcing from temperature
+
+The two-timescale impulse response model is linear so its temperature
+response is the convolution of the forcing with the model's impulse response,
+i.e. the product of a lower-triangular Toeplitz matrix with the forcing. The
+forcing can hence be recovered from the temperature by deconvolution,
+directly rather than by iterative optimisation.
+"""
+import numpy as np
+import pint
+from openscm_units import unit_registry as ur
+
+from ._units import get_magnitude
+from .impulse_response_model import ImpulseResponseModel
+
+# pylint: disable=invalid-name,protected-access
+
+
+def _get_box_factors(delta_t, params):
+    # decay and response to unit forcing of each box in one timestep, exactly
+    # as in ImpulseResponseModel
+    mags = {
+        k: get_magnitude(
+            params[k], k, getattr(ImpulseResponseModel, "_{}_unit".format(k))
+        )
+        if isinstance(params[k], pint.Quantity)
+        else np.asarray(params[k])
+        for k in ("q1", "q2", "d1", "d2")
+    }
+
+    decays = []
+    rises = []
+    for q, d in (("q1", "d1"), ("q2", "d2")):
+        q_mag = mags[q]
+        d_mag = mags[d]
+        decays.append(
+            ImpulseResponseModel._calculate_next_temp(delta_t, 1, 0, d_mag, 0)
+        )
+        rises.append(
+            ImpulseResponseModel._calculate_next_temp(delta_t, 0, q_mag, d_mag, 1)
+        )
+
+    return decays, rises
+
+
+def _deconvolve_exact(temperature, decays, rises):
+    # the box temperatures carry the convolution sum so each forcing value
+    # follows from the temperature at the next timestep
+    forcing = np.full(temperature.shape, np.nan)
+    box_temps = [np.zeros(temperature.shape[:-1]) for _ in decays]
+    total_rise = sum(rises)
+    for i in range(temperature.shape[-1] - 1):
+        forcing[..., i] = (
+            temperature[..., i + 1]
+            - sum(decay * box for decay, box in zip(decays, box_temps))
+        ) / total_rise
+        box_temps = [
+            decay * box + rise * forcing[..., i]
+            for decay, rise, box in zip(decays, rises, box_temps)
+        ]
+
+    return forcing
+
+
+def _deconvolve_regularised(temperature, decays, rises, regularisation):
+    n_forcing = temperature.shape[-1] - 1
+    lags = np.arange(n_forcing)
+
+    # impulse response and lower-triangular Toeplitz response matrix, with the
+    # parameters' shape leading
+    impulse_response = sum(
+        np.asarray(rise)[..., np.newaxis] * np.asarray(decay)[..., np.newaxis] ** lags
+        for decay, rise in zip(decays, rises)
+    )
+    lag_matrix = lags[:, np.newaxis] - lags[np.newaxis, :]
+    response = np.where(
+        lag_matrix >= 0, impulse_response[..., np.maximum(lag_matrix, 0)], 0
+    )
+
+    # Tikhonov regularisation of the differences between consecutive values
+    difference = np.diff(np.eye(n_forcing), axis=0)
+    lhs = np.swapaxes(response, -1, -2) @ response + regularisation * (
+        difference.T @ difference
+    )
+    rhs = np.swapaxes(response, -1, -2) @ temperature[..., 1:, np.newaxis]
+
+    forcing = np.full(
+        np.broadcast_shapes(lhs.shape[:-2], rhs.shape[:-2]) + (n_forcing + 1,), np.nan
+    )
+    forcing[..., :-1] = np.linalg.solve(lhs, rhs)[..., 0]
+
+    return forcing
+
+
+def infer_forcing(temperature, params, delta_t=1 * ur("yr"), regularisation=0):
+    """
+    Infer the effective radiative forcing which gives a temperature time series
+
+    Many time series and parameter sets can be processed at once.
+
+    Parameters
+    ----------
+    temperature : :obj:`pint.Quantity` or :obj:`np.ndarray`
+        Surface temperature anomalies (``ImpulseResponseModel._temp1_unit`` if
+        not a :obj:`pint.Quantity`), time must be the last axis. As in
+        :obj:`ImpulseResponseModel`, the temperature at the first timestep is
+        assumed to be zero and the temperature at each timestep depends only
+        on the forcing in earlier timesteps. Must not contain ``np.nan``.
+
+    params : dict of str : :obj:`pint.Quantity` or :obj:`np.ndarray`
+        Impulse response parameters, ``"q1"``, ``"q2"``, ``"d1"`` and ``"d2"``
+        (other keys are ignored), e.g. the output of
+        :meth:`TwoLayerModel.get_impulse_response_parameters`. Values which
+        aren't :obj:`pint.Quantity` must be in the model's internal units
+        (e.g. ``ImpulseResponseModel._q1_unit``). Arrays must broadcast against
+        ``temperature[..., 0]``.
+
+    delta_t : :obj:`pint.Quantity`
+        Timestep of ``temperature``
+
+    regularisation : float
+        If zero, the deconvolution is exact. Otherwise, the forcing minimises
+        the sum of the squared temperature misfit plus ``regularisation``
+        times the sum of the squared differences between consecutive forcing
+        values (i.e. the units of ``regularisation`` are
+        delta_degC^2 / (W/m^2)^2). Regularisation damps the amplification of
+        noise in ``temperature`` but requires one
+        ``(n_timesteps - 1) x (n_timesteps - 1)`` matrix per parameter set.
+
+    Returns
+    -------
+    :obj:`pint.Quantity` or :obj:`np.ndarray`
+        Effective radiative forcing, a :obj:`pint.Quantity` if
+        ``temperature`` is one, otherwise in
+        ``ImpulseResponseModel._erf_unit``. The last value does not affect
+        ``temperature`` so is always ``np.nan``.
+
+    Raises
+    ------
+    ValueError
+        ``regularisation`` is negative
+
+    TypeError
+        ``delta_t`` is not a :obj:`pint.Quantity`
+
+    UnitError
+        ``temperature``, one of ``params`` or ``delta_t`` has the wrong units
+    """
+    if regularisation < 0:
+        raise ValueError("regularisation must be non-negative")
+
+    if isinstance(temperature, pint.Quantity):
+        temperature_mag = get_magnitude(
+            temperature, "temperature", ImpulseResponseModel._temp1_unit
+        )
+    else:
+        temperature_mag = np.asarray(temperature)
+
+    decays, rises = _get_box_factors(
+        get_magnitude(delta_t, "delta_t", ImpulseResponseModel._delta_t_unit), params,
+    )
+
+    if regularisation:
+        forcing = _deconvolve_regularised(
+            temperature_mag, decays, rises, regularisation
+        )
+    else:
+        forcing = _deconvolve_exact(
+            np.broadcast_to(
+                temperature_mag,
+                np.broadcast_shapes(temperature_mag.shape, np.shape(sum(rises)) + (1,)),
+            ),
+            decays,
+            rises,
+        )
+
+    if isinstance(temperature, pint.Quantity):
+        return forcing * ur(ImpulseResponseModel._erf_unit)
+
+    return forcing
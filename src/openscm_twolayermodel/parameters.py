@@ -0,0 +1,326 @@
+"""
+Lightweight records of model parameters
+
+Each record holds one parameter set as plain floats in the corresponding
+model's internal units (e.g. ``TwoLayerModel._du_unit``). Records are
+immutable so quantities derived from them (e.g. the helper parameters of
+`Geoffroy et al. 2013a <https://doi.org/10.1175/JCLI-D-12-00195.1>`_ or the
+equivalent parameters of the other model) are calculated once, when first
+used, and then cached on the record. Records hash and compare by value so can
+be used as keys in caches, and pickle as just their values (the cache is
+dropped) so are cheap to send to other processes.
+
+Like :mod:`openscm_twolayermodel.batched`, this module can be imported without
+importing :mod:`pint` or :mod:`pandas`. A model's parameters are available as
+a record via :attr:`openscm_twolayermodel.base.TwoLayerVariant.parameters`.
+"""
+from ._numerics import (
+    calculate_geoffroy_helper_parameters,
+    calculate_impulse_response_parameters,
+    calculate_impulse_response_rndt_paras,
+    calculate_two_layer_parameters,
+)
+from .constants import DENSITY_WATER_MAG, HEAT_CAPACITY_WATER_MAG
+
+
+class _ParameterRecord:
+    """
+    Base class for immutable, slotted parameter records
+    """
+
+    __slots__ = ("_hash", "_cache")
+
+    _fields = tuple()  # parameters, in the order of the model's ``_save_paras``
+
+    def __init__(self, **kwargs):
+        for k in self._fields:
+            object.__setattr__(self, k, float(kwargs[k]))
+
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_cache", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def __reduce__(self):
+        return (type(self), self.astuple())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __eq__(self, other):
+        if type(other) is not type(self):  # pylint:disable=unidiomatic-typecheck
+            return NotImplemented
+
+        return self.astuple() == other.astuple()
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash((type(self), self.astuple())))
+
+        return self._hash
+
+    def __repr__(self):
+        return "{}({})".format(
+            type(self).__name__,
+            ", ".join("{}={!r}".format(k, getattr(self, k)) for k in self._fields),
+        )
+
+    def _get_cached(self, name, calculate):
+        if self._cache is None:
+            object.__setattr__(self, "_cache", {})
+
+        try:
+            return self._cache[name]
+        except KeyError:
+            value = self._cache[name] = calculate()
+
+            return value
+
+    def astuple(self):
+        """
+        Get the parameter values
+
+        Returns
+        -------
+        tuple of float
+            Values, in the order of :attr:`_fields`
+        """
+        return tuple(getattr(self, k) for k in self._fields)
+
+    def asdict(self):
+        """
+        Get the parameter values, keyed by name
+
+        Returns
+        -------
+        dict of str : float
+            Values, e.g. to pass to
+            :func:`openscm_twolayermodel.batched.run_array` as ``paras``
+        """
+        return {k: getattr(self, k) for k in self._fields}
+
+    def replace(self, **changes):
+        """
+        Get a copy of the record with some values replaced
+
+        Parameters
+        ----------
+        **changes
+            Parameters to replace and their new values
+
+        Returns
+        -------
+        :obj:`TwoLayerParameters` or :obj:`ImpulseResponseParameters`
+            New record, of the same type as ``self`` and without any cached
+            values
+
+        Raises
+        ------
+        ValueError
+            ``changes`` contains unknown parameters
+        """
+        unknown = set(changes) - set(self._fields)
+        if unknown:
+            raise ValueError("Unknown parameters: {}".format(sorted(unknown)))
+
+        return type(self)(**{**self.asdict(), **changes})
+
+
+class TwoLayerParameters(_ParameterRecord):
+    """
+    Parameters of :obj:`openscm_twolayermodel.TwoLayerModel`
+
+    The defaults are the model's defaults.
+    """
+
+    _fields = ("du", "dl", "lambda0", "a", "efficacy", "eta")
+    __slots__ = _fields
+
+    def __init__(
+        self, du=50.0, dl=1200.0, lambda0=3.74 / 3, a=0.0, efficacy=1.0, eta=0.8
+    ):  # pylint: disable=too-many-arguments
+        """
+        Initialise
+
+        Parameters
+        ----------
+        du : float
+            Depth of upper layer (``TwoLayerModel._du_unit``)
+
+        dl : float
+            Depth of lower layer (``TwoLayerModel._dl_unit``)
+
+        lambda0 : float
+            Initial climate feedback factor (``TwoLayerModel._lambda0_unit``)
+
+        a : float
+            Dependence of climate feedback factor on temperature
+            (``TwoLayerModel._a_unit``)
+
+        efficacy : float
+            Efficacy factor (``TwoLayerModel._efficacy_unit``)
+
+        eta : float
+            Heat transport efficiency (``TwoLayerModel._eta_unit``)
+        """
+        super().__init__(du=du, dl=dl, lambda0=lambda0, a=a, efficacy=efficacy, eta=eta)
+
+    @property
+    def heat_capacity_upper(self):
+        """
+        :obj:`float`
+            Heat capacity of upper layer
+            (``TwoLayerModel._heat_capacity_upper_unit``)
+        """
+        return self.du * DENSITY_WATER_MAG * HEAT_CAPACITY_WATER_MAG
+
+    @property
+    def heat_capacity_lower(self):
+        """
+        :obj:`float`
+            Heat capacity of lower layer
+            (``TwoLayerModel._heat_capacity_lower_unit``)
+        """
+        return self.dl * DENSITY_WATER_MAG * HEAT_CAPACITY_WATER_MAG
+
+    @property
+    def geoffroy_helper(self):
+        """
+        :obj:`dict` of str : float
+            Helper parameters of Geoffroy et al. (2013a), in SI units (see
+            :func:`openscm_twolayermodel._numerics.calculate_geoffroy_helper_parameters`)
+        """
+        return dict(
+            self._get_cached(
+                "geoffroy_helper",
+                lambda: calculate_geoffroy_helper_parameters(
+                    self.du, self.dl, self.lambda0, self.efficacy, self.eta
+                ),
+            )
+        )
+
+    def to_impulse_response(self):
+        """
+        Get equivalent impulse response model parameters
+
+        See :meth:`openscm_twolayermodel.TwoLayerModel.get_impulse_response_parameters`.
+
+        Returns
+        -------
+        :obj:`ImpulseResponseParameters`
+            Parameters of an :obj:`openscm_twolayermodel.ImpulseResponseModel`
+            with the same temperature response
+
+        Raises
+        ------
+        ValueError
+            ``self.a`` is non-zero, the two-timescale model does not support
+            state-dependence.
+        """
+        if self.a != 0:
+            raise ValueError(
+                "Cannot calculate impulse response parameters with "
+                "non-zero a={}".format(self.a)
+            )
+
+        return self._get_cached(
+            "impulse_response",
+            lambda: ImpulseResponseParameters(
+                **calculate_impulse_response_parameters(
+                    self.du, self.dl, self.lambda0, self.efficacy, self.eta
+                )
+            ),
+        )
+
+
+class ImpulseResponseParameters(_ParameterRecord):
+    """
+    Parameters of :obj:`openscm_twolayermodel.ImpulseResponseModel`
+
+    The defaults are the model's defaults.
+    """
+
+    _fields = ("d1", "d2", "q1", "q2", "efficacy")
+    __slots__ = _fields
+
+    def __init__(
+        self, d1=9.0, d2=400.0, q1=0.3, q2=0.4, efficacy=1.0
+    ):  # pylint: disable=too-many-arguments
+        """
+        Initialise
+
+        Parameters
+        ----------
+        d1 : float
+            Response timescale of first box (``ImpulseResponseModel._d1_unit``)
+
+        d2 : float
+            Response timescale of second box (``ImpulseResponseModel._d2_unit``)
+
+        q1 : float
+            Sensitivity of first box response to radiative forcing
+            (``ImpulseResponseModel._q1_unit``)
+
+        q2 : float
+            Sensitivity of second box response to radiative forcing
+            (``ImpulseResponseModel._q2_unit``)
+
+        efficacy : float
+            Efficacy factor (``ImpulseResponseModel._efficacy_unit``)
+        """
+        super().__init__(d1=d1, d2=d2, q1=q1, q2=q2, efficacy=efficacy)
+
+    @property
+    def geoffroy_helper(self):
+        """
+        :obj:`dict` of str : float
+            Helper parameters of Geoffroy et al. (2013a) of the equivalent
+            two-layer model (see :attr:`TwoLayerParameters.geoffroy_helper`)
+        """
+        return self.to_two_layer().geoffroy_helper
+
+    @property
+    def rndt_coefficients(self):
+        """
+        :obj:`tuple` of float
+            ``lambda0``, ``coeff1`` and ``coeff2`` (W/m^2/delta_degC), the
+            coefficients of the heat uptake (see
+            :func:`openscm_twolayermodel._numerics.calculate_impulse_response_rndt_paras`)
+        """
+        return self._get_cached(
+            "rndt_coefficients",
+            lambda: tuple(
+                float(v)
+                for v in calculate_impulse_response_rndt_paras(
+                    self.q1, self.q2, self.d1, self.d2, self.efficacy
+                )
+            ),
+        )
+
+    def to_two_layer(self):
+        """
+        Get equivalent two-layer model parameters
+
+        See :meth:`openscm_twolayermodel.ImpulseResponseModel.get_two_layer_parameters`.
+
+        Returns
+        -------
+        :obj:`TwoLayerParameters`
+            Parameters of a :obj:`openscm_twolayermodel.TwoLayerModel` with
+            the same temperature response
+        """
+        return self._get_cached(
+            "two_layer",
+            lambda: TwoLayerParameters(
+                **calculate_two_layer_parameters(
+                    self.q1, self.q2, self.d1, self.d2, self.efficacy
+                )
+            ),
+        )
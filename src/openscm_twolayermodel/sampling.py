@@ -0,0 +1,410 @@
+"""
+Sampling of model parameters for probabilistic runs
+
+Parameters are sampled with Latin hypercube or (scrambled) Sobol designs from
+declared distributions and the samples are run in chunks with
+:func:`openscm_twolayermodel.batched.run_array`, so no model object is
+created per sample and memory use is bounded by the chunk size (times the
+number of chunks run in parallel). On top of
+this, :func:`calculate_sobol_indices` does variance-based global sensitivity
+analysis.
+"""
+from collections import deque
+from functools import partial
+
+import numpy as np
+
+from .batched import run_array
+
+try:
+    from scipy.stats import qmc
+except ImportError:  # pragma: no cover
+    qmc = None
+
+try:
+    import xarray as xr
+except ImportError:  # pragma: no cover
+    xr = None
+
+# pylint: disable=invalid-name,protected-access
+
+SAMPLING_METHODS = ("lhs", "sobol")
+"""tuple of str : Supported sampling methods"""
+
+
+def _check_parameters(model, names):
+    unknown_paras = set(names) - set(model._save_paras)
+    if unknown_paras:
+        raise ValueError("Unknown parameters: {}".format(sorted(unknown_paras)))
+
+
+def _sample_unit_hypercube(n_samples, n_dims, method, seed):
+    if qmc is None:  # pragma: no cover
+        raise ImportError("scipy is not installed. Run 'pip install scipy'")
+
+    if method == "lhs":
+        engine = qmc.LatinHypercube(d=n_dims, seed=seed)
+    elif method == "sobol":
+        engine = qmc.Sobol(d=n_dims, scramble=True, seed=seed)
+    else:
+        raise ValueError(
+            "method must be one of {}, got {}".format(SAMPLING_METHODS, method)
+        )
+
+    return engine.random(n_samples)
+
+
+def _transform_samples(unit_samples, distributions):
+    out = {}
+    for i, (name, dist) in enumerate(distributions.items()):
+        if isinstance(dist, tuple):
+            low, high = dist
+            out[name] = low + (high - low) * unit_samples[:, i]
+        else:
+            out[name] = dist.ppf(unit_samples[:, i])
+
+    return out
+
+
+def sample_parameters(model, distributions, n_samples, method="lhs", seed=None):
+    """
+    Sample model parameters
+
+    Parameters
+    ----------
+    model : :obj:`TwoLayerModel` or :obj:`ImpulseResponseModel`
+        Model whose parameters are being sampled
+
+    distributions : dict of str : tuple or distribution
+        Distribution of each parameter to sample, in the model's internal
+        units (e.g. ``model._du_unit``). Values can be a ``(low, high)`` tuple
+        for a uniform distribution or any object with a ``ppf`` (inverse
+        cumulative distribution function) method, e.g. a frozen
+        :mod:`scipy.stats` distribution.
+
+    n_samples : int
+        Number of samples
+
+    method : str
+        Sampling method, ``"lhs"`` (Latin hypercube) or ``"sobol"``
+        (scrambled Sobol sequence, ``n_samples`` should be a power of two)
+
+    seed : int or :obj:`np.random.Generator` or None
+        Seed for the sampling
+
+    Returns
+    -------
+    dict of str : :obj:`np.ndarray`
+        Samples of each parameter in ``distributions``, each with shape
+        ``(n_samples,)``
+
+    Raises
+    ------
+    ValueError
+        ``distributions`` contains parameters which are not in
+        ``model._save_paras`` or ``method`` is not supported
+    """
+    _check_parameters(model, distributions)
+
+    unit_samples = _sample_unit_hypercube(n_samples, len(distributions), method, seed)
+
+    return _transform_samples(unit_samples, distributions)
+
+
+def _run_chunk(paras, model, forcing, dims, dtype):
+    return run_array(model, forcing, dims=dims, paras=paras, dtype=dtype).assign_coords(
+        paras
+    )
+
+
+def _map_bounded(func, iterable, executor, max_in_flight):
+    # like executor.map but only max_in_flight calls are submitted and not yet
+    # yielded at any time, so memory use doesn't grow with len(iterable)
+    in_flight = deque()
+    try:
+        for args in iterable:
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+
+            in_flight.append(executor.submit(func, args))
+
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    finally:
+        # e.g. the caller stopped iterating early
+        for future in in_flight:
+            future.cancel()
+
+
+def run_samples(  # pylint:disable=too-many-arguments
+    model,
+    forcing,
+    samples,
+    chunk_size=1000,
+    dims=None,
+    dtype=None,
+    executor=None,
+    max_in_flight=None,
+):
+    """
+    Run a model for each set of sampled parameters, in chunks
+
+    Parameters
+    ----------
+    model : :obj:`TwoLayerModel` or :obj:`ImpulseResponseModel`
+        Model to run. Its parameters are used for any parameter which is not
+        in ``samples``, its timestep is always used.
+
+    forcing : :obj:`xarray.DataArray` or :obj:`np.ndarray`
+        Effective radiative forcing, as for
+        :func:`openscm_twolayermodel.batched.run_array`. Every sample is run
+        with all of ``forcing``.
+
+    samples : dict of str : :obj:`np.ndarray`
+        Parameter samples (in the model's internal units), e.g. the output of
+        :func:`sample_parameters`
+
+    chunk_size : int
+        Maximum number of samples to run at once
+
+    dims : tuple of str
+        Names of the dimensions of ``forcing`` if it is not a
+        :obj:`xarray.DataArray` (see
+        :func:`openscm_twolayermodel.batched.run_array`)
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and outputs. If
+        ``None``, ``model.dtype`` is used.
+
+    executor : :obj:`concurrent.futures.Executor`
+        If supplied, the chunks are run in parallel with this executor
+        (they are still yielded in order)
+
+    max_in_flight : int
+        Maximum number of chunks which have been submitted to ``executor``
+        but not yet yielded, which bounds the memory use. A new chunk is only
+        submitted once one has been yielded. If ``None``, the executor's
+        number of workers is used (or one if it can't be determined).
+
+    Yields
+    ------
+    :obj:`xarray.Dataset`
+        Output for each chunk of samples, with a ``"sample"`` dimension
+        (whose coordinate is the index of each sample in ``samples``) and the
+        sampled parameter values as coordinates along it
+
+    Raises
+    ------
+    ValueError
+        ``samples`` contains parameters which are not in ``model._save_paras``
+        or the samples have different lengths
+    """
+    if xr is None:  # pragma: no cover
+        raise ImportError("xarray is not installed. Run 'pip install xarray'")
+
+    _check_parameters(model, samples)
+    samples = {k: np.asarray(v) for k, v in samples.items()}
+    n_samples = {v.shape[0] for v in samples.values()}
+    if len(n_samples) != 1:
+        raise ValueError("All samples must have the same length")
+
+    (n_samples,) = n_samples
+    chunk_paras = (
+        {
+            k: xr.DataArray(
+                v[sample_idx],
+                dims=("sample",),
+                coords={"sample": sample_idx},
+                attrs={"units": getattr(model, "_{}_unit".format(k))},
+            )
+            for k, v in samples.items()
+        }
+        for sample_idx in (
+            np.arange(start, min(start + chunk_size, n_samples))
+            for start in range(0, n_samples, chunk_size)
+        )
+    )
+
+    run_chunk = partial(
+        _run_chunk, model=model, forcing=forcing, dims=dims, dtype=dtype
+    )
+    if executor is None:
+        yield from map(run_chunk, chunk_paras)
+    else:
+        if max_in_flight is None:
+            max_in_flight = getattr(executor, "_max_workers", None) or 1
+
+        yield from _map_bounded(run_chunk, chunk_paras, executor, max_in_flight)
+
+
+def _init_sobol_sums(output, values):
+    # values has shape (sample, group, ...), the sums are kept in float64
+    # whatever the dtype of the runs
+    shape = values.shape[2:]
+    n_paras = values.shape[1] - 2
+
+    return {
+        "dims": output.dims[1:],
+        "coords": {d: output[d] for d in output.dims[1:] if d in output.coords},
+        # the variance is shift invariant, shifting by a typical value avoids
+        # cancellation when it is calculated from the sums of squares
+        "shift": np.mean(values[:, 0], axis=0, dtype=np.float64),
+        "f": np.zeros(shape),
+        "f_squared": np.zeros(shape),
+        "first_order": np.zeros((n_paras,) + shape),
+        "total": np.zeros((n_paras,) + shape),
+    }
+
+
+def _accumulate_sobol_sums(sums, values):
+    values = values.astype(np.float64, copy=False)
+    f_a = values[:, 0]
+    f_b = values[:, 1]
+    f_ab = np.moveaxis(values[:, 2:], 1, 0)
+
+    for f in (f_a, f_b):
+        shifted = f - sums["shift"]
+        sums["f"] += np.sum(shifted, axis=0)
+        sums["f_squared"] += np.sum(shifted ** 2, axis=0)
+
+    sums["first_order"] += np.sum(f_b * (f_ab - f_a), axis=1)
+    sums["total"] += np.sum((f_a - f_ab) ** 2, axis=1)
+
+
+def calculate_sobol_indices(  # pylint:disable=too-many-arguments,too-many-locals
+    model,
+    forcing,
+    distributions,
+    n_samples,
+    dims=None,
+    seed=None,
+    chunk_size=1000,
+    executor=None,
+    dtype=None,
+):
+    """
+    Calculate first-order and total Sobol sensitivity indices
+
+    The indices are estimated from a Saltelli design, i.e. two independent
+    sample matrices, :math:`A` and :math:`B`, drawn from a scrambled Sobol
+    sequence plus, for each parameter, :math:`A` with that parameter's column
+    taken from :math:`B`, requiring ``n_samples * (n_parameters + 2)`` runs.
+    The runs are done in chunks (see :func:`run_samples`) and the estimators
+    are accumulated chunk by chunk, so memory use is bounded by the chunk
+    size rather than the number of runs.
+    The first-order indices use the estimator of
+    `Saltelli et al. 2010 <https://doi.org/10.1016/j.cpc.2009.09.018>`_, the
+    total indices the estimator of Jansen (1999).
+
+    Parameters
+    ----------
+    model : :obj:`TwoLayerModel` or :obj:`ImpulseResponseModel`
+        Model to analyse. Its parameters are used for any parameter which is
+        not in ``distributions``, its timestep is always used.
+
+    forcing : :obj:`xarray.DataArray` or :obj:`np.ndarray`
+        Effective radiative forcing, as for
+        :func:`openscm_twolayermodel.batched.run_array`
+
+    distributions : dict of str : tuple or distribution
+        Distribution of each parameter to analyse (see
+        :func:`sample_parameters`)
+
+    n_samples : int
+        Number of samples in each of the base sample matrices, should be a
+        power of two
+
+    dims : tuple of str
+        Names of the dimensions of ``forcing`` if it is not a
+        :obj:`xarray.DataArray`
+
+    seed : int or :obj:`np.random.Generator` or None
+        Seed for the sampling
+
+    chunk_size : int
+        Maximum number of runs to do at once. Each chunk holds whole groups
+        of ``n_parameters + 2`` runs so this is rounded down to a multiple of
+        ``n_parameters + 2`` (but is at least ``n_parameters + 2``).
+
+    executor : :obj:`concurrent.futures.Executor`
+        If supplied, the chunks are run in parallel with this executor
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations. If ``None``,
+        ``model.dtype`` is used.
+
+    Returns
+    -------
+    :obj:`xarray.Dataset`
+        Indices for each output variable, with an ``"index"`` dimension
+        (``"first_order"`` and ``"total"``), a ``"parameter"`` dimension and
+        the output dimensions (e.g. ``"time"``). Where an output does not
+        vary (e.g. at the first timestep), the indices are ``np.nan``.
+
+    Raises
+    ------
+    ValueError
+        ``distributions`` contains parameters which are not in
+        ``model._save_paras``
+    """
+    _check_parameters(model, distributions)
+    names = list(distributions)
+    n_paras = len(names)
+
+    unit_samples = _sample_unit_hypercube(n_samples, 2 * n_paras, "sobol", seed)
+    sample_a = _transform_samples(unit_samples[:, :n_paras], distributions)
+    sample_b = _transform_samples(unit_samples[:, n_paras:], distributions)
+
+    # for each sample in turn, A, B, then A with each parameter in turn taken
+    # from B so that each chunk holds whole groups of runs and the estimators'
+    # sums can be accumulated one chunk at a time
+    n_group = n_paras + 2
+    design = {
+        k: np.stack(
+            [sample_a[k], sample_b[k]]
+            + [sample_b[k] if k == name else sample_a[k] for name in names],
+            axis=1,
+        ).ravel()
+        for k in names
+    }
+
+    sums = {}
+    for chunk in run_samples(
+        model,
+        forcing,
+        design,
+        chunk_size=max(chunk_size // n_group, 1) * n_group,
+        dims=dims,
+        dtype=dtype,
+        executor=executor,
+    ):
+        for var in model._output_vars:
+            output = chunk[var].transpose("sample", ...)
+            values = output.values.reshape((-1, n_group) + output.shape[1:])
+            if var not in sums:
+                sums[var] = _init_sobol_sums(output, values)
+
+            _accumulate_sobol_sums(sums[var], values)
+
+    out = {}
+    for var, var_sums in sums.items():
+        variance = (
+            var_sums["f_squared"] / (2 * n_samples)
+            - (var_sums["f"] / (2 * n_samples)) ** 2
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            first_order = var_sums["first_order"] / n_samples / variance
+            total = 0.5 * var_sums["total"] / n_samples / variance
+
+        out[var] = xr.DataArray(
+            np.stack([first_order, total]),
+            dims=("index", "parameter") + var_sums["dims"],
+            coords={
+                "index": ["first_order", "total"],
+                "parameter": names,
+                **var_sums["coords"],
+            },
+        )
+
+    return xr.Dataset(out, attrs={"climate_model": model._name})
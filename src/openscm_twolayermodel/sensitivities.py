@@ -0,0 +1,712 @@
+"""
+Sensitivities of the model outputs to the model parameters
+
+The tangent-linear kernels differentiate the models' time stepping exactly,
+propagating the derivative of the state with respect to each parameter
+alongside the state itself. All the derivatives are calculated in the same
+time loop as the outputs, at roughly ``1 + n_parameters`` times the cost of a
+run, rather than the ``2 * n_parameters`` runs required by central finite
+differences.
+
+The adjoint kernels instead calculate the gradient of a single scalar loss
+(e.g. the RMSE against observations, see :func:`get_rmse_loss`) with respect
+to every parameter and every forcing value with one forward run and one
+backward sweep, whatever the number of parameters.
+"""
+import numpy as np
+
+from ._numerics import calculate_impulse_response_rndt_paras
+from .batched import (
+    _HEAT_CAPACITY_PER_DEPTH_MAG,
+    _cast_paras,
+    _get_output_shape,
+    run_impulse_response,
+    run_two_layer,
+)
+from .errors import ModelStateError
+from .impulse_response_model import ImpulseResponseModel
+from .two_layer_model import TwoLayerModel
+
+# pylint: disable=invalid-name,protected-access
+
+
+def _unstack_sensitivities(names, sensitivities):
+    return {var: dict(zip(names, v)) for var, v in sensitivities.items()}
+
+
+def run_two_layer_tangent_linear(  # pylint:disable=too-many-arguments,too-many-locals
+    erf, delta_t, du, dl, lambda0, a, efficacy, eta, dtype=np.float64
+):
+    """
+    Run the two-layer model and its tangent-linear model for a batch of ensemble members
+
+    Parameters
+    ----------
+    erf : :obj:`np.ndarray`
+        Effective radiative forcing (``TwoLayerModel._erf_unit``), time must be
+        the last axis
+
+    delta_t : float
+        Timestep (``TwoLayerModel._delta_t_unit``)
+
+    du : float or :obj:`np.ndarray`
+        Depth of upper layer (``TwoLayerModel._du_unit``)
+
+    dl : float or :obj:`np.ndarray`
+        Depth of lower layer (``TwoLayerModel._dl_unit``)
+
+    lambda0 : float or :obj:`np.ndarray`
+        Initial climate feedback factor (``TwoLayerModel._lambda0_unit``)
+
+    a : float or :obj:`np.ndarray`
+        Dependence of climate feedback factor on temperature
+        (``TwoLayerModel._a_unit``)
+
+    efficacy : float or :obj:`np.ndarray`
+        Efficacy factor (``TwoLayerModel._efficacy_unit``)
+
+    eta : float or :obj:`np.ndarray`
+        Heat transport efficiency (``TwoLayerModel._eta_unit``)
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and outputs
+
+    Returns
+    -------
+    dict of str : :obj:`np.ndarray`, dict of str : dict of str : :obj:`np.ndarray`
+        The outputs, as for :func:`openscm_twolayermodel.batched.run_two_layer`,
+        and the derivative of each output with respect to each parameter in
+        ``TwoLayerModel._save_paras`` (e.g. ``sensitivities["rndt"]["eta"]``),
+        in the models' internal units, with the same shape as the outputs
+    """
+    out_shape = _get_output_shape(erf, (du, dl, lambda0, a, efficacy, eta))
+    n_time = out_shape[-1]
+    n_paras = len(TwoLayerModel._save_paras)
+    idx = {k: i for i, k in enumerate(TwoLayerModel._save_paras)}
+
+    erf = np.broadcast_to(np.asarray(erf, dtype=dtype), out_shape)
+    heat_capacity_per_depth, heat_capacity_upper, heat_capacity_lower = _cast_paras(
+        dtype,
+        _HEAT_CAPACITY_PER_DEPTH_MAG,
+        np.multiply(du, _HEAT_CAPACITY_PER_DEPTH_MAG),
+        np.multiply(dl, _HEAT_CAPACITY_PER_DEPTH_MAG),
+    )
+    delta_t, lambda0, a, efficacy, eta = _cast_paras(
+        dtype, delta_t, lambda0, a, efficacy, eta
+    )
+
+    temp_upper = np.zeros(out_shape, dtype=dtype)
+    temp_lower = np.zeros(out_shape, dtype=dtype)
+    rndt = np.zeros(out_shape, dtype=dtype)
+    # derivatives, the first axis is the parameter
+    d_temp_upper = np.zeros((n_paras,) + out_shape, dtype=dtype)
+    d_temp_lower = np.zeros((n_paras,) + out_shape, dtype=dtype)
+    d_rndt = np.zeros((n_paras,) + out_shape, dtype=dtype)
+
+    # derivative of the flux into each layer with respect to the parameters,
+    # holding the state fixed
+    explicit_upper = np.zeros((n_paras,) + out_shape[:-1], dtype=dtype)
+    explicit_lower = np.zeros((n_paras,) + out_shape[:-1], dtype=dtype)
+
+    for i in range(1, n_time):
+        t_upper = temp_upper[..., i - 1]
+        t_lower = temp_lower[..., i - 1]
+        dt_upper = d_temp_upper[..., i - 1]
+        dt_lower = d_temp_lower[..., i - 1]
+
+        temp_upper[..., i] = TwoLayerModel._calculate_next_temp_upper(
+            delta_t,
+            t_upper,
+            t_lower,
+            erf[..., i - 1],
+            lambda0,
+            a,
+            efficacy,
+            eta,
+            heat_capacity_upper,
+        )
+        temp_lower[..., i] = TwoLayerModel._calculate_next_temp_lower(
+            delta_t, t_lower, t_upper, eta, heat_capacity_lower
+        )
+        rndt[..., i] = TwoLayerModel._calculate_next_rndt(
+            delta_t,
+            temp_lower[..., i],
+            t_lower,
+            heat_capacity_lower,
+            temp_upper[..., i],
+            t_upper,
+            heat_capacity_upper,
+        )
+
+        temp_diff = t_upper - t_lower
+        flux_upper = heat_capacity_upper * (temp_upper[..., i] - t_upper) / delta_t
+        flux_lower = heat_capacity_lower * (temp_lower[..., i] - t_lower) / delta_t
+
+        explicit_upper[idx["du"]] = (
+            -flux_upper * heat_capacity_per_depth / heat_capacity_upper
+        )
+        explicit_upper[idx["lambda0"]] = -t_upper
+        explicit_upper[idx["a"]] = t_upper ** 2
+        explicit_upper[idx["efficacy"]] = -eta * temp_diff
+        explicit_upper[idx["eta"]] = -efficacy * temp_diff
+        explicit_lower[idx["dl"]] = (
+            -flux_lower * heat_capacity_per_depth / heat_capacity_lower
+        )
+        explicit_lower[idx["eta"]] = temp_diff
+
+        d_temp_diff = dt_upper - dt_lower
+        d_flux_upper = (
+            -(lambda0 - 2 * a * t_upper) * dt_upper
+            - efficacy * eta * d_temp_diff
+            + explicit_upper
+        )
+        d_flux_lower = eta * d_temp_diff + explicit_lower
+
+        d_temp_upper[..., i] = dt_upper + delta_t / heat_capacity_upper * d_flux_upper
+        d_temp_lower[..., i] = dt_lower + delta_t / heat_capacity_lower * d_flux_lower
+
+        # the heat uptake is the sum of the fluxes, whose derivatives don't
+        # include the heat capacity terms
+        d_rndt[..., i] = d_flux_upper + d_flux_lower
+        d_rndt[idx["du"], ..., i] += (
+            flux_upper * heat_capacity_per_depth / heat_capacity_upper
+        )
+        d_rndt[idx["dl"], ..., i] += (
+            flux_lower * heat_capacity_per_depth / heat_capacity_lower
+        )
+
+    outputs = {"temp_upper": temp_upper, "temp_lower": temp_lower, "rndt": rndt}
+    sensitivities = {
+        "temp_upper": d_temp_upper,
+        "temp_lower": d_temp_lower,
+        "rndt": d_rndt,
+    }
+
+    return (
+        outputs,
+        _unstack_sensitivities(TwoLayerModel._save_paras, sensitivities),
+    )
+
+
+def _get_impulse_response_rndt_para_derivatives(q1, q2, d1, d2, efficacy):
+    # The coefficients are complicated functions of the parameters but don't
+    # vary in time so their derivatives are taken with central differences,
+    # all parameters in one batch. The derivatives of the time stepping are
+    # still exact.
+    paras = np.array(
+        np.broadcast_arrays(
+            *[np.asarray(v, dtype=float) for v in (d1, d2, q1, q2, efficacy)]
+        )
+    )
+    n_paras = paras.shape[0]
+    step = 1e-6 * np.maximum(np.abs(paras), 1)
+    perturbation = np.eye(n_paras).reshape((n_paras, n_paras) + (1,) * (paras.ndim - 1))
+    perturbation = perturbation * step
+
+    def get_coeffs(p):
+        d1_p, d2_p, q1_p, q2_p, efficacy_p = p
+        return np.array(
+            np.broadcast_arrays(
+                *calculate_impulse_response_rndt_paras(
+                    q1_p, q2_p, d1_p, d2_p, efficacy_p
+                )
+            )
+        )
+
+    # shape (n_coeffs, n_paras, ...)
+    derivatives = (
+        get_coeffs(np.swapaxes(paras + perturbation, 0, 1))
+        - get_coeffs(np.swapaxes(paras - perturbation, 0, 1))
+    ) / (2 * step)
+
+    return derivatives
+
+
+def run_impulse_response_tangent_linear(  # pylint:disable=too-many-arguments,too-many-locals
+    erf, delta_t, d1, d2, q1, q2, efficacy, dtype=np.float64
+):
+    """
+    Run the impulse response model and its tangent-linear model for a batch of ensemble members
+
+    The derivatives of the (time-invariant) coefficients used to calculate the
+    heat uptake (see :meth:`ImpulseResponseModel.get_two_layer_parameters`)
+    are calculated with central differences, everything else is exact.
+
+    Parameters
+    ----------
+    erf : :obj:`np.ndarray`
+        Effective radiative forcing (``ImpulseResponseModel._erf_unit``), time
+        must be the last axis
+
+    delta_t : float
+        Timestep (``ImpulseResponseModel._delta_t_unit``)
+
+    d1 : float or :obj:`np.ndarray`
+        Response timescale of first box (``ImpulseResponseModel._d1_unit``)
+
+    d2 : float or :obj:`np.ndarray`
+        Response timescale of second box (``ImpulseResponseModel._d2_unit``)
+
+    q1 : float or :obj:`np.ndarray`
+        Sensitivity of first box response to radiative forcing
+        (``ImpulseResponseModel._q1_unit``)
+
+    q2 : float or :obj:`np.ndarray`
+        Sensitivity of second box response to radiative forcing
+        (``ImpulseResponseModel._q2_unit``)
+
+    efficacy : float or :obj:`np.ndarray`
+        Efficacy factor (``ImpulseResponseModel._efficacy_unit``)
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and outputs
+
+    Returns
+    -------
+    dict of str : :obj:`np.ndarray`, dict of str : dict of str : :obj:`np.ndarray`
+        The outputs, as for
+        :func:`openscm_twolayermodel.batched.run_impulse_response`, and the
+        derivative of each output with respect to each parameter in
+        ``ImpulseResponseModel._save_paras``, in the models' internal units,
+        with the same shape as the outputs
+    """
+    out_shape = _get_output_shape(erf, (d1, d2, q1, q2, efficacy))
+    n_time = out_shape[-1]
+    n_paras = len(ImpulseResponseModel._save_paras)
+    idx = {k: i for i, k in enumerate(ImpulseResponseModel._save_paras)}
+
+    erf = np.broadcast_to(np.asarray(erf, dtype=dtype), out_shape)
+
+    lambda0, coeff1, coeff2 = _cast_paras(
+        dtype, *calculate_impulse_response_rndt_paras(q1, q2, d1, d2, efficacy)
+    )
+    # the first axis is the parameter, pad so the rest broadcasts like the
+    # ensemble members
+    n_member_dims = len(out_shape) - 1
+    d_lambda0, d_coeff1, d_coeff2 = [
+        np.asarray(v, dtype=dtype).reshape(
+            (n_paras,) + (1,) * (n_member_dims - v.ndim + 1) + v.shape[1:]
+        )
+        for v in _get_impulse_response_rndt_para_derivatives(q1, q2, d1, d2, efficacy)
+    ]
+    delta_t, d1, d2, q1, q2 = _cast_paras(dtype, delta_t, d1, d2, q1, q2)
+
+    decay1 = np.exp(-delta_t / d1)
+    decay2 = np.exp(-delta_t / d2)
+    d_decay1 = decay1 * delta_t / d1 ** 2
+    d_decay2 = decay2 * delta_t / d2 ** 2
+
+    temp1 = np.zeros(out_shape, dtype=dtype)
+    temp2 = np.zeros(out_shape, dtype=dtype)
+    rndt = np.zeros(out_shape, dtype=dtype)
+    d_temp1 = np.zeros((n_paras,) + out_shape, dtype=dtype)
+    d_temp2 = np.zeros((n_paras,) + out_shape, dtype=dtype)
+    d_rndt = np.zeros((n_paras,) + out_shape, dtype=dtype)
+
+    for i in range(1, n_time):
+        erf_now = erf[..., i - 1]
+        t1 = temp1[..., i - 1]
+        t2 = temp2[..., i - 1]
+
+        temp1[..., i] = ImpulseResponseModel._calculate_next_temp(
+            delta_t, t1, q1, d1, erf_now
+        )
+        temp2[..., i] = ImpulseResponseModel._calculate_next_temp(
+            delta_t, t2, q2, d2, erf_now
+        )
+        rndt[..., i] = erf_now - lambda0 * (t1 + t2) - (coeff1 * t1 + coeff2 * t2)
+
+        d_temp1[..., i] = d_temp1[..., i - 1] * decay1
+        d_temp1[idx["d1"], ..., i] += (t1 - erf_now * q1) * d_decay1
+        d_temp1[idx["q1"], ..., i] += erf_now * (1 - decay1)
+
+        d_temp2[..., i] = d_temp2[..., i - 1] * decay2
+        d_temp2[idx["d2"], ..., i] += (t2 - erf_now * q2) * d_decay2
+        d_temp2[idx["q2"], ..., i] += erf_now * (1 - decay2)
+
+        d_rndt[..., i] = (
+            -(lambda0 + coeff1) * d_temp1[..., i - 1]
+            - (lambda0 + coeff2) * d_temp2[..., i - 1]
+            - d_lambda0 * (t1 + t2)
+            - d_coeff1 * t1
+            - d_coeff2 * t2
+        )
+
+    outputs = {"temp1": temp1, "temp2": temp2, "rndt": rndt}
+    sensitivities = {"temp1": d_temp1, "temp2": d_temp2, "rndt": d_rndt}
+
+    return (
+        outputs,
+        _unstack_sensitivities(ImpulseResponseModel._save_paras, sensitivities),
+    )
+
+
+def get_rmse_loss(target, variables):
+    """
+    Get a root-mean-square error loss for use with the adjoint kernels
+
+    Parameters
+    ----------
+    target : :obj:`np.ndarray`
+        Target values (e.g. observations) in the model's internal units. Must
+        broadcast against the model output. ``np.nan`` values are ignored.
+
+    variables : str or tuple of str
+        Output variable(s) to compare with ``target``. If several are given,
+        their sum is compared e.g. ``("temp1", "temp2")`` gives the surface
+        temperature of :obj:`ImpulseResponseModel`.
+
+    Returns
+    -------
+    callable
+        Function which takes the model outputs and returns the RMSE (over
+        all ensemble members and timesteps) and its derivative with respect to
+        each of ``variables``
+    """
+    variables = (variables,) if isinstance(variables, str) else tuple(variables)
+    target = np.asarray(target, dtype=float)
+
+    def loss_gradient(outputs):
+        diff = sum(outputs[v] for v in variables) - target
+        valid = ~np.isnan(diff)
+        n_valid = np.sum(valid)
+        diff = np.where(valid, diff, 0)
+
+        rmse = np.sqrt(np.sum(diff ** 2) / n_valid)
+        gradient = diff / (n_valid * rmse) if rmse > 0 else np.zeros_like(diff)
+
+        return rmse, {v: gradient for v in variables}
+
+    return loss_gradient
+
+
+def _get_output_gradients(loss_gradient, outputs, dtype):
+    loss, output_gradients = loss_gradient(outputs)
+    out_shape = outputs["rndt"].shape
+
+    return (
+        loss,
+        [
+            np.broadcast_to(
+                np.asarray(output_gradients.get(k, 0), dtype=dtype), out_shape
+            )
+            for k in outputs
+        ],
+    )
+
+
+def run_two_layer_adjoint(  # pylint:disable=too-many-arguments,too-many-locals,too-many-statements
+    erf, delta_t, du, dl, lambda0, a, efficacy, eta, loss_gradient, dtype=np.float64
+):
+    """
+    Calculate the gradient of a loss with respect to the two-layer model's forcing and parameters
+
+    Parameters
+    ----------
+    erf : :obj:`np.ndarray`
+        Effective radiative forcing (``TwoLayerModel._erf_unit``), time must be
+        the last axis
+
+    delta_t : float
+        Timestep (``TwoLayerModel._delta_t_unit``)
+
+    du : float or :obj:`np.ndarray`
+        Depth of upper layer (``TwoLayerModel._du_unit``)
+
+    dl : float or :obj:`np.ndarray`
+        Depth of lower layer (``TwoLayerModel._dl_unit``)
+
+    lambda0 : float or :obj:`np.ndarray`
+        Initial climate feedback factor (``TwoLayerModel._lambda0_unit``)
+
+    a : float or :obj:`np.ndarray`
+        Dependence of climate feedback factor on temperature
+        (``TwoLayerModel._a_unit``)
+
+    efficacy : float or :obj:`np.ndarray`
+        Efficacy factor (``TwoLayerModel._efficacy_unit``)
+
+    eta : float or :obj:`np.ndarray`
+        Heat transport efficiency (``TwoLayerModel._eta_unit``)
+
+    loss_gradient : callable
+        Function which takes the outputs of
+        :func:`openscm_twolayermodel.batched.run_two_layer` and returns the
+        (scalar) loss and a dictionary with its derivative with respect to
+        each output which affects it (e.g. the output of
+        :func:`get_rmse_loss`)
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and outputs
+
+    Returns
+    -------
+    float, dict of str : :obj:`np.ndarray`
+        The loss and its derivative with respect to ``"erf"`` (with the same
+        shape as the outputs) and each parameter in
+        ``TwoLayerModel._save_paras`` (one value per ensemble member i.e. the
+        shape of the outputs without the time axis), in the models' internal
+        units
+    """
+    outputs = run_two_layer(
+        erf, delta_t, du, dl, lambda0, a, efficacy, eta, dtype=dtype
+    )
+    loss, (g_upper, g_lower, g_rndt) = _get_output_gradients(
+        loss_gradient, outputs, dtype
+    )
+    temp_upper = outputs["temp_upper"]
+    temp_lower = outputs["temp_lower"]
+    out_shape = temp_upper.shape
+
+    erf = np.broadcast_to(np.asarray(erf, dtype=dtype), out_shape)
+    heat_capacity_per_depth, heat_capacity_upper, heat_capacity_lower = _cast_paras(
+        dtype,
+        _HEAT_CAPACITY_PER_DEPTH_MAG,
+        np.multiply(du, _HEAT_CAPACITY_PER_DEPTH_MAG),
+        np.multiply(dl, _HEAT_CAPACITY_PER_DEPTH_MAG),
+    )
+    delta_t, lambda0, a, efficacy, eta = _cast_paras(
+        dtype, delta_t, lambda0, a, efficacy, eta
+    )
+
+    gradients = {"erf": np.zeros(out_shape, dtype=dtype)}
+    for k in TwoLayerModel._save_paras:
+        gradients[k] = np.zeros(out_shape[:-1], dtype=dtype)
+
+    # derivatives of the loss with respect to the state, including the
+    # effect of the state on all later timesteps
+    adj_upper = g_upper[..., -1].copy()
+    adj_lower = g_lower[..., -1].copy()
+    for i in range(out_shape[-1] - 1, 0, -1):
+        t_upper = temp_upper[..., i - 1]
+        t_lower = temp_lower[..., i - 1]
+        temp_diff = t_upper - t_lower
+        flux_upper = (
+            erf[..., i - 1]
+            - (lambda0 - a * t_upper) * t_upper
+            - efficacy * eta * temp_diff
+        )
+        flux_lower = eta * temp_diff
+
+        # derivatives of the loss with respect to the flux into each layer,
+        # the heat uptake is the sum of the two fluxes
+        adj_flux_upper = adj_upper * delta_t / heat_capacity_upper
+        adj_flux_lower = adj_lower * delta_t / heat_capacity_lower
+        w_upper = adj_flux_upper + g_rndt[..., i]
+        w_lower = adj_flux_lower + g_rndt[..., i]
+
+        gradients["erf"][..., i - 1] = w_upper
+        gradients["du"] -= (
+            adj_flux_upper * flux_upper * heat_capacity_per_depth / heat_capacity_upper
+        )
+        gradients["dl"] -= (
+            adj_flux_lower * flux_lower * heat_capacity_per_depth / heat_capacity_lower
+        )
+        gradients["lambda0"] -= w_upper * t_upper
+        gradients["a"] += w_upper * t_upper ** 2
+        gradients["efficacy"] -= w_upper * eta * temp_diff
+        gradients["eta"] += (w_lower - efficacy * w_upper) * temp_diff
+
+        adj_upper, adj_lower = (
+            g_upper[..., i - 1]
+            + adj_upper
+            - w_upper * (lambda0 - 2 * a * t_upper + efficacy * eta)
+            + w_lower * eta,
+            g_lower[..., i - 1] + adj_lower + (w_upper * efficacy - w_lower) * eta,
+        )
+
+    return loss, gradients
+
+
+def run_impulse_response_adjoint(  # pylint:disable=too-many-arguments,too-many-locals
+    erf, delta_t, d1, d2, q1, q2, efficacy, loss_gradient, dtype=np.float64
+):
+    """
+    Calculate the gradient of a loss with respect to the impulse response model's forcing and parameters
+
+    As in :func:`run_impulse_response_tangent_linear`, the derivatives of
+    the heat uptake coefficients are calculated with central differences.
+
+    Parameters
+    ----------
+    erf : :obj:`np.ndarray`
+        Effective radiative forcing (``ImpulseResponseModel._erf_unit``), time
+        must be the last axis
+
+    delta_t : float
+        Timestep (``ImpulseResponseModel._delta_t_unit``)
+
+    d1 : float or :obj:`np.ndarray`
+        Response timescale of first box (``ImpulseResponseModel._d1_unit``)
+
+    d2 : float or :obj:`np.ndarray`
+        Response timescale of second box (``ImpulseResponseModel._d2_unit``)
+
+    q1 : float or :obj:`np.ndarray`
+        Sensitivity of first box response to radiative forcing
+        (``ImpulseResponseModel._q1_unit``)
+
+    q2 : float or :obj:`np.ndarray`
+        Sensitivity of second box response to radiative forcing
+        (``ImpulseResponseModel._q2_unit``)
+
+    efficacy : float or :obj:`np.ndarray`
+        Efficacy factor (``ImpulseResponseModel._efficacy_unit``)
+
+    loss_gradient : callable
+        Function which takes the outputs of
+        :func:`openscm_twolayermodel.batched.run_impulse_response` and returns
+        the (scalar) loss and a dictionary with its derivative with respect to
+        each output which affects it (e.g. the output of
+        :func:`get_rmse_loss`)
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and outputs
+
+    Returns
+    -------
+    float, dict of str : :obj:`np.ndarray`
+        The loss and its derivative with respect to ``"erf"`` (with the same
+        shape as the outputs) and each parameter in
+        ``ImpulseResponseModel._save_paras`` (one value per ensemble member),
+        in the models' internal units
+    """
+    outputs = run_impulse_response(erf, delta_t, d1, d2, q1, q2, efficacy, dtype=dtype)
+    loss, (g_temp1, g_temp2, g_rndt) = _get_output_gradients(
+        loss_gradient, outputs, dtype
+    )
+    temp1 = outputs["temp1"]
+    temp2 = outputs["temp2"]
+    out_shape = temp1.shape
+
+    erf = np.broadcast_to(np.asarray(erf, dtype=dtype), out_shape)
+    lambda0, coeff1, coeff2 = _cast_paras(
+        dtype, *calculate_impulse_response_rndt_paras(q1, q2, d1, d2, efficacy)
+    )
+    coeff_derivatives = _get_impulse_response_rndt_para_derivatives(
+        q1, q2, d1, d2, efficacy
+    )
+    delta_t, d1, d2, q1, q2 = _cast_paras(dtype, delta_t, d1, d2, q1, q2)
+
+    decay1 = np.exp(-delta_t / d1)
+    decay2 = np.exp(-delta_t / d2)
+
+    gradients = {"erf": np.zeros(out_shape, dtype=dtype)}
+    for k in ImpulseResponseModel._save_paras:
+        gradients[k] = np.zeros(out_shape[:-1], dtype=dtype)
+
+    coeff_gradients = np.zeros((3,) + out_shape[:-1], dtype=dtype)
+
+    adj1 = g_temp1[..., -1].copy()
+    adj2 = g_temp2[..., -1].copy()
+    for i in range(out_shape[-1] - 1, 0, -1):
+        erf_now = erf[..., i - 1]
+        t1 = temp1[..., i - 1]
+        t2 = temp2[..., i - 1]
+        g_r = g_rndt[..., i]
+
+        gradients["erf"][..., i - 1] = (
+            adj1 * q1 * (1 - decay1) + adj2 * q2 * (1 - decay2) + g_r
+        )
+        gradients["d1"] += adj1 * (t1 - erf_now * q1) * decay1 * delta_t / d1 ** 2
+        gradients["d2"] += adj2 * (t2 - erf_now * q2) * decay2 * delta_t / d2 ** 2
+        gradients["q1"] += adj1 * erf_now * (1 - decay1)
+        gradients["q2"] += adj2 * erf_now * (1 - decay2)
+
+        coeff_gradients[0] -= g_r * (t1 + t2)
+        coeff_gradients[1] -= g_r * t1
+        coeff_gradients[2] -= g_r * t2
+
+        adj1 = g_temp1[..., i - 1] + adj1 * decay1 - g_r * (lambda0 + coeff1)
+        adj2 = g_temp2[..., i - 1] + adj2 * decay2 - g_r * (lambda0 + coeff2)
+
+    # chain rule through the heat uptake coefficients, padding their
+    # derivatives so they broadcast like the ensemble members
+    n_member_dims = len(out_shape) - 1
+    coeff_derivatives = coeff_derivatives.reshape(
+        coeff_derivatives.shape[:2]
+        + (1,) * (n_member_dims - coeff_derivatives.ndim + 2)
+        + coeff_derivatives.shape[2:]
+    )
+    for i, k in enumerate(ImpulseResponseModel._save_paras):
+        gradients[k] += np.sum(coeff_gradients * coeff_derivatives[:, i], axis=0)
+
+    return loss, gradients
+
+
+_KERNELS = {
+    TwoLayerModel: (run_two_layer_tangent_linear, run_two_layer_adjoint),
+    ImpulseResponseModel: (
+        run_impulse_response_tangent_linear,
+        run_impulse_response_adjoint,
+    ),
+}
+
+
+def _get_kernels(model):
+    for model_cls, kernels in _KERNELS.items():
+        if isinstance(model, model_cls):
+            return kernels
+
+    raise NotImplementedError(
+        "No sensitivity kernels for {}".format(type(model).__name__)
+    )
+
+
+def _get_model_args(model):
+    return {k: getattr(model, "_{}_mag".format(k)) for k in model._save_paras}
+
+
+def _run_tangent_linear(model):
+    kernel, _ = _get_kernels(model)
+
+    return kernel(
+        model._erf_mag, model._delta_t_mag, dtype=model.dtype, **_get_model_args(model)
+    )
+
+
+def calculate_gradients(model, loss_gradient):
+    """
+    Calculate the gradient of a loss with respect to a model's forcing and parameters
+
+    The model's current drivers and parameters are used, the model itself is
+    not changed.
+
+    Parameters
+    ----------
+    model : :obj:`TwoLayerModel` or :obj:`ImpulseResponseModel`
+        Model, its drivers must have been set with
+        :meth:`TwoLayerVariant.set_drivers`
+
+    loss_gradient : callable
+        Function which takes a dictionary of the model outputs
+        (``model._output_vars``) and returns the (scalar) loss and a dictionary
+        with its derivative with respect to each output which affects it
+        (e.g. the output of :func:`get_rmse_loss`)
+
+    Returns
+    -------
+    float, dict of str : :obj:`np.ndarray`
+        The loss and its derivative with respect to ``"erf"`` and each
+        parameter in ``model._save_paras``, in the model's internal units
+
+    Raises
+    ------
+    ModelStateError
+        The model's drivers have not been set
+    """
+    if np.isnan(model.erf).any():
+        raise ModelStateError(
+            "The model's drivers have not been set yet, call "
+            ":meth:`self.set_drivers` first."
+        )
+
+    _, kernel = _get_kernels(model)
+
+    return kernel(
+        model._erf_mag,
+        model._delta_t_mag,
+        loss_gradient=loss_gradient,
+        dtype=model.dtype,
+        **_get_model_args(model)
+    )
@@ -0,0 +1,411 @@
+"""
+Memory-mapped output stores for ensembles which are larger than memory
+
+A store is a raw binary file holding every output of a batched run in one
+:obj:`np.memmap` with shape ``(variable, member, time)``, plus a small JSON
+sidecar (the data file's path with ``".json"`` appended) which records the
+layout, units and any other metadata. :func:`run_to_store` writes the batched
+kernels' outputs straight into the file, one chunk of members at a time, so
+memory use is bounded by the chunk size. :func:`open_store` only reads the
+sidecar, the data is paged in as it is sliced, so a store of any size reopens
+instantly and each member's timeseries is contiguous on disk.
+"""
+import json
+import os
+
+import numpy as np
+
+from .batched import _get_kernel, _get_kernel_paras, _get_output_shape
+
+# pylint: disable=protected-access
+
+METADATA_SUFFIX = ".json"
+"""str : Suffix added to a store's path to give the path of its metadata"""
+
+_FORMAT_VERSION = 1
+
+
+def _get_metadata_path(path):
+    return os.fspath(path) + METADATA_SUFFIX
+
+
+class OutputStore:
+    """
+    Model outputs in a memory-mapped file
+
+    Stores are created with :func:`create_store` or :func:`run_to_store` and
+    reopened with :func:`open_store`, rather than by initialising this class
+    directly.
+    """
+
+    def __init__(self, data, metadata):
+        """
+        Initialise
+
+        Parameters
+        ----------
+        data : :obj:`np.memmap`
+            Memory-mapped data, with shape ``(variable, member, time)``
+
+        metadata : dict
+            Store metadata, as written to the sidecar file
+        """
+        self._data = data
+        self._metadata = metadata
+        self._variable_idx = {k: i for i, k in enumerate(metadata["variables"])}
+
+    def __repr__(self):
+        """
+        Get string representation of self
+        """
+        return "<{} variables={} n_members={} n_time={} dtype={}>".format(
+            type(self).__name__,
+            list(self.variables),
+            self.n_members,
+            self.n_time,
+            self.data.dtype,
+        )
+
+    def __getitem__(self, variable):
+        """
+        Get the output for one variable
+
+        Parameters
+        ----------
+        variable : str
+            Variable to get
+
+        Returns
+        -------
+        :obj:`np.memmap`
+            View of the output (no data is read), with shape
+            ``(member, time)``
+
+        Raises
+        ------
+        KeyError
+            ``variable`` is not in the store
+        """
+        try:
+            return self._data[self._variable_idx[variable]]
+        except KeyError:
+            raise KeyError(
+                "{} not in store, available variables: {}".format(
+                    variable, list(self.variables)
+                )
+            ) from None
+
+    @property
+    def data(self):
+        """
+        :obj:`np.memmap`
+            All the data, with shape ``(variable, member, time)``
+        """
+        return self._data
+
+    @property
+    def metadata(self):
+        """
+        :obj:`dict`
+            Metadata of the store (a copy, changes are not saved)
+        """
+        return json.loads(json.dumps(self._metadata))
+
+    @property
+    def variables(self):
+        """
+        :obj:`tuple` of str
+            Variables in the store, in the order of the first axis of
+            :attr:`data`
+        """
+        return tuple(self._metadata["variables"])
+
+    @property
+    def n_members(self):
+        """
+        :obj:`int`
+            Number of ensemble members
+        """
+        return self._data.shape[1]
+
+    @property
+    def n_time(self):
+        """
+        :obj:`int`
+            Number of timesteps
+        """
+        return self._data.shape[2]
+
+    @property
+    def attrs(self):
+        """
+        :obj:`dict`
+            User attributes of the store (a copy, changes are not saved)
+        """
+        return self.metadata["attrs"]
+
+    def flush(self):
+        """
+        Write any changes to disk
+        """
+        self._data.flush()
+
+    def to_xarray(self):
+        """
+        Get the store as an :obj:`xarray.Dataset`
+
+        The data are not loaded, the dataset's variables are backed by the
+        memory map.
+
+        Returns
+        -------
+        :obj:`xarray.Dataset`
+            Output, with dimensions ``"member"`` and ``"time"``
+
+        Raises
+        ------
+        ImportError
+            :mod:`xarray` is not installed
+        """
+        try:
+            import xarray as xr  # pylint:disable=import-outside-toplevel
+        except ImportError:  # pragma: no cover
+            raise ImportError("xarray is not installed. Run 'pip install xarray'")
+
+        units = self._metadata["units"]
+        attrs = dict(self.attrs)
+        if self._metadata.get("climate_model") is not None:
+            attrs["climate_model"] = self._metadata["climate_model"]
+
+        return xr.Dataset(
+            {
+                k: xr.DataArray(
+                    self[k],
+                    dims=("member", "time"),
+                    attrs={"units": units[k]} if k in units else {},
+                )
+                for k in self.variables
+            },
+            attrs=attrs,
+        )
+
+
+def _get_metadata(  # pylint:disable=too-many-arguments
+    variables, n_members, n_time, dtype, units, attrs
+):
+    return {
+        "format_version": _FORMAT_VERSION,
+        "variables": list(variables),
+        "shape": [len(variables), int(n_members), int(n_time)],
+        "dtype": np.dtype(dtype).str,
+        "units": {} if units is None else dict(units),
+        "climate_model": None,
+        "attrs": {} if attrs is None else dict(attrs),
+    }
+
+
+def _create(path, metadata, fill):
+    data = np.memmap(
+        path,
+        dtype=np.dtype(metadata["dtype"]),
+        mode="w+",
+        shape=tuple(metadata["shape"]),
+    )
+    if fill:
+        data.fill(np.nan)
+
+    with open(_get_metadata_path(path), "w") as fh:
+        json.dump(metadata, fh, indent=2)
+
+    return OutputStore(data, metadata)
+
+
+def create_store(  # pylint:disable=too-many-arguments
+    path, variables, n_members, n_time, dtype=np.float64, units=None, attrs=None
+):
+    """
+    Create an empty store
+
+    Parameters
+    ----------
+    path : str or :obj:`os.PathLike`
+        Path of the data file, the metadata is written to ``path`` plus
+        :data:`METADATA_SUFFIX`. Existing files are overwritten.
+
+    variables : list of str
+        Variables to store
+
+    n_members : int
+        Number of ensemble members
+
+    n_time : int
+        Number of timesteps
+
+    dtype : :obj:`np.dtype`
+        Type of the data
+
+    units : dict of str : str
+        Units of each variable
+
+    attrs : dict
+        Any other (JSON serialisable) metadata to save with the store
+
+    Returns
+    -------
+    :obj:`OutputStore`
+        Store, open for reading and writing, with all values ``np.nan``
+    """
+    return _create(
+        path,
+        _get_metadata(list(variables), n_members, n_time, dtype, units, attrs),
+        fill=True,
+    )
+
+
+def open_store(path, mode="r"):
+    """
+    Open an existing store
+
+    Only the metadata is read, the data are read as they are accessed.
+
+    Parameters
+    ----------
+    path : str or :obj:`os.PathLike`
+        Path of the data file
+
+    mode : str
+        ``"r"`` (read-only), ``"r+"`` (read and write) or ``"c"``
+        (copy-on-write, changes are not saved), see :obj:`np.memmap`
+
+    Returns
+    -------
+    :obj:`OutputStore`
+        Store
+
+    Raises
+    ------
+    ValueError
+        The store was written with an unsupported format version or its data
+        file does not match its metadata
+    """
+    with open(_get_metadata_path(path)) as fh:
+        metadata = json.load(fh)
+
+    if metadata.get("format_version") != _FORMAT_VERSION:
+        raise ValueError(
+            "Unsupported store format version: {}".format(
+                metadata.get("format_version")
+            )
+        )
+
+    dtype = np.dtype(metadata["dtype"])
+    shape = tuple(metadata["shape"])
+    if os.path.getsize(path) != dtype.itemsize * int(np.prod(shape)):
+        raise ValueError(
+            "Size of {} does not match the shape and dtype in its metadata".format(path)
+        )
+
+    return OutputStore(np.memmap(path, dtype=dtype, mode=mode, shape=shape), metadata)
+
+
+def run_to_store(  # pylint:disable=too-many-arguments,too-many-locals
+    model, erf, path, paras=None, chunk_size=1000, dtype=None, attrs=None
+):
+    """
+    Run an ensemble and write the output straight into a store
+
+    The members are run in chunks with the model's batched kernel (e.g.
+    :func:`openscm_twolayermodel.batched.run_two_layer`), each chunk writing
+    its outputs directly into the memory-mapped file.
+
+    Parameters
+    ----------
+    model : :obj:`TwoLayerModel` or :obj:`ImpulseResponseModel`
+        Model to run. Its parameters are used unless overridden by ``paras``,
+        its timestep is always used.
+
+    erf : :obj:`np.ndarray`
+        Effective radiative forcing (``model._erf_unit``), either one
+        timeseries for every member, with shape ``(time,)``, or one per
+        member, with shape ``(member, time)``. Can be a :obj:`np.memmap`
+        itself, only one chunk of it is read at a time.
+
+    path : str or :obj:`os.PathLike`
+        Path of the store's data file (see :func:`create_store`)
+
+    paras : dict of str : float or :obj:`np.ndarray`
+        Parameter values (magnitudes in the model's internal units e.g.
+        ``model._du_unit``) to use instead of ``model``'s, one-dimensional
+        arrays give the value for each member
+
+    chunk_size : int
+        Maximum number of members to run at once
+
+    dtype : :obj:`np.dtype`
+        Floating point type to use for the calculations and the store. If
+        ``None``, ``model.dtype`` is used.
+
+    attrs : dict
+        Any other (JSON serialisable) metadata to save with the store
+
+    Returns
+    -------
+    :obj:`OutputStore`
+        Store holding the output, open for reading and writing
+
+    Raises
+    ------
+    ValueError
+        ``erf`` or ``paras`` have more than one ensemble dimension or
+        ``paras`` contains unknown parameters
+    """
+    kernel, variables = _get_kernel(model)
+    paras = {} if paras is None else paras
+
+    unknown_paras = set(paras) - set(model._save_paras)
+    if unknown_paras:
+        raise ValueError("Unknown parameters: {}".format(sorted(unknown_paras)))
+
+    dtype = model.dtype if dtype is None else np.dtype(dtype)
+    kernel_paras = _get_kernel_paras(model, paras)
+    if np.ndim(erf) > 2 or any(np.ndim(v) > 1 for v in kernel_paras.values()):
+        raise ValueError("erf and paras can only have one ensemble (member) axis")
+
+    erf = np.atleast_2d(erf)
+    n_members, n_time = _get_output_shape(erf, kernel_paras.values())
+
+    metadata = _get_metadata(
+        list(variables),
+        n_members,
+        n_time,
+        dtype,
+        {k: getattr(model, "_{}_unit".format(k)) for k in variables},
+        attrs,
+    )
+    metadata.update(
+        {
+            "climate_model": model._name,
+            "long_names": dict(variables),
+            "delta_t": float(model._delta_t_mag),
+            "delta_t_unit": model._delta_t_unit,
+        }
+    )
+    # every value is written by the run so there is no need to fill the file
+    store = _create(path, metadata, fill=False)
+
+    for start in range(0, n_members, chunk_size):
+        members = slice(start, min(start + chunk_size, n_members))
+        kernel(
+            erf[members] if erf.shape[0] > 1 else erf,
+            model._delta_t_mag,
+            dtype=dtype,
+            out={k: store[k][members] for k in variables},
+            **{
+                k: v[members] if np.ndim(v) and np.shape(v)[0] > 1 else v
+                for k, v in kernel_paras.items()
+            },
+        )
+
+    store.flush()
+
+    return store
@@ -4,9 +4,17 @@ Module containing the two-layer model
 import numpy as np
 from openscm_units import unit_registry as ur
 
-from .base import TwoLayerVariant, _calculate_geoffroy_helper_parameters
-from .constants import DENSITY_WATER, HEAT_CAPACITY_WATER
+from ._numerics import (
+    calculate_next_temp_lower,
+    calculate_next_temp_upper,
+    calculate_next_two_layer_rndt,
+)
+from ._units import get_magnitude
+from .base import TwoLayerVariant
+from .constants import DENSITY_WATER_MAG, HEAT_CAPACITY_WATER_MAG
 from .errors import ModelStateError
+from .impulse_response_model import ImpulseResponseModel
+from .parameters import TwoLayerParameters
 
 # pylint: disable=invalid-name
 
@@ -21,6 +29,13 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
     In practice, this means that the first temperature and ocean heat uptake
     values will always be zero and the last value in the input drivers has no
     effect on model output.
+
+    The stochastic parameters, ``sigma_eta`` and ``sigma_xi``, follow the
+    stochastic two-layer model of `Cummins et al.
+    <https://journals.ametsoc.org/doi/full/10.1175/JCLI-D-19-0589.1>`_. They
+    are ignored by :meth:`run` and :meth:`run_scenarios`, which are always
+    deterministic. Stochastic realisations are run with
+    :func:`openscm_twolayermodel.batched.run_two_layer_stochastic`.
     """
 
     _du_unit = "m"
@@ -32,6 +47,8 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
     _efficacy_unit = "dimensionless"
     _eta_unit = "W/m^2/delta_degC"
     _delta_t_unit = "s"
+    _sigma_eta_unit = "W/m^2"
+    _sigma_xi_unit = "delta_degC"
 
     _erf_unit = "W/m^2"
 
@@ -48,8 +65,16 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
         "eta",
     )
 
+    _output_vars = (
+        "temp_upper",
+        "temp_lower",
+        "rndt",
+    )  # output variables, stored in ``_<var>_mag``
+
     _name = "two_layer"  # model name
 
+    _parameters_cls = TwoLayerParameters
+
     def __init__(
         self,
         du=50 * ur("m"),
@@ -59,6 +84,8 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
         efficacy=1.0 * ur("dimensionless"),
         eta=0.8 * ur("W/m^2/delta_degC"),
         delta_t=ur("yr").to("s"),
+        sigma_eta=0.0 * ur("W/m^2"),
+        sigma_xi=0.0 * ur("delta_degC"),
     ):  # pylint: disable=too-many-arguments
         """
         Initialise
@@ -70,6 +97,8 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
         self.efficacy = efficacy
         self.eta = eta
         self.delta_t = delta_t
+        self.sigma_eta = sigma_eta
+        self.sigma_xi = sigma_xi
 
         self._erf = np.zeros(1) * np.nan
         self._temp_upper_mag = np.zeros(1) * np.nan
@@ -87,12 +116,13 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
 
     @du.setter
     def du(self, val):
-        self._assert_is_pint_quantity_with_units(val, "du", self._du_unit)
+        self._du_mag = get_magnitude(val, "du", self._du_unit)
         self._du = val
-        self._du_mag = val.to(self._du_unit).magnitude
-        self._heat_capacity_upper_mag = self.heat_capacity_upper.to(
-            self._heat_capacity_upper_unit
-        ).magnitude
+        self._parameters = None
+        # self._heat_capacity_upper_unit is J/delta_degC/m^2
+        self._heat_capacity_upper_mag = (
+            self._du_mag * DENSITY_WATER_MAG * HEAT_CAPACITY_WATER_MAG
+        )
 
     @property
     def heat_capacity_upper(self):
@@ -100,7 +130,7 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
         :obj:`pint.Quantity`
             Heat capacity of upper layer
         """
-        return self.du * DENSITY_WATER * HEAT_CAPACITY_WATER
+        return self._heat_capacity_upper_mag * ur(self._heat_capacity_upper_unit)
 
     @property
     def dl(self):
@@ -112,12 +142,13 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
 
     @dl.setter
     def dl(self, val):
-        self._assert_is_pint_quantity_with_units(val, "dl", self._dl_unit)
+        self._dl_mag = get_magnitude(val, "dl", self._dl_unit)
         self._dl = val
-        self._dl_mag = val.to(self._dl_unit).magnitude
-        self._heat_capacity_lower_mag = self.heat_capacity_lower.to(
-            self._heat_capacity_lower_unit
-        ).magnitude
+        self._parameters = None
+        # self._heat_capacity_lower_unit is J/delta_degC/m^2
+        self._heat_capacity_lower_mag = (
+            self._dl_mag * DENSITY_WATER_MAG * HEAT_CAPACITY_WATER_MAG
+        )
 
     @property
     def heat_capacity_lower(self):
@@ -125,7 +156,7 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
         :obj:`pint.Quantity`
             Heat capacity of lower layer
         """
-        return self.dl * DENSITY_WATER * HEAT_CAPACITY_WATER
+        return self._heat_capacity_lower_mag * ur(self._heat_capacity_lower_unit)
 
     @property
     def lambda0(self):
@@ -137,9 +168,9 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
 
     @lambda0.setter
     def lambda0(self, val):
-        self._assert_is_pint_quantity_with_units(val, "lambda0", self._lambda0_unit)
+        self._lambda0_mag = get_magnitude(val, "lambda0", self._lambda0_unit)
         self._lambda0 = val
-        self._lambda0_mag = val.to(self._lambda0_unit).magnitude
+        self._parameters = None
 
     @property
     def a(self):
@@ -151,9 +182,9 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
 
     @a.setter
     def a(self, val):
-        self._assert_is_pint_quantity_with_units(val, "a", self._a_unit)
+        self._a_mag = get_magnitude(val, "a", self._a_unit)
         self._a = val
-        self._a_mag = val.to(self._a_unit).magnitude
+        self._parameters = None
 
     @property
     def efficacy(self):
@@ -165,9 +196,9 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
 
     @efficacy.setter
     def efficacy(self, val):
-        self._assert_is_pint_quantity_with_units(val, "efficacy", self._efficacy_unit)
+        self._efficacy_mag = get_magnitude(val, "efficacy", self._efficacy_unit)
         self._efficacy = val
-        self._efficacy_mag = val.to(self._efficacy_unit).magnitude
+        self._parameters = None
 
     @property
     def eta(self):
@@ -179,9 +210,37 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
 
     @eta.setter
     def eta(self, val):
-        self._assert_is_pint_quantity_with_units(val, "eta", self._eta_unit)
+        self._eta_mag = get_magnitude(val, "eta", self._eta_unit)
         self._eta = val
-        self._eta_mag = val.to(self._eta_unit).magnitude
+        self._parameters = None
+
+    @property
+    def sigma_eta(self):
+        """
+        :obj:`pint.Quantity`
+            Standard deviation of the stochastic forcing perturbation applied at
+            each timestep
+        """
+        return self._sigma_eta
+
+    @sigma_eta.setter
+    def sigma_eta(self, val):
+        self._sigma_eta_mag = get_magnitude(val, "sigma_eta", self._sigma_eta_unit)
+        self._sigma_eta = val
+
+    @property
+    def sigma_xi(self):
+        """
+        :obj:`pint.Quantity`
+            Standard deviation of the stochastic upper layer temperature
+            perturbation applied at each timestep
+        """
+        return self._sigma_xi
+
+    @sigma_xi.setter
+    def sigma_xi(self, val):
+        self._sigma_xi_mag = get_magnitude(val, "sigma_xi", self._sigma_xi_unit)
+        self._sigma_xi = val
 
     def _reset(self):
         if np.isnan(self.erf).any():
@@ -191,9 +250,8 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
             )
 
         self._timestep_idx = np.nan
-        self._temp_upper_mag = np.zeros_like(self._erf_mag) * np.nan
-        self._temp_lower_mag = np.zeros_like(self._erf_mag) * np.nan
-        self._rndt_mag = np.zeros_like(self._erf_mag) * np.nan
+        self._erf_mag = self._erf_mag.astype(self.dtype, copy=False)
+        self._reset_outputs()
 
     def _run(self):
         for _ in self.erf:
@@ -242,39 +300,9 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
                 self._heat_capacity_upper_mag,
             )
 
-    @staticmethod
-    def _calculate_next_temp_upper(  # pylint: disable=too-many-arguments
-        delta_t, t_upper, t_lower, erf, lambda0, a, efficacy, eta, heat_capacity_upper
-    ):
-        lambda_now = lambda0 - a * t_upper
-        heat_exchange = efficacy * eta * (t_upper - t_lower)
-        dT_dt = (erf - lambda_now * t_upper - heat_exchange) / heat_capacity_upper
-
-        return t_upper + delta_t * dT_dt
-
-    @staticmethod
-    def _calculate_next_temp_lower(
-        delta_t, t_lower, t_upper, eta, heat_capacity_lower
-    ):  # pylint: disable=too-many-arguments
-        heat_exchange = eta * (t_upper - t_lower)
-        dT_dt = heat_exchange / heat_capacity_lower
-
-        return t_lower + delta_t * dT_dt
-
-    @staticmethod
-    def _calculate_next_rndt(  # pylint: disable=too-many-arguments
-        delta_t,
-        t_lower_now,
-        t_lower_prev,
-        heat_capacity_lower,
-        t_upper_now,
-        t_upper_prev,
-        heat_capacity_upper,
-    ):
-        uptake_lower = heat_capacity_lower * (t_lower_now - t_lower_prev) / delta_t
-        uptake_upper = heat_capacity_upper * (t_upper_now - t_upper_prev) / delta_t
-
-        return uptake_upper + uptake_lower
+    _calculate_next_temp_upper = staticmethod(calculate_next_temp_upper)
+    _calculate_next_temp_lower = staticmethod(calculate_next_temp_lower)
+    _calculate_next_rndt = staticmethod(calculate_next_two_layer_rndt)
 
     def _get_run_output_tss(self, ts_base):
         out_run_tss = []
@@ -333,23 +361,7 @@ class TwoLayerModel(TwoLayerVariant):  # pylint: disable=too-many-instance-attri
                 "non-zero a={}".format(self.a)
             )
 
-        gh = _calculate_geoffroy_helper_parameters(
-            self.du, self.dl, self.lambda0, self.efficacy, self.eta
-        )
-
-        d1 = gh["tau1"]
-        d2 = gh["tau2"]
-
-        qdenom = gh["C"] * (gh["phi2"] - gh["phi1"])
-        q1 = gh["tau1"] * gh["phi2"] / qdenom
-        q2 = -gh["tau2"] * gh["phi1"] / qdenom
-
-        out = {
-            "d1": d1,
-            "d2": d2,
-            "q1": q1,
-            "q2": q2,
-            "efficacy": self.efficacy,
+        return {
+            k: v * ur(getattr(ImpulseResponseModel, "_{}_unit".format(k)))
+            for k, v in self.parameters.to_impulse_response().asdict().items()
         }
-
-        return out
@@ -1,9 +1,12 @@
 from abc import ABC, abstractmethod
+from unittest.mock import patch
 
 import numpy as np
 import pytest
+from openscm_units import unit_registry as ur
 from scmdata import ScmRun
 
+from openscm_twolayermodel.batched import _KERNELS
 from openscm_twolayermodel.errors import UnitError
 
 
@@ -70,6 +73,33 @@ class TwoLayerVariantIntegrationTester(ModelIntegrationTester):
         with pytest.raises(UnitError):
             model.run_scenarios(inp)
 
+    def test_run_wrong_units_multiple(self):
+        erf = np.linspace(0, 4, 11)
+        inp = ScmRun(
+            data=np.vstack([erf] * 4).T,
+            index=np.arange(1750, 1761),
+            columns={
+                "scenario": ["ok", "bad_dimension", "bad_unit", "ok_mW"],
+                "model": "unspecified",
+                "climate_model": "junk input",
+                "variable": "Effective Radiative Forcing",
+                "unit": ["W/m^2", "W", "junk", "mW/m^2"],
+                "region": "World",
+            },
+        )
+
+        model = self.tmodel()
+
+        # every bad row is reported at once, without the parameter metadata
+        with pytest.raises(UnitError, match=r"in 2 row\(s\)") as exc_info:
+            model.run_scenarios(inp)
+
+        msg = str(exc_info.value)
+        assert "bad_dimension" in msg
+        assert "bad_unit" in msg
+        assert "ok_mW" not in msg
+        assert "efficacy (" not in msg
+
     def test_run_wrong_region(self):
         inp = self.tinp.copy()
         inp["region"] = "World|R5LAM"
@@ -94,3 +124,109 @@ class TwoLayerVariantIntegrationTester(ModelIntegrationTester):
 
         with pytest.raises(ValueError, match=error_msg):
             model.run_scenarios(inp, driver_var="Effective Radiative Forcing|CO2")
+
+    def test_run_scenarios_incremental(self, check_scmruns_allclose):
+        inp = self.tinp.copy()
+        inp_edited = ScmRun(
+            data=inp.values.squeeze() * np.where(np.arange(101) >= 80, 1.5, 1),
+            index=inp["year"],
+            columns=inp.meta.iloc[0].to_dict(),
+        )
+
+        model = self.tmodel()
+        model.run_scenarios(inp, incremental=True)
+
+        with patch.object(model, "_step", wraps=model._step) as mock_step:
+            res = model.run_scenarios(inp_edited, incremental=True)
+
+        # timesteps up to and including 80 are unaffected by the edit
+        assert mock_step.call_count == 20
+
+        check_scmruns_allclose(res, self.tmodel().run_scenarios(inp_edited))
+
+    def test_run_scenarios_ragged(self):
+        # rows which start and end in different years (and have gaps) are run
+        # in one batch with the same result as running each row on its own
+        erf = np.linspace(0, 4, 101)
+        starts_late = np.where(np.arange(101) >= 30, np.sin(erf), np.nan)
+        ends_early = np.where(np.arange(101) < 60, np.cos(erf), np.nan)
+        ends_early[10] = np.nan
+        inp = ScmRun(
+            data=np.vstack([erf, starts_late * 10 ** 3, ends_early]).T,
+            index=np.arange(1750, 1851),
+            columns={
+                "scenario": ["full", "starts_late", "ends_early"],
+                "model": "unspecified",
+                "climate_model": "junk input",
+                "variable": "Effective Radiative Forcing",
+                "unit": ["W/m^2", "mW/m^2", "W/m^2"],
+                "region": "World",
+            },
+        )
+
+        model = self.tmodel()
+        with patch.object(model, "_step", wraps=model._step) as mock_step:
+            res = model.run_scenarios(inp)
+
+        assert mock_step.call_count == 0
+        res_ts = res.timeseries()
+
+        for scenario, driver, unit in (
+            ("full", erf, "W/m^2"),
+            ("starts_late", starts_late * 10 ** 3, "mW/m^2"),
+            ("ends_early", ends_early, "W/m^2"),
+        ):
+            valid = ~np.isnan(driver)
+            exp = self.tmodel(delta_t=1 * ur("yr"))
+            exp.set_drivers(driver[valid] * ur(unit))
+            exp.reset()
+            exp.run()
+
+            res_scen = res_ts.xs(scenario, level="scenario")
+            for k, variable in _KERNELS[model._name][1].items():
+                res_var = res_scen.xs(variable, level="variable").values.squeeze()
+                np.testing.assert_array_equal(
+                    res_var[valid], getattr(exp, "_{}_mag".format(k))
+                )
+                assert np.isnan(res_var[~valid]).all()
+
+        # the model is left in the state of the last row's run
+        np.testing.assert_array_equal(
+            model.erf.magnitude, ends_early[~np.isnan(ends_early)]
+        )
+        for k in model._output_vars:
+            np.testing.assert_array_equal(
+                getattr(model, "_{}_mag".format(k)), getattr(exp, "_{}_mag".format(k))
+            )
+
+    def test_run_scenarios_timing_callback(self, check_scmruns_allclose):
+        inp = self.tinp.copy()
+        inp_multiple = inp.timeseries()
+        inp_multiple = ScmRun(
+            inp_multiple.append(
+                inp_multiple.rename({"test_scenario": "other"}, level="scenario")
+            )
+        )
+
+        timings = []
+        res = self.tmodel().run_scenarios(
+            inp_multiple, timing_callback=lambda **kwargs: timings.append(kwargs)
+        )
+
+        assert [t["stage"] for t in timings] == [
+            "ensure_scmrun",
+            "filter",
+            "timeseries",
+            "run",
+            "create_ts",
+            "scenario_output",
+            "concat",
+        ]
+        assert all(t["duration"] >= 0 for t in timings)
+
+        timings = {t["stage"]: t for t in timings}
+        assert timings["run"]["n_rows"] == 2
+        assert timings["run"]["n_steps"] == 2 * 101
+        assert timings["concat"]["n_rows"] == res.shape[0]
+
+        check_scmruns_allclose(res, self.tmodel().run_scenarios(inp_multiple))
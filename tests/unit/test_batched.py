@@ -0,0 +1,433 @@
+import os.path
+import re
+
+import dask
+import dask.array as da
+import numpy as np
+import numpy.testing as npt
+import pytest
+import xarray as xr
+from openscm_units import unit_registry as ur
+
+import openscm_twolayermodel.batched
+from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel
+from openscm_twolayermodel.batched import (
+    draw_realisation_noise,
+    run_array,
+    run_blocks,
+    run_constrained,
+    run_impulse_response,
+    run_two_layer,
+    run_two_layer_stochastic,
+)
+from openscm_twolayermodel.errors import ModelStateError
+
+TWO_LAYER_CONFIGS = (
+    {},
+    {"efficacy": 1.2 * ur("dimensionless")},
+    {"a": 0.01 * ur("W/m^2/delta_degC^2"), "du": 30 * ur("m")},
+)
+
+
+@pytest.fixture
+def erf():
+    return np.linspace(0, 4, 101) + 0.3 * np.sin(np.arange(101))
+
+
+IMPULSE_RESPONSE_CONFIGS = (
+    {},
+    {"efficacy": 1.2 * ur("dimensionless")},
+    {"q1": 0.5 * ur("delta_degC/(W/m^2)"), "d2": 300 * ur("yr")},
+)
+
+
+def _get_para_mags(model):
+    return {k: getattr(model, "_{}_mag".format(k)) for k in model._save_paras}
+
+
+def test_run_two_layer_matches_model(erf):
+    models = [TwoLayerModel(**config) for config in TWO_LAYER_CONFIGS]
+    paras = {
+        k: np.array([_get_para_mags(m)[k] for m in models])
+        for k in TwoLayerModel._save_paras
+    }
+
+    res = run_two_layer(
+        np.broadcast_to(erf, (len(models), erf.shape[0])),
+        models[0]._delta_t_mag,
+        **paras,
+    )
+
+    for i, model in enumerate(models):
+        model.set_drivers(erf * ur("W/m^2"))
+        model.reset()
+        model.run()
+
+        npt.assert_allclose(res["temp_upper"][i], model._temp_upper_mag)
+        npt.assert_allclose(res["temp_lower"][i], model._temp_lower_mag)
+        npt.assert_allclose(res["rndt"][i], model._rndt_mag)
+
+
+def test_run_impulse_response_matches_model(erf):
+    models = [ImpulseResponseModel(**config) for config in IMPULSE_RESPONSE_CONFIGS]
+    paras = {
+        k: np.array([_get_para_mags(m)[k] for m in models])
+        for k in ImpulseResponseModel._save_paras
+    }
+
+    res = run_impulse_response(erf, models[0]._delta_t_mag, **paras)
+
+    for i, model in enumerate(models):
+        model.set_drivers(erf * ur("W/m^2"))
+        model.reset()
+        model.run()
+
+        npt.assert_allclose(res["temp1"][i], model._temp1_mag)
+        npt.assert_allclose(res["temp2"][i], model._temp2_mag)
+        npt.assert_allclose(res["rndt"][i], model._rndt_mag)
+
+
+def test_run_two_layer_out(erf):
+    model = TwoLayerModel()
+    paras = _get_para_mags(model)
+    paras["lambda0"] = np.array([0.8, 1.2])
+    exp = run_two_layer(erf, model._delta_t_mag, **paras)
+
+    store = np.full((2, 3, erf.shape[0]), np.nan)
+    out = {"temp_upper": store[0, 1:], "rndt": store[1, :2]}
+    res = run_two_layer(erf, model._delta_t_mag, out=out, **paras)
+
+    assert res["temp_upper"] is out["temp_upper"]
+    assert res["rndt"] is out["rndt"]
+    for k, v in exp.items():
+        npt.assert_array_equal(res[k], v)
+
+    npt.assert_array_equal(store[0, 1:], exp["temp_upper"])
+    npt.assert_array_equal(store[1, :2], exp["rndt"])
+    assert np.isnan(store[0, 0]).all()
+    assert np.isnan(store[1, 2]).all()
+
+
+def test_run_impulse_response_out(erf):
+    model = ImpulseResponseModel()
+    paras = _get_para_mags(model)
+    exp = run_impulse_response(erf, model._delta_t_mag, **paras)
+
+    out = {"temp2": np.full(erf.shape[0], np.nan)}
+    res = run_impulse_response(erf, model._delta_t_mag, out=out, **paras)
+
+    assert res["temp2"] is out["temp2"]
+    for k, v in exp.items():
+        npt.assert_array_equal(res[k], v)
+
+
+@pytest.mark.parametrize(
+    "out,error",
+    (
+        ({"temp1": np.zeros(3)}, "Unknown outputs in out: ['temp1']"),
+        ({"rndt": np.zeros(3)}, "out['rndt'] must have shape"),
+        ({"rndt": np.zeros(101, dtype=np.float32)}, "and dtype float64, got"),
+    ),
+)
+def test_run_two_layer_out_error(erf, out, error):
+    model = TwoLayerModel()
+    with pytest.raises(ValueError, match=re.escape(error)):
+        run_two_layer(erf, model._delta_t_mag, out=out, **_get_para_mags(model))
+
+
+def test_run_two_layer_broadcasts_parameters(erf):
+    model = TwoLayerModel()
+    paras = _get_para_mags(model)
+    paras["lambda0"] = np.array([0.8, 1.2, 1.6])
+
+    res = run_two_layer(erf, model._delta_t_mag, **paras)
+
+    assert res["temp_upper"].shape == (3, erf.shape[0])
+    # higher feedback, lower warming
+    assert (np.diff(res["temp_upper"][:, -1]) < 0).all()
+
+
+def test_run_two_layer_single_precision_accuracy():
+    # abrupt 4xCO2 style experiment, 1000 years, a spread of parameters
+    erf = np.full(1000, 7.4)
+    model = TwoLayerModel()
+    paras = _get_para_mags(model)
+    paras["lambda0"] = np.linspace(0.6, 2.0, 15)
+    paras["eta"] = np.linspace(0.5, 1.0, 15)
+
+    ref = run_two_layer(erf, model._delta_t_mag, **paras)
+    res = run_two_layer(erf, model._delta_t_mag, **paras, dtype=np.float32)
+
+    for k, v in ref.items():
+        assert res[k].dtype == np.float32
+        assert v.dtype == np.float64
+
+    max_abs_error = {k: np.max(np.abs(res[k] - ref[k])) for k in ref}
+    assert max_abs_error["temp_upper"] < 1e-3
+    assert max_abs_error["temp_lower"] < 1e-3
+    assert max_abs_error["rndt"] < 1e-3
+
+
+def test_draw_realisation_noise_matches_spawn():
+    seed = 1234
+    children = np.random.SeedSequence(seed).spawn(5)
+
+    res = draw_realisation_noise(seed, 3, (2, 10), first_realisation=2)
+
+    for i, child in enumerate(children[2:]):
+        npt.assert_equal(res[i], np.random.default_rng(child).standard_normal((2, 10)))
+
+
+def test_run_two_layer_stochastic_no_noise(erf):
+    model = TwoLayerModel()
+    model.set_drivers(erf * ur("W/m^2"))
+    model.reset()
+    model.run()
+
+    res = run_two_layer_stochastic(model, 4, seed=0)
+
+    for k in ("temp_upper", "temp_lower", "rndt"):
+        assert res[k].shape == (4, erf.shape[0])
+        npt.assert_allclose(
+            res[k], np.broadcast_to(getattr(model, "_{}_mag".format(k)), res[k].shape)
+        )
+
+
+def test_run_two_layer_stochastic_reproducible_when_sharded(erf):
+    model = TwoLayerModel(sigma_eta=0.5 * ur("W/m^2"), sigma_xi=0.05 * ur("delta_degC"))
+    model.set_drivers(erf * ur("W/m^2"))
+
+    full = run_two_layer_stochastic(model, 6, seed=42)
+    shards = [
+        run_two_layer_stochastic(model, 2, seed=42, first_realisation=start)
+        for start in (0, 2, 4)
+    ]
+
+    for k, v in full.items():
+        npt.assert_allclose(v, np.concatenate([s[k] for s in shards]))
+
+    single = run_two_layer_stochastic(model, 6, seed=42, dtype=np.float32)
+    for k, v in full.items():
+        assert single[k].dtype == np.float32
+        npt.assert_allclose(single[k], v, atol=1e-3)
+
+    # realisations differ from each other
+    assert not np.allclose(full["temp_upper"][0], full["temp_upper"][1])
+
+
+def test_run_two_layer_stochastic_spread(erf):
+    model = TwoLayerModel(sigma_xi=0.1 * ur("delta_degC"))
+    model.set_drivers(np.zeros_like(erf) * ur("W/m^2"))
+
+    res = run_two_layer_stochastic(model, 500, seed=1)
+
+    npt.assert_allclose(res["temp_upper"][:, -1].mean(), 0, atol=0.05)
+    assert res["temp_upper"][:, -1].std() > 0.1
+
+
+def test_run_two_layer_stochastic_no_drivers_error():
+    error_msg = re.escape(
+        "The model's drivers have not been set yet, call :meth:`self.set_drivers` first."
+    )
+    with pytest.raises(ModelStateError, match=error_msg):
+        run_two_layer_stochastic(TwoLayerModel(), 2)
+
+
+@pytest.mark.parametrize("model_cls", (TwoLayerModel, ImpulseResponseModel))
+def test_run_array_xarray(model_cls):
+    forcing = xr.DataArray(
+        np.random.default_rng(0).random((2, 50, 3)),
+        dims=("scenario", "time", "member"),
+        coords={"scenario": ["a", "b"], "time": np.arange(2000, 2050)},
+        attrs={"units": "kW/m^2"},
+    )
+    model = model_cls()
+    para = model._save_paras[0]
+    para_values = xr.DataArray(
+        getattr(model, "_{}_mag".format(para)) * np.array([0.9, 1.0, 1.1, 1.2]),
+        dims=("pset",),
+    )
+
+    res = run_array(model, forcing, paras={para: para_values})
+
+    assert isinstance(res, xr.Dataset)
+    assert res.attrs["climate_model"] == model._name
+    for k, v in res.data_vars.items():
+        assert v.dims == ("scenario", "member", "pset", "time")
+        assert v.attrs["units"] == getattr(model, "_{}_unit".format(k))
+
+    npt.assert_equal(res["time"].values, forcing["time"].values)
+
+    setattr(
+        model, para, para_values[2].item() * ur(getattr(model, "_{}_unit".format(para)))
+    )
+    model.set_drivers(forcing.isel(scenario=1, member=0).values * ur("kW/m^2"))
+    model.reset()
+    model.run()
+    for k in res.data_vars:
+        npt.assert_allclose(
+            res[k].isel(scenario=1, member=0, pset=2).values,
+            getattr(model, "_{}_mag".format(k)),
+        )
+
+
+def test_run_array_numpy(erf, monkeypatch):
+    model = TwoLayerModel()
+    forcing = np.vstack([erf, 2 * erf])
+
+    res = run_array(model, forcing, dims=("scenario", "time"))
+    assert res["temp_upper"].dims == ("scenario", "time")
+
+    monkeypatch.setattr(
+        openscm_twolayermodel.batched, "_import_optional", lambda name: None
+    )
+    res_np = run_array(model, forcing)
+    assert isinstance(res_np, dict)
+    for k, v in res_np.items():
+        assert isinstance(v, np.ndarray)
+        npt.assert_allclose(v, res[k].values)
+
+
+def test_run_array_no_time_error(erf):
+    with pytest.raises(ValueError, match="forcing must have a `time` dimension"):
+        run_array(TwoLayerModel(), erf, dims=("year",))
+
+
+def test_run_array_unknown_paras_error(erf):
+    error_msg = re.escape("Unknown parameters: ['d1']")
+    with pytest.raises(ValueError, match=error_msg):
+        run_array(TwoLayerModel(), erf, paras={"d1": 3.0})
+
+
+@pytest.mark.parametrize("model_cls", (TwoLayerModel, ImpulseResponseModel))
+@pytest.mark.parametrize("scheduler", ("threads", "processes"))
+def test_run_blocks(model_cls, scheduler):
+    erf = da.random.RandomState(0).random_sample((4, 6, 40), chunks=(2, 3, 10))
+    model = model_cls()
+    para = model._save_paras[0]
+    para_values = getattr(model, "_{}_mag".format(para)) * np.linspace(0.8, 1.2, 6)
+
+    res = run_blocks(model, erf, paras={para: para_values})
+
+    for v in res.values():
+        assert isinstance(v, da.Array)
+        # time is contiguous, ensemble axes keep their chunking
+        assert v.chunks == ((2, 2), (3, 3), (40,))
+
+    with dask.config.set(scheduler=scheduler):
+        computed = dask.compute(res)[0]
+
+    expected = run_array(model, erf.compute(), paras={para: para_values})
+    for k, v in computed.items():
+        npt.assert_allclose(v, expected[k].values)
+
+
+def test_run_array_dask_to_netcdf(tmpdir):
+    forcing = xr.DataArray(
+        da.random.RandomState(1).random_sample((3, 8, 30), chunks=(1, 4, 30)),
+        dims=("scenario", "member", "time"),
+        coords={"time": np.arange(2000, 2030)},
+    )
+    model = TwoLayerModel()
+
+    res = run_array(model, forcing)
+    assert all(isinstance(v.data, da.Array) for v in res.data_vars.values())
+
+    out_file = os.path.join(tmpdir, "out.nc")
+    with dask.config.set(scheduler="threads"):
+        res.to_netcdf(out_file)
+
+    with xr.open_dataset(out_file) as written:
+        xr.testing.assert_allclose(written, run_array(model, forcing.compute()))
+
+
+@pytest.fixture
+def constrained_setup(erf):
+    model = TwoLayerModel()
+    model.set_drivers(erf * ur("W/m^2"))
+    paras = {
+        "lambda0": np.linspace(0.6, 2.0, 50),
+        "eta": np.tile([0.5, 0.8, 1.1, 1.4, 1.7], 10),
+    }
+    observations = run_two_layer(erf, model._delta_t_mag, 50, 1200, 1.2, 0, 1, 0.8)[
+        "temp_upper"
+    ][:60]
+
+    return model, paras, observations
+
+
+def test_run_constrained_matches_full_run(constrained_setup, erf):
+    model, paras, observations = constrained_setup
+    tolerance = 0.1
+
+    res = run_constrained(model, observations, tolerance, paras=paras)
+
+    full = run_two_layer(
+        erf,
+        model._delta_t_mag,
+        model._du_mag,
+        model._dl_mag,
+        paras["lambda0"],
+        model._a_mag,
+        model._efficacy_mag,
+        paras["eta"],
+    )
+    rmse = np.sqrt(np.mean((full["temp_upper"][:, :60] - observations) ** 2, axis=1))
+    accepted = rmse <= tolerance
+    assert 0 < accepted.sum() < accepted.size
+
+    npt.assert_array_equal(res["accepted"], accepted)
+    npt.assert_allclose(res["rmse"][accepted], rmse[accepted])
+    for k in model._output_vars:
+        npt.assert_allclose(res[k], full[k][accepted])
+
+    # rejected members are dropped before the end of the run
+    assert (res["n_timesteps"][accepted] == erf.size).all()
+    assert (res["n_timesteps"][~accepted] < erf.size).all()
+
+
+def test_run_constrained_running(constrained_setup):
+    model, paras, observations = constrained_setup
+
+    final = run_constrained(model, observations, 0.1, paras=paras)
+    running = run_constrained(
+        model, observations, 0.1, paras=paras, criterion="running", min_observations=10
+    )
+
+    # the running criterion can only reject members earlier
+    assert not (running["accepted"] & ~final["accepted"]).any()
+    assert (running["n_timesteps"] <= final["n_timesteps"]).all()
+    assert running["n_timesteps"].sum() < final["n_timesteps"].sum()
+
+
+def test_run_constrained_all_rejected(constrained_setup):
+    model, paras, observations = constrained_setup
+
+    res = run_constrained(model, observations + 10, 0.1, paras=paras)
+
+    assert not res["accepted"].any()
+    assert res["temp_upper"].shape == (0, model.erf.size)
+
+
+def test_run_constrained_no_drivers_error():
+    with pytest.raises(ModelStateError):
+        run_constrained(TwoLayerModel(), np.zeros(3), 0.1)
+
+
+@pytest.mark.parametrize(
+    "kwargs,error_msg",
+    (
+        ({"criterion": "best"}, "criterion must be one of"),
+        ({"paras": {"d1": 3.0}}, re.escape("Unknown parameters: ['d1']")),
+        (
+            {"observations": np.zeros(200)},
+            "observations must not be longer than the model's drivers",
+        ),
+    ),
+)
+def test_run_constrained_errors(constrained_setup, kwargs, error_msg):
+    model, _, observations = constrained_setup
+    kwargs.setdefault("observations", observations)
+
+    with pytest.raises(ValueError, match=error_msg):
+        run_constrained(model, tolerance=0.1, **kwargs)
@@ -0,0 +1,150 @@
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+import pytest
+from openscm_units import unit_registry as ur
+
+from openscm_twolayermodel import TwoLayerModel
+from openscm_twolayermodel.batched import run_two_layer
+from openscm_twolayermodel.calibration import (
+    calibrate_two_layer_model,
+    get_calibrated_models,
+)
+from openscm_twolayermodel.diagnostics import calculate_two_layer_metrics
+
+PARAS = ("du", "dl", "lambda0", "efficacy", "eta")
+
+
+@pytest.fixture
+def abrupt_4x():
+    rng = np.random.default_rng(0)
+    n_models = 20
+    paras = {
+        "du": rng.uniform(40, 100, n_models),
+        "dl": rng.uniform(500, 2000, n_models),
+        "lambda0": rng.uniform(0.6, 1.8, n_models),
+        "efficacy": rng.uniform(1, 1.6, n_models),
+        "eta": rng.uniform(0.5, 1.0, n_models),
+    }
+    f4x = rng.uniform(6, 9, n_models)
+
+    res = run_two_layer(
+        np.broadcast_to(f4x[:, np.newaxis], (n_models, 151)),
+        ur("yr").to("s").magnitude,
+        a=0,
+        **paras
+    )
+    names = ["model_{}".format(i) for i in range(n_models)]
+
+    return {
+        "paras": paras,
+        "f4x": f4x,
+        "temperature": pd.DataFrame(res["temp_upper"][:, 1:], index=names),
+        "rndt": pd.DataFrame(res["rndt"][:, 1:], index=names),
+    }
+
+
+def test_calibrate_recovers_parameters(abrupt_4x):
+    res = calibrate_two_layer_model(abrupt_4x["temperature"], abrupt_4x["rndt"])
+
+    pd.testing.assert_index_equal(res.index, abrupt_4x["temperature"].index)
+    for k in PARAS:
+        npt.assert_allclose(res[k], abrupt_4x["paras"][k], rtol=1e-6)
+
+    npt.assert_allclose(res["a"], 0)
+    npt.assert_allclose(res["f4x"], abrupt_4x["f4x"], rtol=1e-6)
+    npt.assert_allclose(
+        res["ecs"], abrupt_4x["f4x"] / 2 / abrupt_4x["paras"]["lambda0"], rtol=1e-6
+    )
+    # same definition of ECS as the diagnostics
+    npt.assert_allclose(
+        res["ecs"],
+        calculate_two_layer_metrics(*[res[k] for k in PARAS], f2x=res["f4x"] / 2)[
+            "ecs"
+        ],
+    )
+
+
+def test_calibrate_analytic_only(abrupt_4x):
+    res = calibrate_two_layer_model(
+        abrupt_4x["temperature"].values, abrupt_4x["rndt"].values, refine=False
+    )
+
+    assert isinstance(res.index, pd.RangeIndex)
+    # the analytic estimates are only a first guess
+    for k in PARAS:
+        npt.assert_allclose(
+            np.median(res[k] / abrupt_4x["paras"][k]), 1, atol=0.25, err_msg=k
+        )
+
+
+def test_calibrate_no_efficacy_iterations(abrupt_4x):
+    res = calibrate_two_layer_model(
+        abrupt_4x["temperature"],
+        abrupt_4x["rndt"],
+        refine=False,
+        n_efficacy_iterations=0,
+    )
+
+    npt.assert_allclose(res["efficacy"], 1)
+    for k in PARAS:
+        assert np.isfinite(res[k]).all()
+        assert (res[k] > 0).all()
+
+    # the refinement still recovers the parameters
+    res = calibrate_two_layer_model(
+        abrupt_4x["temperature"], abrupt_4x["rndt"], n_efficacy_iterations=0
+    )
+    for k in PARAS:
+        npt.assert_allclose(res[k], abrupt_4x["paras"][k], rtol=1e-5, err_msg=k)
+
+
+def test_calibrate_noisy(abrupt_4x):
+    rng = np.random.default_rng(1)
+    temperature = abrupt_4x["temperature"] + rng.normal(
+        scale=0.1, size=abrupt_4x["temperature"].shape
+    )
+    rndt = abrupt_4x["rndt"] + rng.normal(scale=0.3, size=abrupt_4x["rndt"].shape)
+
+    res = calibrate_two_layer_model(temperature, rndt)
+
+    npt.assert_allclose(
+        res["ecs"], abrupt_4x["f4x"] / 2 / abrupt_4x["paras"]["lambda0"], rtol=0.2
+    )
+
+
+def test_get_calibrated_models(abrupt_4x):
+    table = calibrate_two_layer_model(
+        abrupt_4x["temperature"].iloc[:2], abrupt_4x["rndt"].iloc[:2]
+    )
+
+    models = get_calibrated_models(table)
+
+    assert list(models) == list(table.index)
+    for label, model in models.items():
+        assert isinstance(model, TwoLayerModel)
+        for k in TwoLayerModel._save_paras:
+            npt.assert_allclose(
+                getattr(model, "_{}_mag".format(k)), table.loc[label, k]
+            )
+
+        model.set_drivers(np.full(151, table.loc[label, "f4x"]) * ur("W/m^2"))
+        model.reset()
+        model.run()
+        npt.assert_allclose(
+            model._temp_upper_mag[1:], abrupt_4x["temperature"].loc[label], rtol=1e-6
+        )
+
+
+def test_calibrate_shape_mismatch(abrupt_4x):
+    with pytest.raises(ValueError, match="must have the same shape"):
+        calibrate_two_layer_model(
+            abrupt_4x["temperature"], abrupt_4x["rndt"].iloc[:, :-1]
+        )
+
+
+def test_calibrate_too_short(abrupt_4x):
+    with pytest.raises(ValueError, match="At least 31 years are required"):
+        calibrate_two_layer_model(
+            abrupt_4x["temperature"].iloc[:, :20], abrupt_4x["rndt"].iloc[:, :20]
+        )
@@ -0,0 +1,109 @@
+import re
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+from openscm_units import unit_registry as ur
+
+from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel
+from openscm_twolayermodel.coupling import ImpulseResponseCoupler, TwoLayerCoupler
+from openscm_twolayermodel.errors import ModelStateError
+
+
+@pytest.fixture
+def erf():
+    return np.linspace(0, 4, 101) + 0.3 * np.sin(np.arange(101))
+
+
+@pytest.mark.parametrize(
+    "model,coupler_cls,temp_vars",
+    (
+        (TwoLayerModel(), TwoLayerCoupler, ("_temp_upper_mag",)),
+        (
+            TwoLayerModel(
+                a=0.02 * ur("W/m^2/delta_degC^2"), efficacy=1.2 * ur("dimensionless")
+            ),
+            TwoLayerCoupler,
+            ("_temp_upper_mag",),
+        ),
+        (ImpulseResponseModel(), ImpulseResponseCoupler, ("_temp1_mag", "_temp2_mag")),
+        (
+            ImpulseResponseModel(efficacy=1.2 * ur("dimensionless")),
+            ImpulseResponseCoupler,
+            ("_temp1_mag", "_temp2_mag"),
+        ),
+    ),
+)
+def test_coupler_matches_run(model, coupler_cls, temp_vars, erf):
+    model.set_drivers(erf * ur("W/m^2"))
+    model.reset()
+    model.run()
+
+    coupler = coupler_cls(model)
+    coupler.init(3)
+    assert coupler.n_members == 3
+
+    temps = [np.zeros(3)]
+    rndt = [np.zeros(3)]
+    for erf_step in erf[:-1]:
+        temps.append(coupler.advance(erf_step).copy())
+        rndt.append(coupler.rndt.copy())
+
+    temps = np.vstack(temps).T
+    rndt = np.vstack(rndt).T
+    for i in range(3):
+        npt.assert_allclose(temps[i], sum(getattr(model, v) for v in temp_vars))
+        npt.assert_allclose(rndt[i], model._rndt_mag, atol=1e-12)
+
+
+@pytest.mark.parametrize(
+    "model_cls,coupler_cls",
+    ((TwoLayerModel, TwoLayerCoupler), (ImpulseResponseModel, ImpulseResponseCoupler)),
+)
+def test_coupler_member_paras(model_cls, coupler_cls, erf):
+    model = model_cls()
+    para = model._save_paras[0]
+    para_values = getattr(model, "_{}_mag".format(para)) * np.array([0.8, 1.0, 1.2])
+
+    coupler = coupler_cls(model)
+    coupler.init(3, paras={para: para_values})
+    erf_batch = np.vstack([erf, 2 * erf, 3 * erf]).T
+    for erf_step in erf_batch[:-1]:
+        res = coupler.advance(erf_step)
+
+    for i, (value, scale) in enumerate(zip(para_values, (1, 2, 3))):
+        setattr(model, para, value * ur(getattr(model, "_{}_unit".format(para))))
+        model.set_drivers(scale * erf * ur("W/m^2"))
+        model.reset()
+        model.run()
+
+        expected = (
+            model._temp_upper_mag
+            if model_cls is TwoLayerModel
+            else model._temp1_mag + model._temp2_mag
+        )
+        npt.assert_allclose(res[i], expected[-1])
+
+
+def test_coupler_init_resets(erf):
+    coupler = TwoLayerCoupler(TwoLayerModel())
+    coupler.init(2)
+    first = [coupler.advance(v).copy() for v in erf]
+
+    coupler.init(2)
+    second = [coupler.advance(v).copy() for v in erf]
+
+    npt.assert_equal(first, second)
+
+
+def test_coupler_not_initialised_error():
+    error_msg = re.escape(
+        "The coupler has not been initialised yet, call :meth:`self.init` first."
+    )
+    with pytest.raises(ModelStateError, match=error_msg):
+        TwoLayerCoupler(TwoLayerModel()).advance(1.0)
+
+
+def test_coupler_unknown_paras_error():
+    with pytest.raises(ValueError, match=re.escape("Unknown parameters: ['q1']")):
+        TwoLayerCoupler(TwoLayerModel()).init(2, paras={"q1": 0.3})
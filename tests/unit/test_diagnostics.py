@@ -0,0 +1,179 @@
+import warnings
+from unittest.mock import patch
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+from openscm_units import unit_registry as ur
+
+from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel
+from openscm_twolayermodel.diagnostics import (
+    _calculate_two_layer_tcr,
+    calculate_impulse_response_metrics,
+    calculate_two_layer_metrics,
+    solve_impulse_response_parameters,
+    solve_two_layer_parameters,
+)
+
+TWO_LAYER_CONFIGS = (
+    {},
+    {"efficacy": 1.3 * ur("dimensionless")},
+    {"lambda0": 0.8 * ur("W/m^2/delta_degC"), "du": 80 * ur("m")},
+)
+
+
+def _run_ramp(model, f2x=3.74, tcr_time=70):
+    n_steps_per_year = 12
+    time = np.arange(0, tcr_time * n_steps_per_year + 1) / n_steps_per_year
+    model.delta_t = 1 / n_steps_per_year * ur("yr")
+    model.set_drivers(f2x * time / tcr_time * ur("W/m^2"))
+    model.reset()
+    model.run()
+
+    return model
+
+
+def _get_two_layer_metrics(model, **kwargs):
+    return calculate_two_layer_metrics(
+        model._du_mag,
+        model._dl_mag,
+        model._lambda0_mag,
+        model._efficacy_mag,
+        model._eta_mag,
+        **kwargs
+    )
+
+
+@pytest.mark.parametrize("config", TWO_LAYER_CONFIGS)
+def test_two_layer_metrics_match_run(config):
+    model = _run_ramp(TwoLayerModel(**config))
+
+    res = _get_two_layer_metrics(model)
+
+    npt.assert_allclose(res["tcr"], model._temp_upper_mag[-1], rtol=1e-3)
+    npt.assert_allclose(res["ecs"], 3.74 / model._lambda0_mag)
+    npt.assert_allclose(res["rwf"], res["tcr"] / res["ecs"])
+    npt.assert_allclose(res["a1"] + res["a2"], 1)
+
+    impulse_response_paras = model.get_impulse_response_parameters()
+    npt.assert_allclose(res["tau1"], impulse_response_paras["d1"].to("yr").magnitude)
+    npt.assert_allclose(res["tau2"], impulse_response_paras["d2"].to("yr").magnitude)
+
+
+@pytest.mark.parametrize("config", TWO_LAYER_CONFIGS)
+def test_impulse_response_metrics_match_two_layer(config):
+    two_layer = TwoLayerModel(**config)
+    model = _run_ramp(
+        ImpulseResponseModel(**two_layer.get_impulse_response_parameters())
+    )
+
+    res = calculate_impulse_response_metrics(
+        model._q1_mag, model._q2_mag, model._d1_mag, model._d2_mag
+    )
+
+    npt.assert_allclose(
+        res["tcr"], (model._temp1_mag + model._temp2_mag)[-1], rtol=1e-3
+    )
+    for k, v in _get_two_layer_metrics(two_layer).items():
+        npt.assert_allclose(res[k], v, rtol=1e-6)
+
+
+def test_two_layer_metrics_vectorised():
+    lambda0 = np.linspace(0.6, 2.0, 1000)
+    eta = np.linspace(0.5, 1.0, 1000)
+    f2x = 4.0
+
+    res = calculate_two_layer_metrics(50, 1200, lambda0, 1.0, eta, f2x=f2x)
+
+    for v in res.values():
+        assert v.shape == lambda0.shape
+
+    npt.assert_allclose(res["ecs"], f2x / lambda0)
+    for i in (0, 500, 999):
+        single = calculate_two_layer_metrics(50, 1200, lambda0[i], 1.0, eta[i], f2x=f2x)
+        for k, v in single.items():
+            npt.assert_allclose(res[k][i], v)
+
+
+def test_solve_two_layer_parameters_round_trip():
+    rng = np.random.default_rng(0)
+    lambda0 = rng.uniform(0.7, 2.0, 1000)
+    efficacy = rng.uniform(0.8, 1.5, 1000)
+    eta = rng.uniform(0.4, 1.2, 1000)
+
+    metrics = calculate_two_layer_metrics(50, 1200, lambda0, efficacy, eta)
+    res = solve_two_layer_parameters(metrics["ecs"], metrics["tcr"], 50, 1200, efficacy)
+
+    assert res["converged"].all()
+    npt.assert_allclose(res["lambda0"], lambda0)
+    npt.assert_allclose(res["eta"], eta, rtol=1e-6)
+
+
+def test_solve_two_layer_parameters_unreachable():
+    # a TCR this close to the ECS requires eta to be zero
+    res = solve_two_layer_parameters(
+        np.array([3.0, 3.0]), np.array([1.8, 2.99]), 50, 1200, 1
+    )
+
+    npt.assert_equal(res["converged"], [True, False])
+    assert not np.isnan(res["eta"][0])
+    assert np.isnan(res["eta"][1])
+    npt.assert_allclose(res["lambda0"], 3.74 / 3.0)
+
+
+def test_two_layer_tcr_derivative():
+    rng = np.random.default_rng(0)
+    lambda0 = rng.uniform(0.7, 2.0, 100)
+    efficacy = rng.uniform(0.8, 1.5, 100)
+    eta = rng.uniform(0.4, 1.2, 100)
+
+    def get_tcr(eta):
+        return _calculate_two_layer_tcr(50, 1200, lambda0, efficacy, eta, 3.74, 70)
+
+    tcr, derivative = get_tcr(eta)
+    npt.assert_allclose(
+        tcr, calculate_two_layer_metrics(50, 1200, lambda0, efficacy, eta)["tcr"]
+    )
+
+    step = 1e-6
+    exp_derivative = (
+        get_tcr(eta * np.exp(step))[0] - get_tcr(eta * np.exp(-step))[0]
+    ) / (2 * step)
+    npt.assert_allclose(derivative, exp_derivative, rtol=1e-6)
+
+
+def test_solve_two_layer_parameters_flat():
+    # if TCR doesn't depend on eta, the members are left unconverged without
+    # any division warnings
+    def flat_tcr(du, dl, lambda0, efficacy, eta, f2x, tcr_time):
+        return np.full_like(eta, 1.5), np.zeros_like(eta)
+
+    with patch(
+        "openscm_twolayermodel.diagnostics._calculate_two_layer_tcr",
+        side_effect=flat_tcr,
+    ):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            res = solve_two_layer_parameters(
+                np.array([3.0, 3.0]), np.array([1.8, 1.5]), 50, 1200, 1
+            )
+
+    npt.assert_equal(res["converged"], [False, True])
+    assert np.isnan(res["eta"][0])
+
+
+def test_solve_impulse_response_parameters():
+    q1 = np.array([0.3, 0.2, 0.4])
+    q2 = np.array([0.4, 0.5, 0.2])
+    metrics = calculate_impulse_response_metrics(q1, q2, 9.0, 400.0)
+
+    res = solve_impulse_response_parameters(metrics["ecs"], metrics["tcr"], 9.0, 400.0)
+
+    assert res["converged"].all()
+    npt.assert_allclose(res["q1"], q1)
+    npt.assert_allclose(res["q2"], q2)
+
+    # TCR greater than ECS requires a negative q2
+    res = solve_impulse_response_parameters(3.0, 3.5, 9.0, 400.0)
+    assert not res["converged"]
+    assert np.isnan(res["q1"])
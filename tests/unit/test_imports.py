@@ -0,0 +1,89 @@
+import subprocess
+import sys
+
+import numpy.testing as npt
+import pytest
+from openscm_units import unit_registry as ur
+
+import openscm_twolayermodel
+import openscm_twolayermodel.constants
+from openscm_twolayermodel.batched import _HEAT_CAPACITY_PER_DEPTH_MAG
+from openscm_twolayermodel.two_layer_model import TwoLayerModel
+
+HEAVY_MODULES = ("pandas", "pint", "scmdata", "tqdm", "xarray")
+
+
+def _get_imported_heavy_modules(code):
+    res = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys\n{}\nprint(' '.join(m for m in {} if m in sys.modules))".format(
+                code, HEAVY_MODULES
+            ),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    return set(res.stdout.split())
+
+
+def test_kernels_import_no_heavy_modules():
+    code = "\n".join(
+        [
+            "import numpy as np",
+            "from openscm_twolayermodel.batched import run_two_layer",
+            "from openscm_twolayermodel.constants import DENSITY_WATER_MAG",
+            "from openscm_twolayermodel.parameters import TwoLayerParameters",
+            "TwoLayerParameters().to_impulse_response()",
+            "run_two_layer(np.ones((2, 5)), 3.15e7, 50, 1200, 1.2, 0, 1, 0.8)",
+        ]
+    )
+
+    assert _get_imported_heavy_modules(code) == set()
+
+
+def test_models_import_no_scmdata_or_tqdm():
+    imported = _get_imported_heavy_modules(
+        "from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel"
+    )
+
+    assert not imported & {"scmdata", "tqdm"}
+
+
+def test_lazy_model_attributes():
+    assert openscm_twolayermodel.TwoLayerModel is TwoLayerModel
+    assert "ImpulseResponseModel" in dir(openscm_twolayermodel)
+
+    with pytest.raises(AttributeError):
+        openscm_twolayermodel.junk
+
+
+@pytest.mark.parametrize(
+    "name,unit",
+    (("DENSITY_WATER", "kg/m^3"), ("HEAT_CAPACITY_WATER", "J/delta_degC/kg")),
+)
+def test_lazy_constants(name, unit):
+    quantity = getattr(openscm_twolayermodel.constants, name)
+    magnitude = getattr(openscm_twolayermodel.constants, "{}_MAG".format(name))
+
+    assert quantity.to(unit).magnitude == magnitude
+    assert name in dir(openscm_twolayermodel.constants)
+
+    with pytest.raises(AttributeError):
+        openscm_twolayermodel.constants.junk
+
+
+def test_heat_capacity_per_depth():
+    npt.assert_allclose(
+        _HEAT_CAPACITY_PER_DEPTH_MAG,
+        (
+            ur(TwoLayerModel._du_unit)
+            * openscm_twolayermodel.constants.DENSITY_WATER
+            * openscm_twolayermodel.constants.HEAT_CAPACITY_WATER
+        )
+        .to(TwoLayerModel._heat_capacity_upper_unit)
+        .magnitude,
+    )
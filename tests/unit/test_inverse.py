@@ -0,0 +1,114 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
+from openscm_units import unit_registry as ur
+
+from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel
+from openscm_twolayermodel.errors import UnitError
+from openscm_twolayermodel.inverse import infer_forcing
+
+
+def _run_impulse_response(params, erf):
+    model = ImpulseResponseModel(delta_t=1 * ur("yr"), **params)
+    model.set_drivers(erf * ur("W/m^2"))
+    model.reset()
+    model.run()
+
+    return model._temp1_mag + model._temp2_mag
+
+
+@pytest.fixture
+def params():
+    return TwoLayerModel().get_impulse_response_parameters()
+
+
+@pytest.fixture
+def erf():
+    rng = np.random.default_rng(0)
+
+    return np.linspace(0, 4, 200) + rng.normal(scale=0.3, size=200)
+
+
+def test_infer_forcing_exact(params, erf):
+    temperature = _run_impulse_response(params, erf) * ur("delta_degC")
+
+    res = infer_forcing(temperature, params)
+
+    assert str(res.units) == "watt / meter ** 2"
+    npt.assert_allclose(res.magnitude[:-1], erf[:-1], rtol=1e-10)
+    assert np.isnan(res.magnitude[-1])
+
+
+def test_infer_forcing_batched(params, erf):
+    # three series, two parameter sets
+    scales = np.array([0.5, 1.0, 2.0])
+    q1 = np.array([0.3, 0.6])
+    params_mag = {
+        k: v.to(getattr(ImpulseResponseModel, "_{}_unit".format(k))).magnitude
+        for k, v in params.items()
+    }
+    params_mag["q1"] = q1
+
+    temperature = np.stack(
+        [
+            np.stack(
+                [
+                    _run_impulse_response(
+                        {**params, "q1": q * ur("delta_degC/(W/m^2)")}, s * erf
+                    )
+                    for q in q1
+                ]
+            )
+            for s in scales
+        ]
+    )
+
+    for regularisation in (0, 1e-12):
+        res = infer_forcing(temperature, params_mag, regularisation=regularisation)
+
+        assert res.shape == (3, 2, 200)
+        npt.assert_allclose(
+            res[..., :-1],
+            np.broadcast_to(scales[:, np.newaxis, np.newaxis] * erf[:-1], (3, 2, 199)),
+            rtol=1e-6,
+            atol=1e-6,
+        )
+
+
+def test_infer_forcing_regularised(params, erf):
+    rng = np.random.default_rng(1)
+    temperature = _run_impulse_response(params, erf) + rng.normal(
+        scale=0.05, size=erf.shape
+    )
+
+    def get_rmse(regularisation):
+        res = infer_forcing(temperature, params, regularisation=regularisation)
+        return np.sqrt(np.mean((res[:-1] - erf[:-1]) ** 2))
+
+    assert get_rmse(0.01) < 0.6 * get_rmse(0)
+
+
+def test_infer_forcing_negative_regularisation_error(params):
+    with pytest.raises(ValueError, match="regularisation must be non-negative"):
+        infer_forcing(np.zeros(10), params, regularisation=-1)
+
+
+@pytest.mark.parametrize("name", ("q2", "d2"))
+def test_infer_forcing_wrong_units(params, name):
+    params = {**params, name: 1 * ur("W")}
+
+    with pytest.raises(UnitError, match="Wrong units for `{}`".format(name)):
+        infer_forcing(np.zeros(10) * ur("delta_degC"), params)
+
+
+def test_infer_forcing_wrong_units_temperature(params):
+    with pytest.raises(UnitError, match="Wrong units for `temperature`"):
+        infer_forcing(np.zeros(10) * ur("W"), params)
+
+
+def test_infer_forcing_delta_t_errors(params):
+    with pytest.raises(TypeError, match="delta_t must be a pint.Quantity"):
+        infer_forcing(np.zeros(10), params, delta_t=1)
+
+    with pytest.raises(UnitError, match="Wrong units for `delta_t`"):
+        infer_forcing(np.zeros(10), params, delta_t=1 * ur("m"))
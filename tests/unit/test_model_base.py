@@ -1,6 +1,7 @@
+import asyncio
 import re
 from abc import ABC, abstractmethod
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import numpy as np
 import pint.errors
@@ -88,3 +89,293 @@ class TwoLayerVariantTester(ModelTester):
         error_msg = "The model's drivers have not been set yet, call :meth:`self.set_drivers` first."
         with pytest.raises(ModelStateError, match=error_msg):
             self.tmodel().reset()
+
+    def test_dtype_default(self):
+        assert self.tmodel().dtype == np.float64
+
+    def test_dtype_not_floating_error(self):
+        res = self.tmodel()
+        with pytest.raises(TypeError, match="dtype must be a floating point type"):
+            res.dtype = int
+
+    def test_run_single_precision(self):
+        terf = np.linspace(0, 8, 301) * ur("W/m^2")
+
+        res = {}
+        for dtype in (np.float64, np.float32):
+            model = self.tmodel()
+            model.dtype = dtype
+            model.set_drivers(terf)
+            model.reset()
+            model.run()
+
+            outputs = {
+                k: v
+                for k, v in vars(model).items()
+                if k.endswith("_mag") and np.ndim(v)
+            }
+            for k, v in outputs.items():
+                assert v.dtype == dtype, k
+
+            res[dtype] = outputs
+
+        for k, v in res[np.float64].items():
+            # well within 0.01 K/0.01 W/m^2 reporting precision
+            np.testing.assert_allclose(res[np.float32][k], v, rtol=1e-4, atol=1e-3)
+
+    def _get_outputs(self, model):
+        return {k: getattr(model, "_{}_mag".format(k)) for k in model._output_vars}
+
+    def _get_run_outputs(self, terf):
+        model = self.tmodel()
+        model.set_drivers(terf)
+        model.reset()
+        model.run()
+
+        return self._get_outputs(model)
+
+    def test_reset_reuses_output_buffers(self):
+        terf = np.linspace(0, 4, 50) * ur("W/m^2")
+        expected = self._get_run_outputs(terf)
+
+        model = self.tmodel()
+        model.set_drivers(terf)
+        model.reset()
+        model.run()
+        first = self._get_outputs(model)
+
+        model.reset()
+        for k, v in self._get_outputs(model).items():
+            assert v is first[k]
+            assert np.isnan(v).all()
+
+        model.run()
+        for k, v in expected.items():
+            np.testing.assert_allclose(self._get_outputs(model)[k], v)
+
+        # a different length needs new buffers
+        model.set_drivers(terf[:20])
+        model.reset()
+        for k, v in self._get_outputs(model).items():
+            assert v is not first[k]
+            assert v.shape == (20,)
+
+    def test_run_out(self):
+        terf = np.linspace(0, 4, 50) * ur("W/m^2")
+        expected = self._get_run_outputs(terf)
+
+        ensemble = np.full((len(self.tmodel._output_vars), 3, 50), np.nan)
+        out = {k: ensemble[i, 1] for i, k in enumerate(self.tmodel._output_vars)}
+
+        model = self.tmodel()
+        model.set_drivers(terf)
+        model.reset()
+        model.run(out=out)
+
+        for i, (k, v) in enumerate(expected.items()):
+            np.testing.assert_allclose(ensemble[i, 1], v)
+            assert self._get_outputs(model)[k] is out[k]
+
+        assert np.isnan(ensemble[:, [0, 2]]).all()
+
+        # the caller's arrays are never reused
+        model.reset()
+        model.run()
+        for i, (k, v) in enumerate(expected.items()):
+            assert self._get_outputs(model)[k] is not out[k]
+            np.testing.assert_allclose(ensemble[i, 1], v)
+
+    def test_run_out_sensitivities(self):
+        terf = np.linspace(0, 4, 50) * ur("W/m^2")
+        expected = self._get_run_outputs(terf)
+        k = self.tmodel._output_vars[0]
+        out = {k: np.zeros(50)}
+
+        model = self.tmodel()
+        model.set_drivers(terf)
+        model.reset()
+        model.run(sensitivities=True, out=out)
+
+        np.testing.assert_allclose(out[k], expected[k])
+        assert self._get_outputs(model)[k] is out[k]
+
+    @pytest.mark.parametrize(
+        "out,error",
+        (
+            ({"junk": np.zeros(50)}, "Unknown outputs in out: ['junk']"),
+            ({"rndt": np.zeros(49)}, "out['rndt'] must have shape (50,)"),
+            ({"rndt": np.zeros(50, dtype=np.float32)}, "and dtype float64"),
+        ),
+    )
+    def test_run_out_error(self, out, error):
+        model = self.tmodel()
+        model.set_drivers(np.zeros(50) * ur("W/m^2"))
+        model.reset()
+
+        with pytest.raises(ValueError, match=re.escape(error)):
+            model.run(out=out)
+
+    def test_run_iter(self):
+        # long enough that the buffers have to grow
+        terf = np.linspace(0, 4, 300) * ur("W/m^2")
+        expected = self._get_run_outputs(terf)
+
+        model = self.tmodel()
+        res = list(model.run_iter(terf.magnitude))
+
+        assert len(res) == terf.shape[0]
+        for k, v in expected.items():
+            np.testing.assert_allclose([r[k] for r in res], v)
+            np.testing.assert_allclose(self._get_outputs(model)[k], v)
+
+        np.testing.assert_allclose(model.erf.magnitude, terf.magnitude)
+
+    def test_run_iter_resume(self):
+        terf = np.linspace(0, 4, 300) * ur("W/m^2")
+        expected = self._get_run_outputs(terf)
+
+        model = self.tmodel()
+        # a previous run can be resumed too
+        model.set_drivers(terf[:50])
+        model.reset()
+        model.run()
+        for i in range(50, 300, 25):
+            res = list(model.run_iter(terf[i : i + 25], resume=True))
+            assert len(res) == 25
+
+        for k, v in expected.items():
+            np.testing.assert_allclose(self._get_outputs(model)[k], v)
+
+        # without resume, start again
+        list(model.run_iter(terf[:10]))
+        for k, v in self._get_outputs(model).items():
+            np.testing.assert_allclose(v, expected[k][:10])
+
+    def test_run_iter_stop_early(self):
+        terf = np.linspace(0, 4, 100) * ur("W/m^2")
+        expected = self._get_run_outputs(terf[:40])
+
+        model = self.tmodel()
+        for i, _ in enumerate(model.run_iter(iter(terf))):
+            if i == 39:
+                break
+
+        for k, v in expected.items():
+            np.testing.assert_allclose(self._get_outputs(model)[k], v)
+
+    def test_run_async_iter(self):
+        terf = np.linspace(0, 4, 150) * ur("W/m^2")
+        expected = self._get_run_outputs(terf)
+
+        async def forcing_stream():
+            for value in terf:
+                yield value
+
+        async def consume(model):
+            return [r async for r in model.run_async_iter(forcing_stream())]
+
+        model = self.tmodel()
+        res = asyncio.run(consume(model))
+
+        for k, v in expected.items():
+            np.testing.assert_allclose([r[k] for r in res], v)
+
+    def test_run_sensitivities(self):
+        terf = np.linspace(0, 4, 100) * ur("W/m^2")
+        expected = self._get_run_outputs(terf)
+
+        model = self.tmodel()
+        model.set_drivers(terf)
+        model.reset()
+        model.run(sensitivities=True)
+
+        for k, v in expected.items():
+            np.testing.assert_allclose(self._get_outputs(model)[k], v)
+
+        assert set(model.sensitivities) == set(model._output_vars)
+        for para in model._save_paras:
+            value = getattr(model, para)
+            step = 1e-6 * max(abs(value.magnitude), 1) * value.units
+            perturbed = []
+            for sign in (1, -1):
+                tmodel = self.tmodel(**{para: value + sign * step})
+                tmodel.set_drivers(terf)
+                tmodel.reset()
+                tmodel.run()
+                perturbed.append(self._get_outputs(tmodel))
+
+            for k in model._output_vars:
+                fd = (perturbed[0][k] - perturbed[1][k]) / (2 * step.magnitude)
+                np.testing.assert_allclose(
+                    model.sensitivities[k][para],
+                    fd,
+                    rtol=1e-5,
+                    atol=1e-7 * np.max(np.abs(fd)),
+                    err_msg="{} {}".format(k, para),
+                )
+
+        model.reset()
+        model.run()
+        assert model.sensitivities is None
+
+    def _rerun_counting_steps(self, model, terf):
+        with patch.object(model, "_step", wraps=model._step) as mock_step:
+            model.rerun(terf)
+
+        return mock_step.call_count
+
+    def test_rerun(self):
+        terf = np.linspace(0, 4, 200) * ur("W/m^2")
+        terf_edited = terf.copy()
+        terf_edited[150:] *= 1.5
+
+        model = self.tmodel()
+        # nothing to reuse on the first run
+        assert self._rerun_counting_steps(model, terf) == 200
+
+        # identical drivers, nothing to recompute
+        assert self._rerun_counting_steps(model, terf) == 0
+        for k, v in self._get_run_outputs(terf).items():
+            np.testing.assert_allclose(self._get_outputs(model)[k], v)
+
+        # the output at timestep 150 is unaffected by the change in drivers
+        assert self._rerun_counting_steps(model, terf_edited) == 49
+        for k, v in self._get_run_outputs(terf_edited).items():
+            np.testing.assert_allclose(self._get_outputs(model)[k], v)
+
+        # extending the drivers only computes the extension
+        terf_extended = np.concatenate([terf_edited.magnitude, [7, 8]]) * ur("W/m^2")
+        assert self._rerun_counting_steps(model, terf_extended) == 2
+        for k, v in self._get_run_outputs(terf_extended).items():
+            np.testing.assert_allclose(self._get_outputs(model)[k], v)
+
+    def test_rerun_keeps_checkpoint_buffers(self):
+        terf = np.linspace(0, 4, 100) * ur("W/m^2")
+        terf_edited = terf.copy()
+        terf_edited[50:] *= 2
+
+        model = self.tmodel()
+        model.rerun(terf)
+        first = {k: v.copy() for k, v in self._get_outputs(model).items()}
+        checkpoint = model._get_checkpoint()
+
+        model.rerun(terf_edited)
+        for k, v in first.items():
+            np.testing.assert_allclose(checkpoint[k], v)
+
+    def test_rerun_parameters_changed(self):
+        terf = np.linspace(0, 4, 100) * ur("W/m^2")
+
+        model = self.tmodel()
+        model.rerun(terf)
+
+        para = model._save_paras[0]
+        setattr(model, para, 1.1 * getattr(model, para))
+        assert self._rerun_counting_steps(model, terf) == 100
+
+        expected = self.tmodel(**{para: getattr(model, para)})
+        expected.set_drivers(terf)
+        expected.reset()
+        expected.run()
+        for k, v in self._get_outputs(expected).items():
+            np.testing.assert_allclose(self._get_outputs(model)[k], v)
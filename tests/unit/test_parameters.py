@@ -0,0 +1,163 @@
+import copy
+import pickle
+import re
+
+import numpy.testing as npt
+import pytest
+from openscm_units import unit_registry as ur
+
+from openscm_twolayermodel import (
+    ImpulseResponseModel,
+    ImpulseResponseParameters,
+    TwoLayerModel,
+    TwoLayerParameters,
+)
+
+
+@pytest.fixture(params=[TwoLayerModel, ImpulseResponseModel])
+def model(request):
+    return request.param()
+
+
+def test_defaults_match_model(model):
+    assert model.parameters == model._parameters_cls()
+
+
+def test_model_parameters(model):
+    res = model.parameters
+
+    assert res._fields == model._save_paras
+    for k in model._save_paras:
+        assert getattr(res, k) == getattr(model, "_{}_mag".format(k))
+
+    # cached until a parameter changes
+    assert model.parameters is res
+    model.efficacy = 1.2 * ur("dimensionless")
+    assert model.parameters is not res
+    assert model.parameters.efficacy == 1.2
+
+
+def test_set_model_parameters(model):
+    paras = model.parameters.replace(efficacy=1.3)
+    model.parameters = paras
+
+    assert model.parameters is paras
+    assert model.efficacy == 1.3 * ur("dimensionless")
+
+
+def test_set_model_parameters_wrong_type():
+    model = TwoLayerModel()
+    with pytest.raises(TypeError, match="parameters must be a TwoLayerParameters"):
+        model.parameters = ImpulseResponseParameters()
+
+
+def test_immutable():
+    paras = TwoLayerParameters()
+    with pytest.raises(AttributeError, match="TwoLayerParameters is immutable"):
+        paras.du = 10
+
+    with pytest.raises(AttributeError, match="TwoLayerParameters is immutable"):
+        paras.junk = 10
+
+    with pytest.raises(AttributeError):
+        paras.__dict__
+
+
+def test_hash_and_equality():
+    paras = TwoLayerParameters(du=40)
+
+    assert paras == TwoLayerParameters(du=40.0)
+    assert hash(paras) == hash(TwoLayerParameters(du=40.0))
+    assert paras != TwoLayerParameters(du=41)
+    assert paras != ImpulseResponseParameters()
+    assert {paras: 1}[TwoLayerParameters(du=40)] == 1
+
+
+def test_replace():
+    paras = ImpulseResponseParameters()
+
+    res = paras.replace(q1=0.5)
+    assert res.q1 == 0.5
+    assert res.replace(q1=paras.q1) == paras
+
+    with pytest.raises(ValueError, match=re.escape("Unknown parameters: ['du']")):
+        paras.replace(du=10)
+
+
+@pytest.mark.parametrize("paras", [TwoLayerParameters(), ImpulseResponseParameters()])
+def test_pickle_and_copy(paras):
+    paras.geoffroy_helper  # pylint:disable=pointless-statement
+
+    dumped = pickle.dumps(paras)
+    assert len(dumped) < 200
+
+    res = pickle.loads(dumped)
+    assert res == paras
+    assert res._cache is None
+
+    assert copy.copy(paras) is paras
+    assert copy.deepcopy(paras) is paras
+
+
+def test_to_impulse_response_matches_model():
+    model = TwoLayerModel(efficacy=1.2 * ur("dimensionless"))
+    exp = model.get_impulse_response_parameters()
+
+    res = model.parameters.to_impulse_response()
+    assert model.parameters.to_impulse_response() is res
+
+    for k, v in exp.items():
+        npt.assert_allclose(
+            getattr(res, k),
+            v.to(getattr(ImpulseResponseModel, "_{}_unit".format(k))).magnitude,
+            rtol=1e-12,
+        )
+
+
+def test_to_impulse_response_state_dependence():
+    with pytest.raises(ValueError, match="non-zero a"):
+        TwoLayerParameters(a=0.1).to_impulse_response()
+
+
+def test_to_two_layer_matches_model():
+    model = ImpulseResponseModel(efficacy=1.2 * ur("dimensionless"))
+    exp = model.get_two_layer_parameters()
+
+    res = model.parameters.to_two_layer()
+    assert model.parameters.to_two_layer() is res
+    assert res.a == 0
+
+    for k, v in exp.items():
+        npt.assert_allclose(
+            getattr(res, k),
+            v.to(getattr(TwoLayerModel, "_{}_unit".format(k))).magnitude,
+            rtol=1e-12,
+        )
+
+    npt.assert_allclose(
+        res.to_impulse_response().astuple(), model.parameters.astuple(), rtol=1e-10
+    )
+
+
+def test_heat_capacities():
+    model = TwoLayerModel()
+
+    npt.assert_allclose(
+        model.parameters.heat_capacity_upper,
+        model.heat_capacity_upper.to(model._heat_capacity_upper_unit).magnitude,
+    )
+    npt.assert_allclose(
+        model.parameters.heat_capacity_lower,
+        model.heat_capacity_lower.to(model._heat_capacity_lower_unit).magnitude,
+    )
+
+
+def test_geoffroy_helper_is_copy():
+    paras = ImpulseResponseParameters()
+    res = paras.geoffroy_helper
+    res["tau1"] = 0
+
+    assert paras.geoffroy_helper["tau1"] != 0
+    npt.assert_allclose(
+        paras.geoffroy_helper["tau1"] / ur("yr").to("s").magnitude, paras.d1
+    )
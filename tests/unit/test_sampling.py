@@ -0,0 +1,232 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+import scipy.stats
+import xarray as xr
+
+from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel
+from openscm_twolayermodel.batched import run_array
+from openscm_twolayermodel.sampling import (
+    calculate_sobol_indices,
+    run_samples,
+    sample_parameters,
+)
+
+
+@pytest.mark.parametrize("method", ("lhs", "sobol"))
+def test_sample_parameters(method):
+    res = sample_parameters(
+        TwoLayerModel(),
+        {"lambda0": (0.8, 1.6), "eta": scipy.stats.norm(0.8, 0.1)},
+        256,
+        method=method,
+        seed=0,
+    )
+
+    assert set(res) == {"lambda0", "eta"}
+    assert res["lambda0"].shape == (256,)
+    assert res["lambda0"].min() >= 0.8
+    assert res["lambda0"].max() <= 1.6
+    # both designs are stratified so each of the 256 equal intervals
+    # contains exactly one sample
+    npt.assert_equal(
+        np.sort(np.floor((res["lambda0"] - 0.8) / 0.8 * 256)), np.arange(256)
+    )
+    npt.assert_allclose(res["eta"].mean(), 0.8, atol=0.005)
+
+    npt.assert_equal(
+        sample_parameters(
+            TwoLayerModel(), {"lambda0": (0.8, 1.6)}, 256, method=method, seed=0
+        )["lambda0"],
+        sample_parameters(
+            TwoLayerModel(), {"lambda0": (0.8, 1.6)}, 256, method=method, seed=0
+        )["lambda0"],
+    )
+
+
+def test_sample_parameters_unknown_parameter():
+    with pytest.raises(ValueError, match=r"Unknown parameters: \['junk'\]"):
+        sample_parameters(TwoLayerModel(), {"junk": (0, 1)}, 10)
+
+
+def test_sample_parameters_unknown_method():
+    with pytest.raises(ValueError, match="method must be one of"):
+        sample_parameters(TwoLayerModel(), {"du": (40, 60)}, 10, method="junk")
+
+
+@pytest.mark.parametrize(
+    "model,distributions",
+    (
+        (TwoLayerModel(), {"lambda0": (0.8, 1.6), "du": (40, 80)}),
+        (ImpulseResponseModel(), {"q1": (0.2, 0.4), "d2": (200, 300)}),
+    ),
+)
+def test_run_samples(model, distributions):
+    forcing = xr.DataArray(
+        np.stack([np.linspace(0, 4, 50), np.linspace(0, 2, 50)]),
+        dims=("scenario", "time"),
+        coords={"scenario": ["high", "low"], "time": np.arange(2000, 2050)},
+        attrs={"units": "W/m^2"},
+    )
+    samples = sample_parameters(model, distributions, 25, seed=1)
+
+    chunks = list(run_samples(model, forcing, samples, chunk_size=10))
+
+    assert [c.sizes["sample"] for c in chunks] == [10, 10, 5]
+    res = xr.concat(chunks, dim="sample")
+    npt.assert_equal(res["sample"].values, np.arange(25))
+    for k, v in samples.items():
+        npt.assert_equal(res[k].values, v)
+        assert res[k].attrs["units"] == getattr(model, "_{}_unit".format(k))
+
+    expected = run_array(
+        model,
+        forcing,
+        paras={k: xr.DataArray(v, dims=("sample",)) for k, v in samples.items()},
+    )
+    for k in model._output_vars:
+        npt.assert_allclose(
+            res[k].transpose(*expected[k].dims).values, expected[k].values
+        )
+
+
+def test_run_samples_different_lengths():
+    with pytest.raises(ValueError, match="All samples must have the same length"):
+        list(
+            run_samples(
+                TwoLayerModel(),
+                np.zeros(10),
+                {"du": np.ones(3) * 50, "dl": np.ones(4) * 1200},
+            )
+        )
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.n_submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.n_submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+@pytest.mark.parametrize("max_in_flight,exp_initial", ((None, 2), (3, 3)))
+def test_run_samples_executor_bounded(max_in_flight, exp_initial):
+    model = TwoLayerModel()
+    samples = {"du": np.linspace(40, 80, 100)}
+    forcing = np.linspace(0, 4, 20)
+
+    with CountingExecutor(max_workers=2) as executor:
+        res = run_samples(
+            model,
+            forcing,
+            samples,
+            chunk_size=10,
+            executor=executor,
+            max_in_flight=max_in_flight,
+        )
+
+        first = next(res)
+        assert executor.n_submitted == exp_initial
+
+        # a new chunk is only submitted once the next one is requested
+        second = next(res)
+        assert executor.n_submitted == exp_initial + 1
+
+        rest = list(res)
+        assert executor.n_submitted == 10
+
+    res = xr.concat([first, second] + rest, dim="sample")
+    npt.assert_equal(res["sample"].values, np.arange(100))
+    exp = xr.concat(list(run_samples(model, forcing, samples, chunk_size=10)), "sample")
+    xr.testing.assert_equal(res, exp)
+
+
+@pytest.fixture
+def forcing_ramp():
+    return xr.DataArray(
+        np.linspace(0, 4, 50),
+        dims=("time",),
+        coords={"time": np.arange(2000, 2050)},
+        attrs={"units": "W/m^2"},
+    )
+
+
+def test_calculate_sobol_indices(forcing_ramp):
+    distributions = {"q1": (0.2, 0.5), "q2": (0.2, 0.5), "efficacy": (1, 1.5)}
+
+    res = calculate_sobol_indices(
+        ImpulseResponseModel(), forcing_ramp, distributions, 256, seed=0
+    )
+
+    assert set(res.data_vars) == set(ImpulseResponseModel._output_vars)
+    assert res["temp1"].dims == ("index", "parameter", "time")
+    assert res["temp1"]["parameter"].values.tolist() == list(distributions)
+
+    # the output doesn't vary at the first timestep
+    assert np.isnan(res["temp1"].isel(time=0)).all()
+
+    final = res["temp1"].sel(time=2049)
+    # temp1 only depends on q1
+    npt.assert_allclose(final.sel(parameter="q1"), 1, atol=0.02)
+    npt.assert_equal(final.sel(parameter=["q2", "efficacy"]).values, 0)
+
+    # the efficacy only affects the heat uptake
+    final_rndt = res["rndt"].sel(time=2049)
+    assert (final_rndt.sel(parameter="efficacy") > 0.01).all()
+    assert (
+        final_rndt.sel(index="total") >= final_rndt.sel(index="first_order") - 0.02
+    ).all()
+
+
+def test_calculate_sobol_indices_executor(forcing_ramp):
+    distributions = {"lambda0": (0.8, 1.6), "eta": (0.5, 1.1)}
+    res = calculate_sobol_indices(
+        TwoLayerModel(), forcing_ramp, distributions, 64, seed=2, chunk_size=50
+    )
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        res_parallel = calculate_sobol_indices(
+            TwoLayerModel(),
+            forcing_ramp,
+            distributions,
+            64,
+            seed=2,
+            chunk_size=50,
+            executor=executor,
+        )
+
+    xr.testing.assert_allclose(res, res_parallel)
+
+
+def test_calculate_sobol_indices_chunked(forcing_ramp):
+    distributions = {"lambda0": (0.8, 1.6), "eta": (0.5, 1.1), "du": (30, 80)}
+    res = calculate_sobol_indices(
+        TwoLayerModel(), forcing_ramp, distributions, 32, seed=3
+    )
+
+    chunk_sizes = []
+
+    def record_chunks(*args, **kwargs):
+        for chunk in run_samples(*args, **kwargs):
+            chunk_sizes.append(chunk.sizes["sample"])
+            yield chunk
+
+    # the sums are accumulated one chunk at a time, each chunk holding whole
+    # groups of runs
+    with patch("openscm_twolayermodel.sampling.run_samples", side_effect=record_chunks):
+        res_chunked = calculate_sobol_indices(
+            TwoLayerModel(), forcing_ramp, distributions, 32, seed=3, chunk_size=12
+        )
+
+    assert chunk_sizes == [10] * 16
+    xr.testing.assert_allclose(res, res_chunked)
+
+
+def test_calculate_sobol_indices_unknown_parameter(forcing_ramp):
+    with pytest.raises(ValueError, match=r"Unknown parameters: \['junk'\]"):
+        calculate_sobol_indices(TwoLayerModel(), forcing_ramp, {"junk": (0, 1)}, 8)
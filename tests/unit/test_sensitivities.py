@@ -0,0 +1,150 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
+from openscm_units import unit_registry as ur
+
+from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel
+from openscm_twolayermodel.errors import ModelStateError
+from openscm_twolayermodel.sensitivities import (
+    calculate_gradients,
+    get_rmse_loss,
+    run_impulse_response_tangent_linear,
+    run_two_layer_tangent_linear,
+)
+
+DELTA_T = ur("yr").to("s").magnitude
+
+
+@pytest.mark.parametrize(
+    "kernel,model_cls,paras,varied",
+    (
+        (
+            run_two_layer_tangent_linear,
+            TwoLayerModel,
+            {"du": 50, "dl": 1200, "lambda0": 1.2, "a": 0.01, "efficacy": 1.2},
+            {"eta": np.array([0.5, 0.8, 1.1])},
+        ),
+        (
+            run_impulse_response_tangent_linear,
+            ImpulseResponseModel,
+            {"d1": 9 * DELTA_T, "d2": 400 * DELTA_T, "q1": 0.3, "q2": 0.4},
+            {"efficacy": np.array([1.0, 1.3, 1.6])},
+        ),
+    ),
+)
+def test_tangent_linear_broadcasting(kernel, model_cls, paras, varied):
+    erf = np.linspace(0, 4, 50)
+    outputs, sensitivities = kernel(erf[np.newaxis, :], DELTA_T, **paras, **varied)
+
+    ((name, values),) = varied.items()
+    for i, value in enumerate(values):
+        outputs_single, sensitivities_single = kernel(
+            erf, DELTA_T, **paras, **{name: value}
+        )
+        for k, v in outputs_single.items():
+            assert outputs[k].shape == (3, 50)
+            npt.assert_allclose(outputs[k][i], v)
+
+            assert set(sensitivities[k]) == set(model_cls._save_paras)
+            for para, sens in sensitivities_single[k].items():
+                assert sensitivities[k][para].shape == (3, 50)
+                npt.assert_allclose(sensitivities[k][para][i], sens)
+
+
+@pytest.fixture
+def observed():
+    rng = np.random.default_rng(0)
+    erf = np.linspace(0, 4, 80) + rng.normal(scale=0.3, size=80)
+    temperature = np.linspace(0, 1.5, 80) + rng.normal(scale=0.1, size=80)
+    temperature[10] = np.nan
+
+    return erf * ur("W/m^2"), temperature
+
+
+@pytest.mark.parametrize(
+    "model,variables",
+    (
+        (TwoLayerModel(a=0.05 * ur("W/m^2/delta_degC^2")), "temp_upper"),
+        (ImpulseResponseModel(efficacy=1.2 * ur("dimensionless")), ("temp1", "temp2")),
+    ),
+)
+def test_calculate_gradients(model, variables, observed):
+    terf, temperature = observed
+    model.set_drivers(terf)
+    rmse = get_rmse_loss(temperature, variables)
+
+    loss, gradients = calculate_gradients(model, rmse)
+
+    def get_loss(erf, **paras):
+        model_paras = {k: getattr(model, k) for k in model._save_paras}
+        model_paras.update({k: v * model_paras[k].units for k, v in paras.items()})
+        tmodel = type(model)(**model_paras)
+        tmodel.set_drivers(erf * ur("W/m^2"))
+        tmodel.reset()
+        tmodel.run()
+
+        return rmse(
+            {k: getattr(tmodel, "_{}_mag".format(k)) for k in model._output_vars}
+        )[0]
+
+    erf = terf.magnitude
+    npt.assert_allclose(loss, get_loss(erf))
+
+    for para in model._save_paras:
+        value = getattr(model, "_{}_mag".format(para))
+        step = 1e-6 * max(abs(value), 1)
+        fd = (
+            get_loss(erf, **{para: value + step})
+            - get_loss(erf, **{para: value - step})
+        ) / (2 * step)
+        npt.assert_allclose(gradients[para], fd, rtol=1e-5, err_msg=para)
+
+    # the last forcing value doesn't affect the outputs
+    assert gradients["erf"][-1] == 0
+    for i in (0, 40, 78):
+        perturbation = np.zeros_like(erf)
+        perturbation[i] = 1e-6
+        fd = (get_loss(erf + perturbation) - get_loss(erf - perturbation)) / 2e-6
+        npt.assert_allclose(gradients["erf"][i], fd, rtol=1e-5)
+
+
+def test_calculate_gradients_matches_tangent_linear(observed):
+    terf, temperature = observed
+    model = TwoLayerModel(efficacy=1.3 * ur("dimensionless"))
+    model.set_drivers(terf)
+
+    def loss_gradient(outputs):
+        weights = np.linspace(0, 1, outputs["rndt"].shape[-1])
+        loss = np.sum(weights * outputs["rndt"])
+
+        return loss, {"rndt": weights}
+
+    loss, gradients = calculate_gradients(model, loss_gradient)
+
+    model.reset()
+    model.run(sensitivities=True)
+    for para in model._save_paras:
+        npt.assert_allclose(
+            gradients[para],
+            np.sum(
+                np.linspace(0, 1, terf.shape[0]) * model.sensitivities["rndt"][para]
+            ),
+            rtol=1e-10,
+        )
+
+
+def test_calculate_gradients_no_drivers():
+    with pytest.raises(ModelStateError, match="The model's drivers have not been set"):
+        calculate_gradients(TwoLayerModel(), get_rmse_loss(0, "temp_upper"))
+
+
+def test_get_rmse_loss():
+    rmse = get_rmse_loss([1.0, np.nan, 3.0], ("temp1", "temp2"))
+
+    loss, gradients = rmse(
+        {"temp1": np.array([1.0, 1.0, 1.0]), "temp2": np.array([1.0, 1.0, 1.0])}
+    )
+
+    npt.assert_allclose(loss, 1)
+    assert set(gradients) == {"temp1", "temp2"}
+    npt.assert_allclose(gradients["temp1"], [0.5, 0, -0.5])
@@ -0,0 +1,151 @@
+import json
+import re
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel
+from openscm_twolayermodel.batched import run_array
+from openscm_twolayermodel.store import (
+    METADATA_SUFFIX,
+    create_store,
+    open_store,
+    run_to_store,
+)
+
+
+@pytest.fixture
+def erf():
+    return np.linspace(0, 4, 51)
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return tmp_path / "output.dat"
+
+
+@pytest.mark.parametrize("chunk_size", (3, 1000))
+@pytest.mark.parametrize("model", (TwoLayerModel(), ImpulseResponseModel()))
+def test_run_to_store(model, erf, store_path, chunk_size):
+    paras = {
+        model._save_paras[0]: np.linspace(0.9, 1.1, 10) * model.parameters.astuple()[0]
+    }
+    exp = run_array(model, erf[np.newaxis], paras=paras)
+
+    res = run_to_store(model, erf, store_path, paras=paras, chunk_size=chunk_size)
+
+    assert res.variables == tuple(exp.data_vars)
+    assert res.data.shape == (len(exp.data_vars), 10, erf.shape[0])
+    for k in exp.data_vars:
+        npt.assert_array_equal(res[k], exp[k].values.reshape(10, -1))
+
+    reopened = open_store(store_path)
+    assert isinstance(reopened.data, np.memmap)
+    assert reopened.n_members == 10
+    assert reopened.n_time == erf.shape[0]
+    for k in exp.data_vars:
+        npt.assert_array_equal(reopened[k][2:5], res[k][2:5])
+        npt.assert_array_equal(reopened[k][:, -1], res[k][:, -1])
+
+    metadata = reopened.metadata
+    assert metadata["climate_model"] == model._name
+    assert metadata["units"]["rndt"] == model._rndt_unit
+    assert metadata["delta_t"] == model._delta_t_mag
+
+
+def test_run_to_store_forcing_per_member(erf, store_path):
+    model = TwoLayerModel()
+    forcing = np.stack([erf, 2 * erf, 3 * erf])
+
+    res = run_to_store(model, forcing, store_path, chunk_size=2, attrs={"a": 1})
+
+    exp = run_array(model, forcing)
+    npt.assert_array_equal(res["temp_upper"], exp["temp_upper"].values)
+    assert open_store(store_path).attrs == {"a": 1}
+
+
+def test_run_to_store_length_one_paras(erf, store_path):
+    # length-one parameter arrays broadcast against every chunk
+    model = TwoLayerModel()
+    forcing = np.stack([erf * (1 + 0.1 * i) for i in range(5)])
+    paras = {"eta": np.array([0.7])}
+
+    res = run_to_store(model, forcing, store_path, paras=paras, chunk_size=2)
+
+    exp = run_array(model, forcing, paras={"eta": 0.7})
+    for k in res.variables:
+        npt.assert_array_equal(res[k], exp[k].values)
+
+
+def test_run_to_store_errors(erf, store_path):
+    model = TwoLayerModel()
+    with pytest.raises(ValueError, match=re.escape("Unknown parameters: ['junk']")):
+        run_to_store(model, erf, store_path, paras={"junk": 1})
+
+    with pytest.raises(ValueError, match="one ensemble"):
+        run_to_store(model, np.ones((2, 2, 5)), store_path)
+
+
+def test_create_store(store_path):
+    store = create_store(
+        store_path, ["a", "b"], 4, 3, dtype=np.float32, units={"a": "K"}
+    )
+    assert np.isnan(store.data).all()
+
+    store["b"][1] = [1, 2, 3]
+    store.flush()
+
+    reopened = open_store(store_path, mode="r+")
+    assert reopened.data.dtype == np.float32
+    npt.assert_array_equal(reopened["b"][1], [1, 2, 3])
+    assert np.isnan(reopened["a"]).all()
+
+    reopened["a"][0, 0] = 4
+    reopened.flush()
+    assert open_store(store_path)["a"][0, 0] == 4
+
+    with pytest.raises(KeyError, match="c not in store"):
+        reopened["c"]  # pylint:disable=pointless-statement
+
+    with pytest.raises(ValueError, match="assignment destination is read-only"):
+        open_store(store_path)["a"][0, 0] = 1
+
+
+def test_open_store_errors(store_path):
+    create_store(store_path, ["a"], 4, 3)
+
+    metadata_path = str(store_path) + METADATA_SUFFIX
+    with open(metadata_path) as fh:
+        metadata = json.load(fh)
+
+    metadata["shape"] = [1, 4, 4]
+    with open(metadata_path, "w") as fh:
+        json.dump(metadata, fh)
+
+    with pytest.raises(ValueError, match="does not match"):
+        open_store(store_path)
+
+    metadata["format_version"] = 100
+    with open(metadata_path, "w") as fh:
+        json.dump(metadata, fh)
+
+    with pytest.raises(ValueError, match="Unsupported store format version: 100"):
+        open_store(store_path)
+
+
+def test_to_xarray(erf, store_path):
+    model = TwoLayerModel()
+    run_to_store(model, erf, store_path, paras={"eta": np.array([0.6, 0.8])})
+
+    res = open_store(store_path).to_xarray()
+
+    assert res["rndt"].dims == ("member", "time")
+    assert res["rndt"].attrs["units"] == model._rndt_unit
+    assert res.attrs["climate_model"] == model._name
+    npt.assert_array_equal(
+        res["temp_upper"].values,
+        run_array(model, erf[np.newaxis], paras={"eta": np.array([0.6, 0.8])})[
+            "temp_upper"
+        ].values,
+    )
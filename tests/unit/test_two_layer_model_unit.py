@@ -22,6 +22,8 @@ class TestTwoLayerModel(TwoLayerVariantTester):
         efficacy=1.1 * ur("dimensionless"),
         eta=0.7 * ur("W/m^2/delta_degC"),
         delta_t=1 * ur("yr"),
+        sigma_eta=0.5 * ur("W/m^2"),
+        sigma_xi=0.1 * ur("delta_degC"),
     )
 
     def test_init(self):
@@ -33,6 +35,8 @@ class TestTwoLayerModel(TwoLayerVariantTester):
             efficacy=1.1 * ur("dimensionless"),
             eta=0.7 * ur("W/m^2/delta_degC"),
             delta_t=1 / 12 * ur("yr"),
+            sigma_eta=0.3 * ur("W/m^2"),
+            sigma_xi=0.2 * ur("delta_degC"),
         )
 
         res = self.tmodel(**init_kwargs)
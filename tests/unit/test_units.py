@@ -0,0 +1,103 @@
+import re
+
+import numpy as np
+import numpy.testing as npt
+import pint.errors
+import pytest
+from openscm_units import unit_registry as ur
+
+from openscm_twolayermodel import ImpulseResponseModel, TwoLayerModel
+from openscm_twolayermodel._numerics import (
+    calculate_geoffroy_helper_parameters,
+    calculate_two_layer_parameters,
+)
+from openscm_twolayermodel._units import get_conversion_factor, get_magnitude
+from openscm_twolayermodel.base import _calculate_geoffroy_helper_parameters
+from openscm_twolayermodel.constants import SECONDS_PER_YEAR
+from openscm_twolayermodel.errors import UnitError
+
+
+@pytest.mark.parametrize(
+    "from_units,to_units,exp",
+    (
+        ("yr", "s", 365.25 * 24 * 60 * 60),
+        ("km", "m", 1000.0),
+        ("W/m^2", "mW/m^2", 1000.0),
+        ("delta_degC", "delta_degC", 1.0),
+        ("degC", "K", None),
+    ),
+)
+def test_get_conversion_factor(from_units, to_units, exp):
+    assert get_conversion_factor(from_units, to_units) == exp
+
+
+def test_get_conversion_factor_wrong_units():
+    with pytest.raises(pint.errors.DimensionalityError):
+        get_conversion_factor("m", "s")
+
+
+def test_seconds_per_year():
+    assert SECONDS_PER_YEAR == ur("yr").to("s").magnitude
+
+
+def test_get_magnitude():
+    res = get_magnitude(np.array([1.0, 2.0]) * ur("km"), "du", "m")
+    npt.assert_equal(res, [1000.0, 2000.0])
+
+
+def test_get_magnitude_offset_units():
+    npt.assert_allclose(get_magnitude(ur.Quantity(10.0, "degC"), "temp", "K"), 283.15)
+
+
+def test_get_magnitude_not_quantity():
+    with pytest.raises(TypeError, match="du must be a pint.Quantity"):
+        get_magnitude(10.0, "du", "m")
+
+
+def test_get_magnitude_wrong_units():
+    with pytest.raises(UnitError, match=re.escape("Wrong units for `du`")):
+        get_magnitude(10.0 * ur("s"), "du", "m")
+
+
+def test_get_magnitude_undefined_units():
+    with pytest.raises(UnitError, match=re.escape("Wrong units for `du`")):
+        get_magnitude(10.0 * ur("m"), "du", "junk")
+
+
+def test_geoffroy_helper_parameters_match_pint():
+    model = TwoLayerModel(efficacy=1.2 * ur("dimensionless"))
+    exp = _calculate_geoffroy_helper_parameters(
+        model.du, model.dl, model.lambda0, model.efficacy, model.eta
+    )
+
+    res = calculate_geoffroy_helper_parameters(
+        *[
+            getattr(model, p).to(getattr(model, "_{}_unit".format(p))).magnitude
+            for p in ("du", "dl", "lambda0", "efficacy", "eta")
+        ]
+    )
+
+    for k, v in exp.items():
+        if k.startswith("tau"):
+            v = v.to("s")
+
+        npt.assert_allclose(res[k], v.to_base_units().magnitude, rtol=1e-12)
+
+
+def test_two_layer_parameters_match_model():
+    model = ImpulseResponseModel(efficacy=1.2 * ur("dimensionless"))
+    exp = model.get_two_layer_parameters()
+
+    res = calculate_two_layer_parameters(
+        *[
+            getattr(model, p).to(getattr(model, "_{}_unit".format(p))).magnitude
+            for p in ("q1", "q2", "d1", "d2", "efficacy")
+        ]
+    )
+
+    for k, v in exp.items():
+        npt.assert_allclose(
+            res[k],
+            v.to(getattr(TwoLayerModel, "_{}_unit".format(k))).magnitude,
+            rtol=1e-12,
+        )